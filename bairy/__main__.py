@@ -1,16 +1,18 @@
-"""Run app and read sensor data."""
+"""Run app and read sensor data.
+
+Only configs are imported up front; the web app, sensors and pandas are
+imported by the commands needing them, so other commands start quickly."""
 
 from __future__ import annotations
 import os
 import shutil
 import sys
+import time
 import json
 import glob
 import argparse
-import asyncio
-from multiprocessing import Process
-from bairy.device import configs, utils, app, device, validate, preprocess
-from bairy.hub import configs as hub_configs, app as hub_app, request
+from bairy.device import configs, utils, validate
+from bairy.hub import configs as hub_configs
 from bairy import create_service, log_configs
 
 
@@ -21,8 +23,8 @@ def parse_args(args: list[str]):
       'mode',
       type=str,
       nargs='?',
-      choices=['device', 'hub'],
-      help='set the mode in which bairy runs',
+      choices=['device', 'hub', 'bench'],
+      help='set the mode in which bairy runs; see bairy bench --help',
       default='device')
 
   parser.add_argument(
@@ -78,20 +80,41 @@ def parse_args(args: list[str]):
       help='create bairy.service file for systemd',
       required=False)
 
+  parser.add_argument(
+      '-k',
+      '--compact',
+      action='store_true',
+      help='compress closed data partitions and remove expired data',
+      required=False)
+
+  parser.add_argument(
+      '--startup-profile',
+      action='store_true',
+      help='print time taken to import bairy by package',
+      required=False)
+
   return parser.parse_args(args)
 
 
 def parse_device_remove(arg: str):
   """Parse --remove flag under device mode."""
   if arg in ['data', 'all']:
-    data_files = glob.glob(configs.DEVICE_DATA_DIR + '/*.csv')
+    # csv files, their indexes, summaries of data and sensors, preprocessing
+    # state, segments and partitions
+    data_files = glob.glob(configs.DEVICE_DATA_DIR + '/*.csv*')
+    data_files += [p for p in [configs.STATE_PATH, configs.SENSOR_STATS_PATH]
+                   if os.path.exists(p)]
+    data_files += glob.glob(configs.DEVICE_DATA_DIR + '/*.npz')
+    data_files += glob.glob(configs.SEGMENTS_DIR + '/*.seg')
+    data_files += glob.glob(configs.PARTITIONS_DIR + '/data_*')
     for f in data_files:
       os.remove(f)
       print(f'Removed stored file at {f}')
   if arg in ['logs', 'all']:
-    if os.path.exists(configs.LOG_PATH):
-      os.remove(configs.LOG_PATH)
-      print(f'Removed stored file at {configs.LOG_PATH}')
+    # the log file and its rotated backups
+    for f in glob.glob(configs.LOG_PATH + '*'):
+      os.remove(f)
+      print(f'Removed stored file at {f}')
   if arg in ['configs', 'all']:
     if os.path.exists(configs.CONFIGS_PATH):
       os.remove(configs.CONFIGS_PATH)
@@ -105,14 +128,14 @@ def parse_device_remove(arg: str):
 def parse_hub_remove(arg: str):
   """Parse --remove flag under hub mode."""
   if arg in ['data', 'all']:
-    data_files = glob.glob(hub_configs.HUB_DATA_DIR + '/*.csv')
-    for f in data_files:
+    from bairy.hub.store import remove_stores  # pylint: disable=import-outside-toplevel
+    for d in remove_stores(hub_configs.HUB_DATA_DIR):
+      print(f'Removed stored directory at {d}')
+  if arg in ['logs', 'all']:
+    # the log file and its rotated backups
+    for f in glob.glob(hub_configs.LOG_PATH + '*'):
       os.remove(f)
       print(f'Removed stored file at {f}')
-  if arg in ['logs', 'all']:
-    if os.path.exists(hub_configs.LOG_PATH):
-      os.remove(hub_configs.LOG_PATH)
-      print(f'Removed stored file at {hub_configs.LOG_PATH}')
   if arg in ['configs', 'all']:
     if os.path.exists(hub_configs.IP_PATH):
       os.remove(hub_configs.IP_PATH)
@@ -121,6 +144,28 @@ def parse_hub_remove(arg: str):
     shutil.rmtree(hub_configs.DATA_DIR)
 
 
+def compact_device_data():
+  """Compress closed partitions and apply retention to stored data."""
+  # pylint: disable=import-outside-toplevel
+  from bairy.device import partitions
+  from bairy.device.segments import SegmentStore
+  storage = configs.load_device().storage
+  if storage.backend == 'segments':
+    removed = []
+    if storage.retention_days is not None:
+      store = SegmentStore(configs.SEGMENTS_DIR)
+      before = time.time() - storage.retention_days * 86400
+      removed = store.expire(before)
+    compressed = []
+  else:
+    compressed, removed = partitions.compact(
+        configs.PARTITIONS_DIR, storage.compression, storage.retention_days)
+  for f in compressed:
+    print(f'Compressed partition to {f}')
+  for f in removed:
+    print(f'Removed expired file at {f}')
+
+
 def parse_device(args: argparse.Namespace):
   """Take actions under device mode."""
   if args.path:
@@ -139,23 +184,44 @@ def parse_device(args: argparse.Namespace):
     print(configs.DATA_PATH)
   elif args.create_service:
     create_service.create_service()
+  elif args.compact:
+    compact_device_data()
   else:
     if not os.path.exists(configs.CONFIGS_PATH):
       raise FileNotFoundError('No configurations found! Run bairy --help')
+    # pylint: disable=import-outside-toplevel
+    import asyncio
+    from multiprocessing import Process, Queue
+    from bairy.device import app, dataset, device, preprocess, live, ring
 
     print('#' * 65)
     print('LOCAL IP ADDRESS:', utils.get_local_ip_address())
     print('#' * 65)
-    p = Process(target=app.run_app)
+    if os.path.exists(configs.DATA_PATH):  # converted before seeding the ring
+      dataset.migrate_local_times()
+    source = Queue(live.SOURCE_SIZE)  # rows pushed to live viewers
+    recent = ring.create_shared(configs.load_device())  # rows of the last day
+    ring_name = None if recent is None else recent.name
+    p = Process(target=app.run_app, args=(source, ring_name))
     p.start()
-    tasks = asyncio.gather(device.run_device(), preprocess.run_preprocess())
-    asyncio.run(tasks)
+
+    async def run():
+      await asyncio.gather(device.run_device(source, recent),
+                           preprocess.run_preprocess())
+
+    try:
+      asyncio.run(run())
+    finally:
+      if recent is not None:
+        recent.close()
+        recent.unlink()
 
 
 def parse_hub(args: argparse.Namespace):
   """Take actions under hub mode."""
   if args.path:
     hub_configs.set_ips(args.path[0])
+    from bairy.hub import request  # pylint: disable=import-outside-toplevel
     request.validate_names()
   elif args.print_configs:
     print(json.dumps(hub_configs.load_ips(), indent=4))
@@ -165,11 +231,16 @@ def parse_hub(args: argparse.Namespace):
     create_service.create_service(True)
   elif args.print_data_path:
     print(hub_configs.HUB_DATA_DIR)
-  elif args.configs_template or args.set_random_configs:
+  elif args.configs_template or args.set_random_configs or args.compact:
     raise NotImplementedError('Not available for hub mode.')
   else:
     if not os.path.exists(hub_configs.IP_PATH):
       raise FileNotFoundError('No IP addresses found! Run bairy --help')
+    # pylint: disable=import-outside-toplevel
+    import asyncio
+    from multiprocessing import Process
+    from bairy.device import device
+    from bairy.hub import app as hub_app, request
 
     print('#' * 65)
     print('LOCAL IP ADDRESS:', utils.get_local_ip_address())
@@ -178,21 +249,32 @@ def parse_hub(args: argparse.Namespace):
     p.start()
 
     ip_addresses = hub_configs.load_ips()
-    if 'self' in ip_addresses:
-      tasks = asyncio.gather(device.run_device(), request.run_requests())
-      asyncio.run(tasks)
-    else:
-      asyncio.run(request.run_requests())
+
+    async def run():
+      if 'self' in ip_addresses:
+        await asyncio.gather(device.run_device(), request.run_requests())
+      else:
+        await request.run_requests()
+
+    asyncio.run(run())
 
 
 def main():
   """Parse command line arguments and run actions."""
+  if sys.argv[1:2] == ['bench']:  # taking arguments of its own
+    from bairy.bench import suite  # pylint: disable=import-outside-toplevel
+    sys.exit(suite.main(sys.argv[2:]))
   args = parse_args(sys.argv[1:])
-  if args.mode == 'device':
+  if args.startup_profile:
+    from bairy import startup_profile  # pylint: disable=import-outside-toplevel
+    startup_profile.print_profile()
+  elif args.mode == 'device':
+    configs.make_data_dirs()
     log_configs.configure_root_logging(configs.LOG_PATH)
     parse_device(args)
   else:
     assert args.mode == 'hub'
+    hub_configs.make_data_dirs()
     log_configs.configure_root_logging(hub_configs.LOG_PATH)
     parse_hub(args)
 
@@ -0,0 +1,111 @@
+"""Benchmark cases of the device and the hub.
+
+Cases read data generated by bairy.bench.synthetic within the data directory
+in use, and are grouped in the order they are run: writing rows,
+preprocessing, serving the dashboards, the device app and the hub."""
+
+from __future__ import annotations
+from typing import Any
+import os
+import functools
+from bairy.bench.measure import Case
+from bairy.device import app, configs, dash_plot, dash_table, device, \
+    paging, preprocess
+from bairy.device.writer import DataWriter
+from bairy.device.timestamps import to_epoch, utcnow
+from bairy.hub import cache
+from bairy.hub import dash_plot as hub_dash_plot
+
+
+WRITE_ROWS = 20000  # rows appended by each writing case
+PERIODS = ['day', 'week', 'all']
+
+
+def write_cases(directory: str, n_sensors: int):
+  """Compare rows/sec of per-row appends against the buffered DataWriter."""
+  headers = [f'random{i + 1}' for i in range(n_sensors)]
+  row: dict[str, int | None] = {h: i for i, h in enumerate(headers)}
+  path = os.path.join(directory, 'write.csv')
+
+  def remove():
+    if os.path.exists(path):
+      os.remove(path)
+
+  def run_write_data():
+    """Opens and closes the file per row."""
+    for _ in range(WRITE_ROWS):
+      device.write_data(row, path)
+    return WRITE_ROWS
+
+  def run_writer(fsync: str):
+    with DataWriter(path, headers, fsync=fsync) as writer:
+      for _ in range(WRITE_ROWS):
+        writer.write(row)
+    return WRITE_ROWS
+
+  cases = [Case('write_data', run_write_data, remove, 'rows')]
+  for fsync in ['never', 'interval', 'flush']:
+    cases.append(Case(f'DataWriter fsync={fsync}',
+                      functools.partial(run_writer, fsync), remove, 'rows'))
+  return cases
+
+
+def preprocess_cases():
+  """Preprocess each time period from scratch."""
+  return [Case(f'preprocess_df {p}', functools.partial(
+      preprocess.preprocess_df, p)) for p in PERIODS]
+
+
+def write_preprocessed():
+  """Write preprocessed files read by the dashboards."""
+  for time_period, path in configs.PREPROCESSED_DATA_PATHS.items():
+    preprocess.preprocess_df(time_period).to_csv(path)
+
+
+def dashboard_cases():
+  """Build plots of each time period and serve pages of the table."""
+  cases = [Case(f'create_fig {p}', functools.partial(dash_plot.create_fig, p))
+           for p in PERIODS]
+  size = dash_table.PAGE_SIZE
+  cases.append(Case('serve_table', lambda: dash_table.serve_table(
+      0, 0, size, [], ''), paging.read_pages.cache_clear))
+  sort_by = [{'column_id': 'random1', 'direction': 'desc'}]
+  cases.append(Case('serve_table sorted filtered', lambda: dash_table.
+                    serve_table(0, 1, size, sort_by, '{random1} gt 25')))
+  return cases
+
+
+def app_client():
+  """Create a client of the device app, which requires httpx."""
+  try:
+    from fastapi.testclient import TestClient  # pylint: disable=import-outside-toplevel
+  except ImportError as e:
+    raise ImportError('bairy bench requires pip install bairy[bench]') from e
+  return TestClient(app.app)
+
+
+def app_cases(client: Any):
+  """Request the status and stream data from the device app."""
+
+  def get(url: str):
+    r = client.get(url)
+    r.raise_for_status()
+    return len(r.content)
+
+  def get_day():
+    start = to_epoch(utcnow()) - 86400
+    return get(f'/data?start={start:.0f}&resolution=60')
+
+  return [Case('/status', lambda: get('/status') and None),
+          Case('/data raw', functools.partial(get, '/data'), unit='bytes'),
+          Case('/data day at 60 s', get_day, unit='bytes')]
+
+
+def hub_cases():
+  """Load data synced from every device, parsing files afresh."""
+
+  def clear():
+    cache.FILES = cache.FileCache()
+
+  return [Case(f'hub load_data {p}', functools.partial(
+      hub_dash_plot.load_data, p), clear) for p in PERIODS]
@@ -0,0 +1,119 @@
+"""Measure wall time and memory of benchmark cases.
+
+Each case is measured in a forked process, so its peak resident set size is
+not hidden by an earlier case and caches it fills are not reused by later
+ones. A case is first timed without tracing, then run once more under
+tracemalloc for the peak memory allocated by Python."""
+
+from __future__ import annotations
+from typing import Any, Callable
+import sys
+import time
+import resource
+import statistics
+import tracemalloc
+import multiprocessing
+
+
+# compared metrics, lower being better, and increases never a regression
+SLACK = {'seconds': 0.005, 'peak_rss_mb': 1.0, 'peak_alloc_mb': 0.1}
+
+
+class Case:
+  """An operation to measure, with setup called before each run.
+
+  If run returns a number of items processed, such as rows or bytes, their
+  rate per second is reported as well."""
+
+  def __init__(self, name: str, run: Callable[[], Any],
+               setup: Callable[[], Any] | None = None, unit: str = ''):
+    self.name = name
+    self.run = run
+    self.setup = setup
+    self.unit = unit
+
+
+def peak_rss():
+  """Peak resident set size of this process in bytes."""
+  usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def measure(case: Case, repeat: int = 3):
+  """Time case repeat times, then trace its allocations in one more run."""
+  times = []
+  items = None
+  for _ in range(repeat):
+    if case.setup is not None:
+      case.setup()
+    start = time.perf_counter()
+    items = case.run()
+    times.append(time.perf_counter() - start)
+  rss = peak_rss()
+
+  if case.setup is not None:
+    case.setup()
+  tracemalloc.start()
+  try:
+    case.run()
+    _, peak = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+
+  result: dict[str, Any] = {
+      'seconds': round(min(times), 6),
+      'median_seconds': round(statistics.median(times), 6),
+      'peak_rss_mb': round(rss / 2**20, 3),
+      'peak_alloc_mb': round(peak / 2**20, 3)}
+  if isinstance(items, (int, float)) and not isinstance(items, bool):
+    result[f'{case.unit or "items"}_per_second'] = round(items / min(times))
+  return result
+
+
+def call_forked(function: Callable[..., Any], *args: Any):
+  """Call function in a forked process and return its picklable result, or
+  call it in this process where fork is unavailable."""
+  if 'fork' not in multiprocessing.get_all_start_methods():
+    return function(*args)
+  context = multiprocessing.get_context('fork')
+  receiver, sender = context.Pipe(duplex=False)
+
+  def target():
+    try:
+      sender.send(function(*args))
+    except Exception as e:  # pylint: disable=broad-except
+      sender.send(e)
+
+  p = context.Process(target=target)
+  p.start()
+  sender.close()
+  try:
+    result = receiver.recv()
+  except EOFError:
+    result = RuntimeError(f'Forked process exited with code {p.exitcode}')
+  p.join()
+  if isinstance(result, Exception):
+    raise result
+  return result
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any],
+            threshold: float = 0.2):
+  """List metrics of cases higher than in baseline by more than threshold,
+  a fraction of the baseline."""
+  if results['params'] != baseline['params']:
+    raise ValueError('Baseline was measured with other parameters')
+  regressions = []
+  for name, metrics in results['cases'].items():
+    base = baseline['cases'].get(name)
+    if base is None:
+      continue
+    for metric, slack in SLACK.items():
+      limit = max(base[metric] * (1 + threshold), base[metric] + slack)
+      if metrics[metric] > limit:
+        regressions.append({'case': name, 'metric': metric,
+                            'baseline': base[metric],
+                            'current': metrics[metric],
+                            'ratio': round(metrics[metric] / base[metric], 3)
+                            if base[metric] else None})
+  return regressions
@@ -0,0 +1,115 @@
+"""Run benchmarks on synthetic data and report results as JSON.
+
+Run with bairy bench, see bairy bench --help. Results of an earlier run can
+be passed as a baseline, in which case metrics higher than in the baseline
+by more than a threshold are listed as regressions and the exit status is
+1, so a release making the Raspberry Pi slower is caught."""
+
+from __future__ import annotations
+from typing import Any
+import sys
+import json
+import argparse
+import platform
+import tempfile
+from bairy.bench import cases, measure, synthetic
+from bairy.device import utils
+
+
+def parse_args(args: list[str]):
+  """Create argparse parser."""
+  parser = argparse.ArgumentParser(
+      prog='bairy bench',
+      description='Benchmark bairy on data of synthetic random sensors.')
+  parser.add_argument('--sensors', type=int, default=3,
+                      help='number of random sensors')
+  parser.add_argument('--days', type=float, default=30,
+                      help='days of data generated, up to two years')
+  parser.add_argument('--interval', type=float, default=10,
+                      help='seconds between readings')
+  parser.add_argument('--backend', choices=['csv', 'segments'],
+                      default='csv', help='storage backend of the device')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='seed of the random readings')
+  parser.add_argument('--repeat', type=int, default=3,
+                      help='timed runs of each case')
+  parser.add_argument('--cases', type=str, default=None,
+                      help='only run cases whose name contains this')
+  parser.add_argument('--output', type=str, default=None,
+                      help='write JSON results to this path')
+  parser.add_argument('--baseline', type=str, default=None,
+                      help='JSON results of an earlier run to compare with')
+  parser.add_argument('--threshold', type=float, default=0.2,
+                      help='fraction by which a metric may exceed baseline')
+  return parser.parse_args(args)
+
+
+def generate(n_sensors: int, days: float, interval: float, backend: str,
+             seed: int):
+  """Generate device and hub data in the data directory in use."""
+  df = synthetic.generate_device(n_sensors, days, interval, backend, seed)
+  synthetic.generate_hub(df)
+
+
+def run_suite(n_sensors: int = 3, days: float = 30, interval: float = 10,
+              backend: str = 'csv', seed: int = 0, repeat: int = 3,
+              select: str | None = None):
+  """Measure every case, or those whose name contains select, on freshly
+  generated data."""
+  if not 0 < days <= 2 * 366:
+    raise ValueError('Days must be positive and at most two years')
+  params = {'sensors': n_sensors, 'days': days, 'interval': interval,
+            'backend': backend, 'seed': seed}
+  results: dict[str, Any] = {
+      'bairy_version': utils.get_bairy_version(),
+      'python': platform.python_version(),
+      'machine': platform.machine(),
+      'params': params,
+      'repeat': repeat,
+      'cases': {}}
+
+  def run(group: list[measure.Case]):
+    for case in group:
+      if select is None or select in case.name:
+        result = measure.call_forked(measure.measure, case, repeat)
+        results['cases'][case.name] = result
+        print(f'{case.name:<32} {result["seconds"]:>10.4f} s',
+              file=sys.stderr)
+
+  client = cases.app_client()  # failing before any data is generated
+  with tempfile.TemporaryDirectory() as directory, \
+          synthetic.data_dir(directory):
+    # generating in a forked process keeps the peak memory it needs away
+    # from the cases, each also forked from this process
+    measure.call_forked(generate, n_sensors, days, interval, backend, seed)
+    run(cases.write_cases(directory, n_sensors))
+    run(cases.preprocess_cases())
+    cases.write_preprocessed()
+    run(cases.dashboard_cases())
+    run(cases.app_cases(client))
+    run(cases.hub_cases())
+  return results
+
+
+def main(args: list[str]):
+  """Run benchmarks, print or save results and return the exit status."""
+  parsed = parse_args(args)
+  results = run_suite(parsed.sensors, parsed.days, parsed.interval,
+                      parsed.backend, parsed.seed, parsed.repeat,
+                      parsed.cases)
+  if parsed.baseline is not None:
+    with open(parsed.baseline) as f:
+      baseline = json.load(f)
+    results['regressions'] = measure.compare(results, baseline,
+                                             parsed.threshold)
+    for r in results['regressions']:
+      print(f'Regression in {r["case"]}: {r["metric"]} {r["baseline"]} -> '
+            f'{r["current"]}', file=sys.stderr)
+
+  text = json.dumps(results, indent=4)
+  if parsed.output is None:
+    print(text)
+  else:
+    with open(parsed.output, 'w') as f:
+      f.write(text + '\n')
+  return 1 if results.get('regressions') else 0
@@ -0,0 +1,126 @@
+"""Generate synthetic data of random sensors for benchmarks.
+
+Readings follow the random sensor: each starts uniformly within [0, 50] and
+moves by -1, 0 or 1 on every reading, clipped to [0, 50]. Rows are written
+through the device's own writer, so files are laid out as on a device, and
+synced into hub stores as the hub would. Everything is written within a
+separate data directory, leaving the data of the device untouched."""
+
+from __future__ import annotations
+from typing import Iterator
+import os
+import json
+import contextlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from bairy.device import configs, device, partitions
+from bairy.device.state import DataState
+from bairy.device.timestamps import utcnow
+from bairy.device.validate import DeviceConfigs, RandomSensorConfigs, \
+    StorageConfigs
+from bairy.hub import configs as hub_configs
+from bairy.hub.store import DeviceStore
+
+
+MAX_READING = 50  # readings of the random sensor lie within [0, MAX_READING]
+# writing generated rows as fast as possible, unlike a device
+GENERATE_STORAGE = {'fsync': 'never', 'flush_rows': 10000}
+
+
+@contextlib.contextmanager
+def data_dir(directory: str) -> Iterator[None]:
+  """Point every data path of device and hub within directory meanwhile."""
+  device_dir = os.path.join(directory, 'device')
+  hub_dir = os.path.join(directory, 'hub')
+  saved = []
+
+  def redirect(module: object, old: str, new: str):
+    for name, value in list(vars(module).items()):
+      if name.isupper() and isinstance(value, str) and \
+              value.startswith(old):
+        saved.append((module, name, value))
+        setattr(module, name, new + value[len(old):])
+
+  old_dir = configs.DEVICE_DATA_DIR
+  redirect(configs, old_dir, device_dir)
+  redirect(device, old_dir, device_dir)  # imported paths of the sampler
+  redirect(hub_configs, hub_configs.HUB_DATA_DIR, hub_dir)
+  saved.append((configs, 'PREPROCESSED_DATA_PATHS',
+                configs.PREPROCESSED_DATA_PATHS))
+  configs.PREPROCESSED_DATA_PATHS = {'day': configs.DATA_DAY_PATH,
+                                     'week': configs.DATA_WEEK_PATH,
+                                     'all': configs.DATA_ALL_PATH}
+  configs.LOADED.clear()
+  try:
+    yield
+  finally:
+    for module, name, value in reversed(saved):
+      setattr(module, name, value)
+    configs.LOADED.clear()
+
+
+def random_walks(n_rows: int, n_sensors: int, seed: int = 0):
+  """Readings of n_sensors random sensors, one row per reading."""
+  rng = np.random.default_rng(seed)
+  steps = rng.integers(-1, 2, (n_rows, n_sensors))
+  if n_rows:
+    steps[0] = rng.integers(0, MAX_READING + 1, n_sensors)
+  clip = np.frompyfunc(lambda a, b: min(max(a + b, 0), MAX_READING), 2, 1)
+  return clip.accumulate(steps, axis=0, dtype=object).astype(np.int64)
+
+
+def device_configs(n_sensors: int, interval: float, backend: str = 'csv'):
+  """Configs of a device with n_sensors random sensors."""
+  sensors = [RandomSensorConfigs(header=f'random{i + 1}')
+             for i in range(n_sensors)]
+  return DeviceConfigs(name='benchmark', sensors=sensors,
+                       update_interval=interval,
+                       storage=StorageConfigs(backend=backend))
+
+
+def row_times(n_rows: int, interval: float, end: datetime | None = None):
+  """UTC times of n_rows readings every interval seconds, the last at end."""
+  if end is None:
+    end = utcnow()
+  offsets = pd.to_timedelta(np.arange(n_rows - 1, -1, -1) * interval,
+                            unit='s')
+  return pd.Timestamp(end) - offsets
+
+
+def generate_device(n_sensors: int, days: float, interval: float,
+                    backend: str = 'csv', seed: int = 0):
+  """Write configs, data and state of a device whose n_sensors random
+  sensors were read every interval seconds over the last days."""
+  d = device_configs(n_sensors, interval, backend)
+  configs.make_data_dirs()
+  with open(configs.CONFIGS_PATH, 'w') as f:
+    json.dump(d.dict(), f, indent=4)
+
+  n_rows = int(days * 86400 / interval)
+  times = row_times(n_rows, interval)
+  values = random_walks(n_rows, n_sensors, seed)
+  _, sensors = device.initialize_device(d)
+  headers = [h for s in sensors for h in s.headers]
+  fast = d.copy(update={'storage': d.storage.copy(update=GENERATE_STORAGE)})
+  writer = device.create_writer(fast, sensors)
+  for t, row in zip(times.to_pydatetime(), values.tolist()):
+    writer.write(dict(zip(headers, row)), t)
+  writer.close()
+  compactor = getattr(writer, 'compactor', None)
+  if compactor is not None:  # compressing partitions before measuring
+    compactor.join()
+    partitions.compact(configs.PARTITIONS_DIR, d.storage.compression)
+  DataState.scan(headers).save(configs.STATE_PATH)
+  return pd.DataFrame(values, index=times, columns=headers)
+
+
+def generate_hub(df: pd.DataFrame, n_devices: int = 2):
+  """Sync rows of df, averaged as the hub requests them, as if read from
+  n_devices devices."""
+  synced = df.resample(f'{hub_configs.SYNC_RESOLUTION}s').mean().dropna()
+  synced = synced.rename_axis('time').reset_index()
+  for i in range(n_devices):
+    store = DeviceStore(hub_configs.HUB_DATA_DIR, f'device{i + 1}')
+    store.merge(synced)
+    store.save_mark(synced['time'].iloc[-1])
@@ -2,22 +2,41 @@
 
 
 from __future__ import annotations
+from typing import Any, Optional
 import os
 import json
+import time
 import subprocess
 import sys
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi import responses
 from fastapi.middleware.wsgi import WSGIMiddleware
 import uvicorn
 from bairy import log_configs
-from bairy.device import utils, configs, dash_table, dash_plot, device
+from bairy.device import utils, configs, device, dataset, query, live
+from bairy.device.ring import SHARED
+from bairy.device.figures import FIGURES
+from bairy.device.reader import load_stats
+from bairy.device.state import DataState
+
+
+def plot_server():
+  """Build Dash plot on first request."""
+  from bairy.device import dash_plot  # pylint: disable=import-outside-toplevel
+  return dash_plot.plot.server
+
+
+def table_server():
+  """Build Dash table on first request."""
+  from bairy.device import dash_table  # pylint: disable=import-outside-toplevel
+  return dash_table.table.server
 
 
 app = FastAPI()
-app.mount('/plot', WSGIMiddleware(dash_plot.plot.server))
-app.mount('/table', WSGIMiddleware(dash_table.table.server))
+app.mount('/plot', WSGIMiddleware(utils.LazyWSGIApp(plot_server)))
+app.mount('/table', WSGIMiddleware(utils.LazyWSGIApp(table_server)))
+LIVE = live.Broadcaster()
 
 
 @app.get('/')
@@ -27,8 +46,18 @@ def root():
 
 
 @app.get('/data')
-def data(selection: str = 'raw'):
-  """Return streaming response of CSV containing all data."""
+def data(request: Request, selection: str = 'raw',
+         start: Optional[str] = None, end: Optional[str] = None,
+         columns: Optional[str] = None, resolution: Optional[str] = None,
+         max_points: Optional[int] = None):
+  """Return streaming response of CSV holding the selected data.
+
+  Raw data can be narrowed to rows within [start, end) and a comma separated
+  list of columns, and averaged to a resolution given in seconds, or chosen
+  to fit within max_points. The resolution served is in the X-Resolution
+  header. Byte ranges are honored only for the preprocessed day, week and
+  all selections. Raw data is generated from several files as it streams,
+  so it is always sent whole, with Accept-Ranges: none."""
   selections = {'raw': configs.DATA_PATH,
                 'day': configs.DATA_DAY_PATH,
                 'week': configs.DATA_WEEK_PATH,
@@ -36,40 +65,125 @@ def data(selection: str = 'raw'):
 
   if selection not in selections:
     return 'unknown command'
+  if selection != 'raw':
+    return file_response(selections[selection], request)
+
+  params = {'start': start, 'end': end, 'columns': columns,
+            'resolution': resolution, 'max_points': max_points}
+  try:
+    t0, t1 = query.parse_bound(start), query.parse_bound(end)
+    selected = query.check_columns(columns)
+    level = query.choose_resolution(resolution, max_points, t0, t1)
+  except ValueError as e:
+    raise HTTPException(400, str(e)) from e
+
+  headers = {'ETag': query.etag(params), 'X-Resolution': level,
+             'Accept-Ranges': 'none'}
+  if utils.etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+    return responses.Response(status_code=304, headers=headers)
+  if level != query.RAW:
+    content = query.iter_aggregate(t0, t1, selected, level)
+  elif t0 is None and t1 is None and selected is None:
+    content = dataset.iter_csv()
+  else:
+    content = query.iter_raw(t0, t1, selected)
+  return responses.StreamingResponse(content, media_type='text/csv',
+                                     headers=headers)
+
+
+def file_response(path: str, request: Request):
+  """Stream a file, honoring If-None-Match and a single byte range."""
+  if not os.path.exists(path):
+    raise HTTPException(404, 'Data not yet preprocessed')
+  size = os.path.getsize(path)
+  headers = {'ETag': utils.file_etag(path), 'Accept-Ranges': 'bytes'}
+  if utils.etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+    return responses.Response(status_code=304, headers=headers)
 
-  # cannot use with ... here
-  f = open(selections[selection], 'rb')
-  return responses.StreamingResponse(f, media_type='text/csv')
+  byte_range = request.headers.get('range')
+  if_range = request.headers.get('if-range')
+  if byte_range is None or (if_range is not None and
+                            if_range != headers['ETag']):
+    headers['Content-Length'] = str(size)
+    return responses.StreamingResponse(utils.iter_file(path),
+                                       media_type='text/csv', headers=headers)
+  try:
+    first, last = utils.parse_range(byte_range, size)
+  except ValueError:
+    headers['Content-Range'] = f'bytes */{size}'
+    return responses.Response(status_code=416, headers=headers)
+  headers['Content-Range'] = f'bytes {first}-{last}/{size}'
+  headers['Content-Length'] = str(last - first + 1)
+  return responses.StreamingResponse(utils.iter_file(path, first, last),
+                                     status_code=206, media_type='text/csv',
+                                     headers=headers)
+
+
+@app.get('/stream')
+def stream():
+  """Stream each new row as a server-sent event."""
+  headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+  return responses.StreamingResponse(LIVE.stream(),
+                                     media_type='text/event-stream',
+                                     headers=headers)
+
+
+@app.get('/stream-stats', response_class=responses.PlainTextResponse)
+def stream_stats():
+  """Get subscribers of /stream and rows published to them."""
+  return json.dumps(LIVE.stats(), indent=4)
+
+
+@app.get('/cache-stats', response_class=responses.PlainTextResponse)
+def cache_stats():
+  """Get hits and misses of the plot's figure cache."""
+  return json.dumps(FIGURES.stats(), indent=4)
 
 
 @app.get('/logs', response_class=responses.PlainTextResponse)
-def logs():
-  """Return app log as plain text."""
-  with open(configs.LOG_PATH) as f:
-    lines = f.readlines()
-  # return as reverse chronological
-  lines.reverse()
-  return ''.join(lines)
+def logs(limit: int = log_configs.LOG_LIMIT, before: Optional[int] = None,
+         level: Optional[str] = None):
+  """Return app log as plain text, newest records first.
+
+  At most limit records at or above level are returned. Older records are
+  found by passing the X-Before header as before."""
+  try:
+    text, cursor = log_configs.read_logs(configs.LOG_PATH, limit, before,
+                                         level)
+  except ValueError as e:
+    raise HTTPException(400, str(e)) from e
+  headers = {} if cursor is None else {'X-Before': str(cursor)}
+  return responses.PlainTextResponse(text, headers=headers)
 
 
 @app.get('/status', response_class=responses.PlainTextResponse)
 def status():
   """Return device status as plaintext json."""
   device_configs = configs.load_device().dict()
-  size = utils.get_data_size()
-  n_rows = utils.count_rows(configs.DATA_PATH)
-  latest = utils.latest_data()
+  state = DataState.current(configs.STATE_PATH)
+  if state is None:  # no current summary, so reading data itself
+    data_details = {'file_size': dataset.get_data_size(),
+                    'n_rows': dataset.count_rows()}
+    latest = dataset.latest()
+  else:
+    data_details = {'file_size': utils.format_size(state.size),
+                    'n_rows': state.n_rows, 'first': state.first,
+                    'last': state.latest['time'],
+                    'state_age': round(time.time() - state.updated, 3)}
+    latest = state.latest
+  latest = SHARED.latest() or latest  # newer, as the sampler writes it first
   ip_address = utils.get_local_ip_address()
   disk_space = utils.get_disk_space()
   bairy_version = utils.get_bairy_version()
 
   device_status = {
       'device_configs': device_configs,
-      'data_details': {'file_size': size, 'n_rows': n_rows},
+      'data_details': data_details,
       'available_disk_space': disk_space,
       'bairy_version': bairy_version,
       'ip_address': ip_address,
-      'latest_reading': latest
+      'latest_reading': latest,
+      'sensor_stats': load_stats(configs.SENSOR_STATS_PATH)
   }
   return json.dumps(device_status, indent=4)
 
@@ -99,7 +213,7 @@ def remote(command: str):
 
   elif command == 'remove-data':
     logging.info('Remove data requested')
-    os.remove(configs.DATA_PATH)
+    dataset.remove_data()
     device.initialize_device()  # create new data.csv with headers
     return 'success'
 
@@ -124,8 +238,17 @@ def set_configs(d: device.DeviceConfigs):
   return 'new configs will be active after reboot'
 
 
-def run_app():
-  """Run app with uvicorn."""
+def run_app(source: Any = None, ring_name: Optional[str] = None):
+  """Run app with uvicorn, streaming rows put on source and reading recent
+  rows from the shared ring buffer if given."""
+
+  async def relay():
+    LIVE.relay(source)
+
+  if source is not None:
+    app.add_event_handler('startup', relay)
+  if ring_name is not None:
+    SHARED.attach(ring_name)
 
   uvicorn.run(
       app,
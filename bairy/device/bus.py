@@ -0,0 +1,105 @@
+"""Share one persistent connection per I2C bus across sensors."""
+
+from __future__ import annotations
+from typing import Any, Callable
+import time
+import logging
+import threading
+
+
+def open_smbus(number: int):
+  """Open an I2C bus, importing smbus2 only once an I2C sensor is used."""
+  import smbus2  # pylint: disable=import-outside-toplevel
+  return smbus2.SMBus(number)
+
+
+class Bus:
+  """A connection to one I2C bus, opened on first use and kept open.
+
+  Transactions are serialized by a lock, so sensors on different buses are
+  read in parallel while sensors sharing a bus take turns. After an OSError
+  the connection is closed and reopened on the next read; if reopening
+  fails, further attempts are delayed by an exponentially growing backoff."""
+
+  def __init__(self, number: int, factory: Callable[[int], Any] = open_smbus,
+               backoff: float = 1.0, max_backoff: float = 60.0,
+               clock: Callable[[], float] = time.monotonic):
+    self.number = number
+    self.factory = factory
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self.clock = clock
+    self.lock = threading.Lock()
+    self.handle: Any = None
+    self.failures = 0  # consecutive failures to open
+    self.retry_at = 0.0
+
+  def connect(self):
+    """Open connection if closed, raising OSError while backing off."""
+    if self.handle is not None:
+      return self.handle
+    if self.clock() < self.retry_at:
+      raise OSError(f'I2C bus {self.number} unavailable, backing off')
+    try:
+      self.handle = self.factory(self.number)
+    except OSError:
+      self.failures += 1
+      delay = min(self.backoff * 2 ** (self.failures - 1), self.max_backoff)
+      self.retry_at = self.clock() + delay
+      logging.warning('Unable to open I2C bus %d, retrying in %.1f s',
+                      self.number, delay)
+      raise
+    self.failures = 0
+    return self.handle
+
+  def disconnect(self):
+    """Close connection so the next read reopens it."""
+    if self.handle is not None:
+      try:
+        self.handle.close()
+      except OSError:
+        pass
+    self.handle = None
+
+  def read_block(self, address: int, register: int, length: int) -> list[int]:
+    """Read a block of bytes from the device at address."""
+    with self.lock:
+      handle = self.connect()
+      try:
+        return handle.read_i2c_block_data(address, register, length)
+      except OSError:
+        self.disconnect()
+        raise
+
+  def close(self):
+    """Close connection."""
+    with self.lock:
+      self.disconnect()
+
+
+class BusManager:
+  """Hand out one shared Bus per bus number."""
+
+  def __init__(self, factory: Callable[[int], Any] = open_smbus,
+               **kwargs: Any):
+    self.factory = factory
+    self.kwargs = kwargs
+    self.buses: dict[int, Bus] = {}
+    self.lock = threading.Lock()
+
+  def get(self, number: int):
+    """Get the bus with the given number, creating it on first use."""
+    with self.lock:
+      if number not in self.buses:
+        self.buses[number] = Bus(number, self.factory, **self.kwargs)
+      return self.buses[number]
+
+  def close(self):
+    """Close every bus."""
+    with self.lock:
+      for bus in self.buses.values():
+        bus.close()
+
+
+# shared by all sensors of the device
+BUSES = BusManager()
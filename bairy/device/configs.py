@@ -7,7 +7,6 @@ from typing import Any
 from bairy.device.validate import random_configs, DeviceConfigs
 
 
-# creating data directory
 MODULE_DIR = os.path.dirname(__file__)
 PACKAGE_DIR = os.path.dirname(MODULE_DIR)
 DATA_DIR = os.path.join(PACKAGE_DIR, 'data')
@@ -15,16 +14,23 @@ DEVICE_DATA_DIR = os.path.join(DATA_DIR, 'device')
 CONFIGS_PATH = os.path.join(DEVICE_DATA_DIR, 'configs.json')
 LOG_PATH = os.path.join(DEVICE_DATA_DIR, 'app.logs')
 DATA_PATH = os.path.join(DEVICE_DATA_DIR, 'data.csv')
+DATA_INDEX_PATH = os.path.join(DEVICE_DATA_DIR, 'data.csv.idx')
+PARTITIONS_DIR = os.path.join(DEVICE_DATA_DIR, 'partitions')
 DATA_DAY_PATH = os.path.join(DEVICE_DATA_DIR, 'data_day.csv')
 DATA_WEEK_PATH = os.path.join(DEVICE_DATA_DIR, 'data_week.csv')
 DATA_ALL_PATH = os.path.join(DEVICE_DATA_DIR, 'data_all.csv')
+SEGMENTS_DIR = os.path.join(DEVICE_DATA_DIR, 'segments')
+SENSOR_STATS_PATH = os.path.join(DEVICE_DATA_DIR, 'sensor_stats.json')
+STATE_PATH = os.path.join(DEVICE_DATA_DIR, 'state.json')
+PREPROCESS_STATE_PATH = os.path.join(DEVICE_DATA_DIR, 'preprocess_state.npz')
 PREPROCESSED_DATA_PATHS = {'day': DATA_DAY_PATH,
                            'week': DATA_WEEK_PATH,
                            'all': DATA_ALL_PATH}
-if not os.path.exists(DATA_DIR):
-  os.mkdir(DATA_DIR)
-if not os.path.exists(DEVICE_DATA_DIR):
-  os.mkdir(DEVICE_DATA_DIR)
+
+
+def make_data_dirs():
+  """Create data directories if missing."""
+  os.makedirs(DEVICE_DATA_DIR, exist_ok=True)
 
 
 def set_configs(path: str):
@@ -33,6 +39,7 @@ def set_configs(path: str):
     configs: dict[str, Any] = json.load(f)
   d = DeviceConfigs(**configs)
   assert d == DeviceConfigs(**d.dict())
+  make_data_dirs()
   with open(CONFIGS_PATH, 'w') as f:
     json.dump(configs, f, indent=4)
   print('Successfully validated and set configs.')
@@ -42,16 +49,25 @@ def set_random_configs():
   """Save random configs as json file within data directory."""
   d = random_configs()
   assert d == DeviceConfigs(**d.dict())
+  make_data_dirs()
   with open(CONFIGS_PATH, 'w') as f:
     json.dump(d.dict(), f, indent=4)
 
 
+# configs last loaded, keyed by modification time and size of configs.json
+LOADED: dict[tuple[int, int], DeviceConfigs] = {}
+
+
 def load_device():
-  """Look for stored configs.json file."""
-  if os.path.exists(CONFIGS_PATH):
+  """Look for stored configs.json file, validating it only when it changes."""
+  try:
+    stat = os.stat(CONFIGS_PATH)
+  except FileNotFoundError as e:
+    raise FileNotFoundError('No configurations found! Run bairy --help') from e
+  key = (stat.st_mtime_ns, stat.st_size)
+  if key not in LOADED:
     with open(CONFIGS_PATH) as f:
       configs: dict[str, Any] = json.load(f)
-    d = DeviceConfigs(**configs)
-    assert d == DeviceConfigs(**configs)
-    return d
-  raise FileNotFoundError('No configurations found! Run bairy --help')
+    LOADED.clear()
+    LOADED[key] = DeviceConfigs(**configs)
+  return LOADED[key]
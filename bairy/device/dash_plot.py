@@ -7,27 +7,60 @@ import plotly.graph_objects as go
 import plotly.express as px
 import plotly.io as pio
 from dash import Dash
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 import dash_core_components as dcc
 import dash_html_components as html
-from bairy.device import configs, preprocess
+from bairy.device import configs, preprocess, utils
+from bairy.device.ring import SHARED
+from bairy.device.figures import FIGURES, figure_data
 
 
 pio.templates.default = 'plotly_white'
+LIVE_INTERVAL = 2  # seconds between appending streamed rows to the day plot
+LIVE_ROWS = 1000  # streamed rows buffered by the browser between appends
+LIVE_MAX_POINTS = 2 * preprocess.MAX_POINTS  # points kept in each trace
+
+
+def load_data(time_period: str = 'all'):
+  """Summarize recent rows held in shared memory, or read the preprocessed
+  file of time period."""
+  start = preprocess.get_start(time_period)
+  recent = SHARED.frame(start)
+  if recent is not None:
+    return preprocess.summarize_df(recent, start)
+  data_path = configs.PREPROCESSED_DATA_PATHS[time_period]
+  if not os.path.exists(data_path):
+    return None
+  return pd.read_csv(data_path)
+
+
+def data_version(time_period: str):
+  """Identify the preprocessed file and configs a figure is built from.
+
+  The day figure is summarized from shared memory when held there, and is
+  then rebuilt whenever the preprocessed file is, about once a minute."""
+  paths = [configs.PREPROCESSED_DATA_PATHS[time_period], configs.CONFIGS_PATH]
+  return tuple(utils.file_etag(p) if os.path.exists(p) else None
+               for p in paths)
+
+
+def serve_fig(time_period: str):
+  """Serve figure of time period from the cache, building it if stale."""
+  return FIGURES.get(time_period, data_version(time_period),
+                     lambda: figure_data(create_fig(time_period)))
 
 
 def create_fig(time_period: str = 'all'):
   """Create plotly figure using one or two y-axes."""
 
-  data_path = configs.PREPROCESSED_DATA_PATHS[time_period]
+  df = load_data(time_period)
   # avoiding errors before any data is captured
-  if not os.path.exists(data_path):
+  if df is None:
     return go.Figure()
 
   fig = go.Figure()
   # see https://plotly.com/python/discrete-color/
   colors = iter(px.colors.qualitative.Bold)
-  df = pd.read_csv(data_path)
   sensor_headers, sensor_units = preprocess.determine_plot_configs()
 
   for i, (key, cols) in enumerate(sensor_headers.items()):
@@ -59,7 +92,8 @@ def create_fig(time_period: str = 'all'):
           opacity=opacity,
           line={'color': next(colors)},
           yaxis=yaxis,
-          visible=visible
+          visible=visible,
+          connectgaps=True  # sensors read at other rates leave gaps
       ))
 
     fig.update_layout(**layout_params)
@@ -122,17 +156,66 @@ plot.layout = html.Div(children=[
     dcc.Interval(
         id='interval-component',
         interval=5 * 60 * 1000,  # 5 minutes
+    ),
+
+    # for appending rows pushed by /stream to the day plot
+    dcc.Interval(
+        id='live-interval',
+        interval=LIVE_INTERVAL * 1000
     )
 ])
 
 
+# Rows from /stream are buffered in the browser and appended to the traces
+# of the same name with extendData, so the server does no work per update.
+plot.clientside_callback(
+    """
+    function(_, figure) {
+      var live = window.bairyLive;
+      if (live === undefined) {
+        live = window.bairyLive = {rows: []};
+        new EventSource('/stream').onmessage = function(e) {
+          live.rows.push(JSON.parse(e.data));
+          live.rows.splice(0, live.rows.length - %(max_rows)d);
+        };
+      }
+      if (!figure || !figure.data || !live.rows.length) {
+        return window.dash_clientside.no_update;
+      }
+      var rows = live.rows.splice(0), x = [], y = [], indices = [];
+      figure.data.forEach(function(trace, i) {
+        var xs = [], ys = [];
+        rows.forEach(function(row) {
+          if (row[trace.name] !== undefined) {
+            xs.push(row.time);
+            ys.push(row[trace.name]);
+          }
+        });
+        if (xs.length) {
+          x.push(xs);
+          y.push(ys);
+          indices.push(i);
+        }
+      });
+      if (!indices.length) {
+        return window.dash_clientside.no_update;
+      }
+      return [{x: x, y: y}, indices, %(max_points)d];
+    }
+    """ % {'max_rows': LIVE_ROWS, 'max_points': LIVE_MAX_POINTS},
+    Output('plot_day', 'extendData'),
+    Input('live-interval', 'n_intervals'),
+    State('plot_day', 'figure')
+)
+
+
 @plot.callback(
     Output('plot_day', 'figure'),
     Input('interval-component', 'n_intervals')
 )
 def serve_plot_day(_):
   """Dynamically serve dash_plot.layout."""
-  return create_fig('day')
+  return serve_fig('day')
 
 
 @plot.callback(
@@ -141,7 +224,7 @@ def serve_plot_day(_):
 )
 def serve_plot_week(_):
   """Dynamically serve dash_plot.layout."""
-  return create_fig('week')
+  return serve_fig('week')
 
 
 @plot.callback(
@@ -150,4 +233,4 @@ def serve_plot_week(_):
 )
 def serve_plot_all(_):
   """Dynamically serve dash_plot.layout."""
-  return create_fig('all')
+  return serve_fig('all')
@@ -1,14 +1,16 @@
 """Create dash table for /table endpoint."""
 
 import os
-import pandas as pd
 from dash import Dash
 from dash.dependencies import Input, Output
 from dash_table import DataTable
 import dash_core_components as dcc
 import dash_html_components as html
 from bairy.device.dash_plot import css
-from bairy.device import configs
+from bairy.device import configs, utils
+from bairy.device.paging import read_pages
+
+PAGE_SIZE = 50  # rows sent to the browser at once
 
 table = Dash(
     requests_pathname_prefix='/table/',
@@ -34,6 +36,14 @@ table.layout = html.Div(children=[
     # table
     DataTable(
         id='table',
+        page_action='custom',  # paging, sorting and filtering on the server
+        page_current=0,
+        page_size=PAGE_SIZE,
+        sort_action='custom',
+        sort_mode='single',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
         style_cell=dict(textAlign='left'),
         style_header=dict(backgroundColor="paleturquoise"),
         style_data=dict(backgroundColor="lavender")
@@ -50,21 +60,25 @@ table.layout = html.Div(children=[
 
 
 @table.callback(
-    [Output('table', 'columns'), Output('table', 'data')],
-    Input('interval-component', 'n_intervals')
+    [Output('table', 'columns'), Output('table', 'data'),
+     Output('table', 'page_count')],
+    [Input('interval-component', 'n_intervals'),
+     Input('table', 'page_current'), Input('table', 'page_size'),
+     Input('table', 'sort_by'), Input('table', 'filter_query')]
 )
-def serve_table(_):
-  """Dynamically serve table columns and data."""
+def serve_table(_, page_current, page_size, sort_by, filter_query):
+  """Dynamically serve table columns and the rows of the current page."""
 
   data_path = configs.PREPROCESSED_DATA_PATHS['day']
   # avoiding errors before any data is captured
   if not os.path.exists(data_path):
-    return None, None
+    return None, None, 1
 
-  df = pd.read_csv(data_path, index_col=0)
-  df = df.iloc[::-1]
-  df.index = df.index.astype(str)
-  df = df.round(3)
-  columns = [{'name': i, 'id': i} for i in df.columns]
-  data = df.to_dict('records')
-  return columns, data
+  pages = read_pages(data_path, utils.file_etag(data_path))
+  columns = [{'name': i, 'id': i} for i in pages.df.columns]
+  try:
+    data, page_count = pages.page(page_current or 0, page_size or PAGE_SIZE,
+                                  sort_by, filter_query)
+  except ValueError:  # unknown column or malformed filter value
+    data, page_count = [], 1
+  return columns, data, page_count
@@ -0,0 +1,365 @@
+"""Read device data from whichever storage backend is configured."""
+
+from __future__ import annotations
+from typing import IO, Any, Iterator
+import io
+import os
+import glob
+import logging
+import pandas as pd
+from bairy.device import configs, utils, partitions
+from bairy.device.segments import SegmentStore
+from bairy.device.index import SparseIndex, read_range
+from bairy.device.timestamps import TIME_FORMAT, format_time, from_epoch, \
+    local_to_utc, parse_time, to_epoch
+
+
+def get_backend():
+  """Get storage backend from device configs."""
+  return configs.load_device().storage.backend
+
+
+def load_df(start: pd.Timestamp | None = None):
+  """Load data since UTC time start as a DataFrame with a parsed time column."""
+  epoch = None if start is None else to_epoch(start)
+  if get_backend() == 'segments':
+    return SegmentStore(configs.SEGMENTS_DIR).read_df(epoch)
+
+  # scanning only closed partitions overlapping the range, then seeking
+  # within the active file with the index maintained by the writer
+  dfs = [read_partition(p) for p in partitions.list_partitions(
+      configs.PARTITIONS_DIR) if p.overlaps(start)]
+  dfs.append(read_range(configs.DATA_PATH, configs.DATA_INDEX_PATH, epoch))
+  df = pd.concat(dfs, ignore_index=True)
+  df['time'] = pd.to_datetime(df['time'])
+  if start is not None:
+    df = df[df['time'] > start]
+  return df
+
+
+def read_new(cursor: dict[str, Any] | None, max_bytes: int = 1 << 26):
+  """Read rows appended since cursor was returned by a previous call.
+
+  Returns the new rows, a cursor for the next call and whether the data was
+  removed or replaced since cursor was taken, in which case rows are read
+  from the beginning. At most about max_bytes of CSV are read per call."""
+  if get_backend() == 'segments':
+    store = SegmentStore(configs.SEGMENTS_DIR)
+    reset = cursor is None or cursor.get('backend') != 'segments'
+    result = None if reset else store.read_after(cursor['segment'],
+                                                 cursor['row'])
+    if result is None:
+      reset = True
+      result = store.read_after(None)
+    df, name, row = result
+    return df, {'backend': 'segments', 'segment': name, 'row': row}, reset
+
+  index = SparseIndex.load(configs.DATA_INDEX_PATH)
+  with open(configs.DATA_PATH, 'rb') as f:
+    size = os.fstat(f.fileno()).st_size
+    headers = f.readline()
+    line = f.readline()
+    first = line.split(b',', 1)[0].decode() if line.endswith(b'\n') else None
+    committed = size if index is None else min(index.offset, size)
+
+    dfs = []
+    valid = cursor is not None and cursor.get('backend') == 'csv' and \
+        'first' in cursor
+    if valid and cursor['first'] is not None and cursor['first'] == first:
+      reset = cursor['offset'] > committed
+      offset = len(headers) if reset else cursor['offset']
+    else:
+      # rows since cursor, if any, were rotated into closed partitions
+      found = read_partitions(cursor) if valid else None
+      reset = found is None
+      dfs = read_partitions(None) if reset else found
+      offset = len(headers)
+
+    f.seek(offset)
+    data = f.read(max(min(committed - offset, max_bytes), 0))
+    data = data[:data.rfind(b'\n') + 1]  # only complete rows
+
+  dfs.append(pd.read_csv(io.BytesIO(headers + data)))
+  df = pd.concat(dfs, ignore_index=True)
+  last = cursor.get('last') if valid and not reset else None
+  if not df.empty:
+    last = df['time'].iloc[-1]
+  # parsing without a format as older rows lack milliseconds
+  df['time'] = pd.to_datetime(df['time'])
+  cursor = {'backend': 'csv', 'first': first, 'offset': offset + len(data),
+            'last': last}
+  return df, cursor, reset
+
+
+def read_partition(partition: partitions.Partition, offset: int = 0):
+  """Read rows of a closed partition from byte offset onward."""
+  with partition.open() as f:
+    headers = f.readline()
+    if offset > len(headers):
+      f.seek(offset)
+    data = f.read()
+  return pd.read_csv(io.BytesIO(headers + data))
+
+
+def read_partitions(cursor: dict[str, Any] | None):
+  """Read closed partitions holding rows beyond cursor.
+
+  Returns None if the partition the cursor was reading no longer exists."""
+  closed = partitions.list_partitions(configs.PARTITIONS_DIR)
+  if cursor is None:
+    return [read_partition(p) for p in closed]
+  if cursor['first'] is None:  # cursor was at the start of an empty file
+    if cursor.get('last') is None:
+      return [read_partition(p) for p in closed]
+    last = parse_time(cursor['last'])
+    return [read_partition(p) for p in closed if p.first > last]
+
+  i = partitions.find_partition(closed, parse_time(cursor['first']))
+  if i is None:
+    return None
+  dfs = [read_partition(closed[i], cursor['offset'])]
+  return dfs + [read_partition(p) for p in closed[i + 1:]]
+
+
+def count_rows():
+  """Count rows of data including a line of headers."""
+  if get_backend() == 'segments':
+    # matching the number of lines in the CSV exported by iter_csv
+    return SegmentStore(configs.SEGMENTS_DIR).count_rows() + 1
+  closed = partitions.list_partitions(configs.PARTITIONS_DIR)
+  return utils.count_rows(configs.DATA_PATH) + \
+      sum(partitions.count_rows(p) for p in closed)
+
+
+def data_size():
+  """Return the size of raw data in bytes."""
+  if get_backend() == 'segments':
+    paths = glob.glob(os.path.join(configs.SEGMENTS_DIR, '*.seg'))
+  else:
+    paths = [p.path for p in partitions.list_partitions(configs.PARTITIONS_DIR)]
+    paths.append(configs.DATA_PATH)
+  paths = [p for p in paths if os.path.exists(p)]
+  return sum(os.path.getsize(p) for p in paths)
+
+
+def get_data_size():
+  """Return the size of raw data as a string."""
+  return utils.format_size(data_size())
+
+
+def first_time() -> str | None:
+  """Get time of the earliest row, or None if there is no data."""
+  if get_backend() == 'segments':
+    for segment in SegmentStore(configs.SEGMENTS_DIR).segments():
+      if segment.n_rows:
+        return format_time(from_epoch(segment.header['min_time']))
+    return None
+
+  closed = partitions.list_partitions(configs.PARTITIONS_DIR)
+  for partition in closed:
+    with partition.open() as f:
+      f.readline()  # headers
+      line = f.readline()
+    if line.endswith(b'\n'):
+      return line.split(b',', 1)[0].decode()
+  times = partitions.read_row_times(configs.DATA_PATH)
+  return None if times is None else format_time(times[0])
+
+
+def latest() -> dict[str, Any]:
+  """Get most recent reading as a dictionary."""
+  if get_backend() == 'segments':
+    return SegmentStore(configs.SEGMENTS_DIR).latest()
+  return utils.latest_data()
+
+
+def columns() -> list[str]:
+  """List sensor headers of stored data."""
+  if get_backend() == 'segments':
+    return SegmentStore(configs.SEGMENTS_DIR).headers()
+  return utils.read_headers().split(',')[1:]
+
+
+def iter_frames(start: pd.Timestamp | None = None,
+                end: pd.Timestamp | None = None,
+                columns: list[str] | None = None) -> Iterator[pd.DataFrame]:
+  """Read rows within [start, end) of columns, a chunk at a time.
+
+  Cells are kept as written in data.csv, with times as strings and missing
+  readings empty, so chunks convert back to CSV unchanged. Only closed
+  partitions overlapping the range are read, and the active file is read
+  from the index entry preceding start."""
+  if get_backend() == 'segments':
+    store = SegmentStore(configs.SEGMENTS_DIR)
+    columns = store.headers() if columns is None else columns
+    for df in store.iter_frames(None if start is None else to_epoch(start),
+                                None if end is None else to_epoch(end),
+                                columns):
+      yield df.reindex(columns=['time'] + columns)
+    return
+
+  if columns is None:
+    columns = utils.read_headers().split(',')[1:]
+  # dropping zero milliseconds so bounds also compare right against rows
+  # written at second resolution by earlier versions
+  bounds = tuple(None if t is None else strip_zero_ms(format_time(t))
+                 for t in (start, end))
+  for partition in partitions.list_partitions(configs.PARTITIONS_DIR):
+    if partition.overlaps(start, end):
+      with partition.open() as f:
+        yield from select_rows(f, f.readline(), bounds, columns)
+
+  index = SparseIndex.load(configs.DATA_INDEX_PATH)
+  with open(configs.DATA_PATH, 'rb') as f:
+    size = os.fstat(f.fileno()).st_size
+    headers = f.readline()
+    committed = size if index is None else min(index.offset, size)
+    offset = len(headers)
+    found = None if index is None or start is None else \
+        index.lookup(to_epoch(start))
+    if found is not None:
+      offset = max(found[0], offset)
+    f.seek(offset)
+    yield from select_rows(f, headers, bounds, columns, committed - offset)
+
+
+def strip_zero_ms(text: str):
+  """Drop zero milliseconds from a formatted time."""
+  return text[:-4] if text.endswith('.000') else text
+
+
+def select_rows(f: IO[bytes], headers: bytes,
+                bounds: tuple[str | None, str | None], columns: list[str],
+                limit: int | None = None, chunk_size: int = 1 << 20):
+  """Read rows of a data file within time bounds, a chunk at a time.
+
+  Reads at most limit bytes and stops at the first row beyond the end."""
+  start, end = bounds
+  for block in read_lines(f, limit, chunk_size):
+    df = pd.read_csv(io.BytesIO(headers + block), dtype=str,
+                     keep_default_na=False)
+    # times as written sort as strings
+    if start is not None:
+      df = df[df['time'] >= start]
+    done = end is not None and not df.empty and df['time'].iloc[-1] >= end
+    if end is not None:
+      df = df[df['time'] < end]
+    yield df.reindex(columns=['time'] + columns, fill_value='')
+    if done:
+      return
+
+
+def read_lines(f: IO[bytes], limit: int | None = None,
+               chunk_size: int = 1 << 20) -> Iterator[bytes]:
+  """Read blocks of complete lines, of at most limit bytes in total."""
+  rest = b''
+  while limit is None or limit > 0:
+    chunk = f.read(chunk_size if limit is None else min(chunk_size, limit))
+    if not chunk:
+      break
+    if limit is not None:
+      limit -= len(chunk)
+    chunk = rest + chunk
+    end = chunk.rfind(b'\n') + 1
+    rest = chunk[end:]
+    if end:
+      yield chunk[:end]
+
+
+def migrate_local_times(path: str | None = None,
+                        index_path: str | None = None):
+  """Rewrite rows stamped in local time by earlier versions in UTC.
+
+  These rows are at the start of the file, data.csv by default, and lack
+  milliseconds. Returns whether the file was rewritten, in which case its
+  index is removed to be rebuilt by the writer."""
+  if path is None:
+    path = configs.DATA_PATH
+  if index_path is None:
+    index_path = configs.DATA_INDEX_PATH
+  with open(path, 'rb') as f:
+    headers = f.readline()
+    first = f.readline().split(b',', 1)[0]
+  if not first or b'.' in first:
+    return False
+
+  logging.info('Converting local times in %s to UTC', path)
+  tmp_path = path + '.tmp'
+  with open(path, 'rb') as f, open(tmp_path, 'wb') as out:
+    out.write(f.readline())
+    for block in read_lines(f):
+      df = pd.read_csv(io.BytesIO(headers + block), dtype=str,
+                       keep_default_na=False)
+      local = ~df['time'].str.contains('.', regex=False)
+      times = local_to_utc(pd.to_datetime(df.loc[local, 'time']))
+      df.loc[local, 'time'] = times.dt.strftime(TIME_FORMAT).str[:-3]
+      out.write(df.to_csv(header=False, index=False).encode())
+  os.replace(tmp_path, path)
+  if os.path.exists(index_path):
+    os.remove(index_path)
+  return True
+
+
+def version(start: pd.Timestamp | None = None,
+            end: pd.Timestamp | None = None):
+  """Identify the files holding rows within [start, end) and their sizes.
+
+  The result changes whenever rows within the range may have changed."""
+  if get_backend() == 'segments':
+    store = SegmentStore(configs.SEGMENTS_DIR)
+    epochs = [None if t is None else to_epoch(t) for t in (start, end)]
+    return [(os.path.basename(s.path), s.n_rows) for s in store.segments()
+            if s.overlaps(*epochs)]
+
+  paths = [p.path for p in partitions.list_partitions(configs.PARTITIONS_DIR)
+           if p.overlaps(start, end)]
+  times = partitions.read_row_times(configs.DATA_PATH)
+  if end is None or times is None or times[0] < end:
+    paths.append(configs.DATA_PATH)
+  stats = [os.stat(p) for p in paths]
+  return [(os.path.basename(p), st.st_size, st.st_mtime_ns)
+          for p, st in zip(paths, stats)]
+
+
+def iter_csv() -> Iterator[bytes]:
+  """Stream all raw data as CSV."""
+  if get_backend() == 'segments':
+    for chunk in SegmentStore(configs.SEGMENTS_DIR).iter_csv():
+      yield chunk.encode()
+    return
+
+  with open(configs.DATA_PATH, 'rb') as f:
+    headers = f.readline()
+    yield headers
+    for partition in partitions.list_partitions(configs.PARTITIONS_DIR):
+      yield from iter_partition(partition, headers)
+    while True:
+      chunk = f.read(1 << 16)
+      if not chunk:
+        break
+      yield chunk
+
+
+def iter_partition(partition: partitions.Partition, headers: bytes):
+  """Stream rows of a closed partition as CSV under headers."""
+  with partition.open() as f:
+    if f.readline() != headers:
+      # sensors changed since partition was written, so aligning columns
+      df = pd.read_csv(f).reindex(columns=headers.decode().strip().split(','))
+      yield df.to_csv(header=False, index=False).encode()
+      return
+    while True:
+      chunk = f.read(1 << 16)
+      if not chunk:
+        break
+      yield chunk
+
+
+def remove_data():
+  """Remove raw data from every backend."""
+  paths = [configs.DATA_PATH, configs.DATA_INDEX_PATH, configs.STATE_PATH]
+  paths = [p for p in paths if os.path.exists(p)]
+  paths += glob.glob(os.path.join(configs.SEGMENTS_DIR, '*.seg'))
+  paths += glob.glob(os.path.join(configs.PARTITIONS_DIR, 'data_*'))
+  for path in paths:
+    os.remove(path)
@@ -1,17 +1,32 @@
 """Control IoT device by reading sensor values and writing data to disk."""
 
 from __future__ import annotations
+from typing import Any
 import os
+import time
 import asyncio
-from datetime import datetime
+from bairy.device import dataset
 from bairy.device.validate import DeviceConfigs
-from bairy.device.configs import DATA_PATH, load_device
-from bairy.log_configs import DATE_FORMAT
+from bairy.device.configs import DATA_PATH, DATA_INDEX_PATH, SEGMENTS_DIR, \
+    PARTITIONS_DIR, SENSOR_STATS_PATH, STATE_PATH, load_device, \
+    make_data_dirs
 from bairy.device.sensor import Sensor
+from bairy.device.drivers import create_sensor
+from bairy.device.reader import SensorReader
+from bairy.device.scheduler import Scheduler
+from bairy.device.timestamps import utcnow
+from bairy.device.segments import SegmentStore, columns_from_sensors
+from bairy.device.state import DataState
+from bairy.device.live import publish_row
+from bairy.device.ring import RingBuffer
+from bairy.device.writer import PartitionedWriter, SegmentWriter, format_row
+
+
+STATE_INTERVAL = 1.0  # seconds between saves of the status summary
 
 
 def read_sensors(sensors: list[Sensor]):
-  """Read sensor values."""
+  """Read sensor values one after another; run_device uses a SensorReader."""
   data: dict[str, int | None] = {}
   for s in sensors:
     reading = s.read()
@@ -22,12 +37,12 @@ def read_sensors(sensors: list[Sensor]):
   return data
 
 
-def write_data(data: dict[str, int | None]):
-  """Create a data file if none exists and append data to end."""
-  time = datetime.now().strftime(DATE_FORMAT)
-  values_as_str = [str(v) if v is not None else '' for v in data.values()]
-  row = time + ',' + ','.join(values_as_str) + '\n'
-  with open(DATA_PATH, 'a') as f:
+def write_data(data: dict[str, int | None], path: str = DATA_PATH):
+  """Append a single row of data to end of file.
+
+  Opens and closes the file on every call; run_device uses a DataWriter."""
+  row = format_row(data, utcnow())
+  with open(path, 'a') as f:
     f.write(row)
 
 
@@ -36,31 +51,73 @@ def create_data_file(sensors: list[Sensor]):
 
   # taking an initial reading to get header values
   data = read_sensors(sensors)
-  headers = data.keys()
+  headers = list(data.keys())
+  make_data_dirs()
 
   if not os.path.exists(DATA_PATH):
-    headers = 'time,' + ','.join(headers) + '\n'
     with open(DATA_PATH, 'w') as f:
-      f.write(headers)
+      f.write('time,' + ','.join(headers) + '\n')
+  else:
+    dataset.migrate_local_times()
+  return headers
 
 
 def initialize_device(device: DeviceConfigs | None = None):
   """Helper function for run device."""
   if device is None:
     device = load_device()
-  sensors = [Sensor(s) for s in device.sensors]
+  sensors = [create_sensor(s) for s in device.sensors]
+  for s in sensors:
+    if s.interval is None:
+      s.interval = device.update_interval
+  # ordering columns fastest first, so rows holding only the faster sensors
+  # end early without trailing empty cells
+  sensors.sort(key=lambda s: s.interval)
   create_data_file(sensors)
   return device, sensors
 
 
-async def run_device():
-  """Run device indefinitely."""
+def create_writer(device: DeviceConfigs, sensors: list[Sensor]):
+  """Create a writer for the configured storage backend."""
+  if device.storage.backend == 'segments':
+    store = SegmentStore(SEGMENTS_DIR, device.storage.segment_rows)
+    columns = columns_from_sensors(sensors)
+    return SegmentWriter.from_configs(store, columns, device.storage)
+  headers = [h for s in sensors for h in s.headers]
+  return PartitionedWriter.from_configs(DATA_PATH, headers, device.storage,
+                                        DATA_INDEX_PATH, PARTITIONS_DIR)
+
+
+async def run_device(live: Any = None, ring: RingBuffer | None = None):
+  """Run device indefinitely, putting each row on the live queue and into
+  the shared ring buffer if given."""
   device, sensors = initialize_device()
+  writer = create_writer(device, sensors)
+  reader = SensorReader(sensors, device.read_workers, SENSOR_STATS_PATH)
+  scheduler = Scheduler([s.interval for s in sensors], device.missed_ticks)
+  state = DataState.resume(STATE_PATH, [h for s in sensors for h in s.headers])
+  state.save(STATE_PATH)
 
   async def run():
-    while True:
-      data = read_sensors(sensors)
-      write_data(data)
-      await asyncio.sleep(device.update_interval)
+    last_save = time.monotonic()
+    try:
+      async for _, due in scheduler:
+        now = utcnow()  # stamping rows with the start of the tick
+        data = await reader.read(due)
+        writer.write(data, now)
+        state.update(data, now)
+        if live is not None:
+          publish_row(live, data, now)
+        if ring is not None:
+          ring.write(data, now)
+        if time.monotonic() - last_save >= STATE_INTERVAL:
+          last_save = time.monotonic()
+          # the sampler alone writes the ring, so it drops removed rows
+          if state.save(STATE_PATH) and ring is not None:
+            ring.reset()
+    finally:  # flushing buffered rows on cancellation or error
+      reader.close()
+      writer.close()
+      state.save(STATE_PATH)  # recording the final size of data
 
   return await asyncio.create_task(run())
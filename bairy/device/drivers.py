@@ -0,0 +1,50 @@
+"""Registry of sensor drivers, keyed by sensor type.
+
+Built in drivers are always available. Other packages can add drivers by
+declaring an entry point in the bairy.drivers group, named by sensor type
+and pointing at a subclass of bairy.device.sensor.Sensor, for instance
+
+    entry_points={'bairy.drivers': ['thermo = bairy_thermo:ThermoSensor']}
+
+Entry points are only searched for sensor types that are not built in."""
+
+from __future__ import annotations
+from typing import Any
+from pydantic import BaseModel
+from bairy.device.sensor import Sensor, AirSensor, DigitalSensor, RandomSensor
+
+
+ENTRY_POINT_GROUP = 'bairy.drivers'
+DRIVERS: dict[str, type[Sensor]] = {d.sensor_type: d for d in
+                                    [AirSensor, DigitalSensor, RandomSensor]}
+
+
+def load_entry_points():
+  """Register drivers declared by installed packages."""
+  # importing pkg_resources is slow, so only when a driver is missing
+  import pkg_resources  # pylint: disable=import-outside-toplevel
+  for entry_point in pkg_resources.iter_entry_points(ENTRY_POINT_GROUP):
+    if entry_point.name not in DRIVERS:
+      DRIVERS[entry_point.name] = entry_point.load()
+
+
+def get_driver(sensor_type: str):
+  """Find the driver class for a sensor type."""
+  if sensor_type not in DRIVERS:
+    load_entry_points()
+  if sensor_type not in DRIVERS:
+    raise ValueError(f'No driver found for sensor type {sensor_type}')
+  return DRIVERS[sensor_type]
+
+
+def parse_configs(configs: dict[str, Any] | BaseModel):
+  """Validate configs of a single sensor with the model of its driver."""
+  if isinstance(configs, BaseModel):
+    configs = configs.dict()
+  driver = get_driver(configs.get('sensor_type', ''))
+  return driver.config_model(**configs)
+
+
+def create_sensor(configs: BaseModel, **kwargs: Any) -> Sensor:
+  """Create a sensor from its validated configs."""
+  return get_driver(configs.sensor_type)(configs, **kwargs)
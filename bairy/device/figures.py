@@ -0,0 +1,57 @@
+"""Cache results built from data, such as figures of the dashboards.
+
+Every browser tab showing a dashboard requests each figure on its own, so a
+figure is built once per version of the data it shows and shared between
+all of them. Concurrent requests for a stale result wait for a single build
+rather than each building it. The device and the hub share this cache."""
+
+from __future__ import annotations
+from typing import Any, Callable, Hashable
+import json
+import threading
+
+
+class ResultCache:
+  """Latest result built for each key, rebuilt when its version changes."""
+
+  def __init__(self):
+    self.entries: dict[Hashable, tuple[Hashable, Any]] = {}
+    self.locks: dict[Hashable, threading.Lock] = {}
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key: Hashable, version: Hashable, build: Callable[[], Any]):
+    """Return result cached for key at version, calling build unless
+    another request already is."""
+    entry = self.entries.get(key)
+    if entry is not None and entry[0] == version:
+      self.hits += 1
+      return entry[1]
+
+    with self.lock:
+      key_lock = self.locks.setdefault(key, threading.Lock())
+    with key_lock:  # single flight, so others wait for this build
+      entry = self.entries.get(key)
+      if entry is not None and entry[0] == version:
+        self.hits += 1
+        return entry[1]
+      result = build()
+      self.entries[key] = (version, result)
+      self.misses += 1
+      return result
+
+  def stats(self):
+    """Summarize hits and misses."""
+    return {'hits': self.hits, 'misses': self.misses,
+            'entries': len(self.entries)}
+
+
+def figure_data(figure: Any) -> dict[str, Any]:
+  """Serialize a plotly figure once, leaving Dash only plain lists to
+  encode."""
+  return json.loads(figure.to_json())
+
+
+# shared by every callback of the /plot dashboard
+FIGURES = ResultCache()
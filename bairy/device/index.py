@@ -0,0 +1,197 @@
+"""Maintain a sparse index from time to byte offset alongside data.csv.
+
+The index file starts with a fixed header holding the committed offset and
+row count of the data file, that is, the end of the last complete row the
+writer has flushed. It is followed by fixed-width entries, one for the first
+row within each interval, recording its epoch time, byte offset and row
+number. Readers seek to the entry preceding the time they need and read up
+to the committed offset, so they never parse a half-written line."""
+
+from __future__ import annotations
+import io
+import os
+import struct
+import numpy as np
+import pandas as pd
+from bairy.device import timestamps
+
+
+MAGIC = b'BAIRYIDX'
+HEADER = struct.Struct('<8sqqd')  # magic, offset, rows, interval
+ENTRY_DTYPE = np.dtype([('time', '<f8'), ('offset', '<i8'), ('row', '<i8')])
+CHUNK_SIZE = 1 << 22
+
+
+def parse_time(time: bytes | str):
+  """Convert a time as written in data.csv into epoch seconds."""
+  return timestamps.to_epoch(timestamps.parse_time(time))
+
+
+class SparseIndex:
+  """Sparse time to byte offset index of a CSV data file."""
+
+  def __init__(self, path: str, interval: float = 60.0):
+    self.path = path
+    self.interval = interval
+    self.offset = 0  # committed offset into data file
+    self.rows = 0  # committed number of rows, excluding headers
+    self.entries = np.zeros(0, ENTRY_DTYPE)
+    self.pending: list[tuple[float, int, int]] = []
+    self.last_key: float | None = None
+
+  @classmethod
+  def load(cls, path: str):
+    """Read index from disk, returning None if missing or corrupt."""
+    try:
+      with open(path, 'rb') as f:
+        raw = f.read(HEADER.size)
+        magic, offset, rows, interval = HEADER.unpack(raw)
+        entries = np.fromfile(f, ENTRY_DTYPE)
+    except (FileNotFoundError, struct.error):
+      return None
+    if magic != MAGIC:
+      return None
+
+    index = cls(path, interval)
+    index.offset, index.rows, index.entries = offset, rows, entries
+    if len(entries):
+      index.last_key = entries['time'][-1] // interval
+    return index
+
+  @classmethod
+  def open(cls, path: str, data_path: str, interval: float = 60.0):
+    """Load index for data_path, rebuilding or extending it if stale."""
+    index = cls.load(path)
+    if index is None or index.interval != interval or \
+            not index.is_valid(data_path):
+      index = cls(path, interval)
+      index.reset()
+    index.scan(data_path)
+    return index
+
+  def is_valid(self, data_path: str):
+    """Check that the index describes the current data file."""
+    if not os.path.exists(data_path):
+      return False
+    if os.path.getsize(data_path) < self.offset:
+      return False  # data file was truncated or replaced
+    if len(self.entries) == 0:
+      return True
+
+    # the final entry must still point at the start of a row with its time
+    time, offset, _ = self.entries[-1]
+    with open(data_path, 'rb') as f:
+      f.seek(offset)
+      line = f.readline()
+    try:
+      return parse_time(line.split(b',', 1)[0]) == time
+    except ValueError:
+      return False
+
+  def reset(self):
+    """Forget all entries and truncate index file."""
+    self.offset, self.rows = 0, 0
+    self.entries = np.zeros(0, ENTRY_DTYPE)
+    self.pending = []
+    self.last_key = None
+    with open(self.path, 'wb') as f:
+      f.write(HEADER.pack(MAGIC, 0, 0, self.interval))
+
+  def observe(self, time: float, offset: int, row: int):
+    """Record a row, adding an entry if it starts a new interval."""
+    key = time // self.interval
+    if key != self.last_key:
+      self.last_key = key
+      self.pending.append((time, offset, row))
+
+  def commit(self, offset: int, rows: int):
+    """Append pending entries and advance committed offset."""
+    with open(self.path, 'r+b') as f:
+      if self.pending:
+        entries = np.array(self.pending, ENTRY_DTYPE)
+        f.seek(0, os.SEEK_END)
+        f.write(entries.tobytes())
+        self.entries = np.concatenate([self.entries, entries])
+        self.pending = []
+      # committing only after entries are in place
+      f.flush()
+      os.pwrite(f.fileno(), HEADER.pack(MAGIC, offset, rows, self.interval), 0)
+    self.offset, self.rows = offset, rows
+
+  def scan(self, data_path: str):
+    """Index rows beyond the committed offset, for instance after a crash.
+
+    Rows are split on newlines with numpy and times are only parsed where
+    the timestamp prefix changes, so rebuilding is fast."""
+    if not os.path.exists(data_path):
+      return
+    # minute resolution is enough to spot new intervals of a minute or more
+    prefix = 16 if self.interval >= 60 else 19
+
+    with open(data_path, 'rb') as f:
+      offset, row = self.offset, self.rows
+      if offset == 0:
+        offset = len(f.readline())  # skipping headers
+      f.seek(offset)
+      last_prefix = None
+
+      while True:
+        chunk = f.read(CHUNK_SIZE)
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:  # nothing or only a partial row remains
+          break
+        buf = np.frombuffer(chunk, np.uint8, end)
+        newlines = np.flatnonzero(buf == ord('\n'))
+        starts = np.concatenate([[0], newlines[:-1] + 1])
+
+        positions = np.minimum(starts[:, None] + np.arange(prefix), end - 1)
+        prefixes = buf[positions].copy().view(f'S{prefix}').ravel()
+        changed = np.ones(len(prefixes), bool)
+        changed[1:] = prefixes[1:] != prefixes[:-1]
+        if last_prefix is not None:
+          changed[0] = prefixes[0] != last_prefix
+        last_prefix = prefixes[-1]
+
+        for i in np.flatnonzero(changed):
+          line_end = newlines[i]
+          time = chunk[starts[i]:line_end].split(b',', 1)[0]
+          try:
+            self.observe(parse_time(time), offset + int(starts[i]), row + int(i))
+          except ValueError:  # skipping unparsable rows
+            continue
+
+        offset += end
+        row += len(newlines)
+        f.seek(offset)
+
+    self.commit(offset, row)
+
+  def lookup(self, start: float):
+    """Find offset and row number of the indexed row preceding start."""
+    i = int(np.searchsorted(self.entries['time'], start, side='right')) - 1
+    if i < 0:
+      return None
+    _, offset, row = self.entries[i]
+    return int(offset), int(row)
+
+
+def read_range(data_path: str, index_path: str, start: float | None = None):
+  """Read committed rows from about start onward into a DataFrame.
+
+  Falls back to reading the whole file if there is no usable index. The
+  result may include a few rows before start within the same interval."""
+  index = SparseIndex.load(index_path)
+  if index is None or not os.path.exists(data_path) or \
+          os.path.getsize(data_path) < index.offset:
+    return pd.read_csv(data_path)
+
+  with open(data_path, 'rb') as f:
+    headers = f.readline()
+    offset = len(headers)
+    if start is not None:
+      found = index.lookup(start)
+      if found is not None:
+        offset = found[0]
+    f.seek(offset)
+    data = f.read(max(index.offset - offset, 0))
+  return pd.read_csv(io.BytesIO(headers + data))
@@ -0,0 +1,99 @@
+"""Push new readings from the sampler to live viewers of the app.
+
+The sampler runs in the main process and the app in another, so each row is
+put on a bounded multiprocessing queue. A thread of the app relays rows from
+that queue to a Broadcaster on the app's event loop, which fans them out to
+the queue of every subscriber. A slow subscriber never blocks the sampler or
+other subscribers: once its queue is full, its oldest rows are dropped."""
+
+from __future__ import annotations
+from typing import Any
+import json
+import queue
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from bairy.device.timestamps import format_time
+
+
+SOURCE_SIZE = 1000  # rows held for the app before the sampler drops them
+SUBSCRIBER_SIZE = 100  # rows held for each subscriber
+KEEPALIVE = 15.0  # seconds between comments keeping idle streams open
+
+
+def publish_row(source: Any, data: dict[str, int | None], now: datetime):
+  """Put a row read at time now on source without blocking the sampler."""
+  row = {k: v for k, v in data.items() if v is not None}
+  row['time'] = format_time(now)
+  try:
+    source.put_nowait(row)
+  except queue.Full:  # the app is not keeping up, so dropping the row
+    pass
+
+
+class Broadcaster:
+  """Fan out rows to the bounded queue of each subscriber.
+
+  Methods are called from the event loop of the app only."""
+
+  def __init__(self, maxsize: int = SUBSCRIBER_SIZE):
+    self.maxsize = maxsize
+    self.subscribers: set[asyncio.Queue[dict[str, Any]]] = set()
+    self.published = 0
+    self.dropped = 0
+
+  def subscribe(self):
+    """Create a queue receiving each row published from now on."""
+    q: asyncio.Queue[dict[str, Any]] = asyncio.Queue(self.maxsize)
+    self.subscribers.add(q)
+    return q
+
+  def unsubscribe(self, q: asyncio.Queue[dict[str, Any]]):
+    """Stop publishing rows to queue."""
+    self.subscribers.discard(q)
+
+  def publish(self, row: dict[str, Any]):
+    """Put row on every queue, dropping the oldest row of a full queue."""
+    self.published += 1
+    for q in self.subscribers:
+      if q.full():
+        q.get_nowait()
+        self.dropped += 1
+      q.put_nowait(row)
+
+  def relay(self, source: Any):
+    """Publish rows from source in a daemon thread until it yields None."""
+    loop = asyncio.get_running_loop()
+
+    def run():
+      while True:
+        try:
+          row = source.get()
+        except (EOFError, OSError):  # the sampler process is gone
+          break
+        if row is None:
+          break
+        loop.call_soon_threadsafe(self.publish, row)
+      logging.info('Stopped relaying live rows')
+
+    threading.Thread(target=run, name='live-relay', daemon=True).start()
+
+  async def stream(self, keepalive: float = KEEPALIVE):
+    """Yield rows as server-sent events, with comments while idle."""
+    q = self.subscribe()
+    try:
+      while True:
+        try:
+          row = await asyncio.wait_for(q.get(), keepalive)
+        except asyncio.TimeoutError:
+          yield ': keepalive\n\n'
+          continue
+        yield f'data: {json.dumps(row)}\n\n'
+    finally:  # also on disconnect, which cancels the stream
+      self.unsubscribe(q)
+
+  def stats(self):
+    """Summarize subscribers, published rows and dropped rows."""
+    return {'subscribers': len(self.subscribers),
+            'published': self.published, 'dropped': self.dropped}
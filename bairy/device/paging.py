@@ -0,0 +1,111 @@
+"""Serve pages of preprocessed data to the /table dashboard.
+
+The preprocessed file is parsed once per version into a columnar frame,
+newest rows first. Orders by each sorted column and masks of recent filter
+queries are cached alongside it, so each request only slices out the rows
+of its page and the payload is proportional to the page size."""
+
+from __future__ import annotations
+from typing import Any
+import math
+import functools
+import numpy as np
+import pandas as pd
+
+
+# filter operators of DataTable queries, as names and symbols
+OPERATORS = [['ge ', '>='], ['le ', '<='], ['lt ', '<'], ['gt ', '>'],
+             ['ne ', '!='], ['eq ', '='], ['contains '], ['datestartswith ']]
+MAX_MASKS = 32  # filter queries whose masks are kept
+
+
+def split_filter_part(part: str):
+  """Split a single condition of a filter query into column, operator and
+  value, as in the DataTable documentation."""
+  for names in OPERATORS:
+    for name in names:
+      if name not in part:
+        continue
+      column_part, value_part = part.split(name, 1)
+      column = column_part[column_part.find('{') + 1:column_part.rfind('}')]
+      value = value_part.strip()
+      if value and value[0] == value[-1] and value[0] in '\'"`':
+        value = value[1:-1].replace('\\' + value[0], value[0])
+      return column, names[0].strip(), value
+  raise ValueError(f'Unknown filter {part}')
+
+
+def condition_mask(series: pd.Series, operator: str, value: str):
+  """Evaluate a single condition on every row of series."""
+  if operator in ['contains', 'datestartswith']:
+    text = series.astype(str)
+    if operator == 'contains':
+      return text.str.contains(value, regex=False).to_numpy()
+    return text.str.startswith(value).to_numpy()
+
+  if pd.api.types.is_numeric_dtype(series):
+    target: Any = float(value)
+  else:
+    target = value
+  compare = {'ge': series.ge, 'le': series.le, 'lt': series.lt,
+             'gt': series.gt, 'ne': series.ne, 'eq': series.eq}[operator]
+  return compare(target).to_numpy()
+
+
+class Pages:
+  """A columnar frame of rows to page through, newest first."""
+
+  def __init__(self, df: pd.DataFrame):
+    self.df = df.reset_index(drop=True)
+    self.orders: dict[tuple[str, bool], np.ndarray] = {}
+    self.masks: dict[str, np.ndarray] = {}
+
+  def __len__(self):
+    return len(self.df)
+
+  def order(self, column: str, ascending: bool):
+    """Positions of rows sorted by column, computed once."""
+    key = (column, ascending)
+    if key not in self.orders:
+      values = self.df[column].sort_values(ascending=ascending, kind='stable',
+                                           na_position='last')
+      self.orders[key] = values.index.to_numpy()
+    return self.orders[key]
+
+  def mask(self, query: str):
+    """Rows matching every condition of a filter query, cached by query."""
+    if query not in self.masks:
+      mask = np.ones(len(self.df), bool)
+      for part in query.split(' && '):
+        column, operator, value = split_filter_part(part)
+        if column not in self.df:
+          raise ValueError(f'Unknown column {column}')
+        mask &= condition_mask(self.df[column], operator, value)
+      if len(self.masks) >= MAX_MASKS:
+        self.masks.pop(next(iter(self.masks)))
+      self.masks[query] = mask
+    return self.masks[query]
+
+  def page(self, page_current: int, page_size: int,
+           sort_by: list[dict[str, str]] | None = None,
+           filter_query: str | None = None):
+    """Get records of a page of sorted and filtered rows and page count."""
+    if sort_by:
+      positions = self.order(sort_by[0]['column_id'],
+                             sort_by[0]['direction'] == 'asc')
+    else:
+      positions = np.arange(len(self.df))
+    if filter_query:
+      positions = positions[self.mask(filter_query)[positions]]
+
+    page_count = max(math.ceil(len(positions) / page_size), 1)
+    start = min(page_current, page_count - 1) * page_size
+    rows = self.df.iloc[positions[start:start + page_size]]
+    return rows.to_dict('records'), page_count
+
+
+@functools.lru_cache(maxsize=1)
+def read_pages(path: str, version: str):
+  """Parse preprocessed file at path once for each version."""
+  df = pd.read_csv(path, index_col=0)
+  return Pages(df.iloc[::-1].round(3))
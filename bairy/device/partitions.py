@@ -0,0 +1,214 @@
+"""Rotate data.csv into time partitions, then compress and expire them.
+
+The active partition is always data.csv. When a reading falls into a new
+period, data.csv is moved into the partitions directory under a name holding
+the times of its first and last rows, and is compressed in the background.
+Readers use these names to scan only the partitions overlapping a range."""
+
+from __future__ import annotations
+from typing import IO, Iterator
+import os
+import re
+import glob
+import gzip
+import lzma
+import shutil
+import logging
+from datetime import datetime, timedelta
+from bairy.device.timestamps import utcnow, parse_time
+
+
+PERIODS = ['none', 'hour', 'day', 'week', 'month']
+COMPRESSIONS = {'none': '', 'gzip': '.gz', 'xz': '.xz', 'zstd': '.zst'}
+NAME_FORMAT = '%Y%m%dT%H%M%S'
+NAME_PATTERN = re.compile(r'data_(\d{8}T\d{6})_(\d{8}T\d{6})\.csv(\.\w+)?$')
+
+
+def period_key(t: datetime, period: str):
+  """Identify the period holding time t."""
+  if period == 'hour':
+    return t.year, t.month, t.day, t.hour
+  if period == 'day':
+    return t.year, t.month, t.day
+  if period == 'week':
+    return tuple(t.isocalendar()[:2])
+  if period == 'month':
+    return t.year, t.month
+  return ()
+
+
+class Partition:
+  """A closed partition file holding rows from first through last."""
+
+  def __init__(self, path: str, first: datetime, last: datetime):
+    self.path = path
+    self.first = first
+    self.last = last
+
+  @classmethod
+  def parse(cls, path: str):
+    """Parse partition from its file name, returning None if not one."""
+    match = NAME_PATTERN.search(os.path.basename(path))
+    if match is None:
+      return None
+    first = datetime.strptime(match.group(1), NAME_FORMAT)
+    last = datetime.strptime(match.group(2), NAME_FORMAT)
+    return cls(path, first, last)
+
+  @property
+  def compressed(self):
+    return not self.path.endswith('.csv')
+
+  def overlaps(self, start: datetime | None, end: datetime | None = None):
+    """Check if partition may hold rows within [start, end)."""
+    # names truncate the time of the last row to the second
+    if start is not None and self.last + timedelta(seconds=1) <= start:
+      return False
+    if end is not None and self.first >= end:
+      return False
+    return True
+
+  def open(self) -> IO[bytes]:
+    """Open partition for reading, decompressing if needed."""
+    if self.path.endswith('.gz'):
+      return gzip.open(self.path, 'rb')
+    if self.path.endswith('.xz'):
+      return lzma.open(self.path, 'rb')
+    if self.path.endswith('.zst'):
+      return zstd_module().open(self.path, 'rb')
+    return open(self.path, 'rb')
+
+  def iter_chunks(self, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """Stream decompressed contents of partition."""
+    with self.open() as f:
+      while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+          break
+        yield chunk
+
+
+def zstd_module():
+  """Import zstandard, which is only needed for zstd compression."""
+  try:
+    import zstandard  # pylint: disable=import-outside-toplevel
+  except ImportError as e:
+    raise ImportError('zstd compression requires pip install zstandard') from e
+  return zstandard
+
+
+def list_partitions(directory: str):
+  """List closed partitions sorted by time of first row.
+
+  If a partition exists both compressed and not, as while it is being
+  compressed, only the uncompressed file is listed."""
+  partitions: dict[datetime, Partition] = {}
+  for path in glob.glob(os.path.join(directory, 'data_*.csv*')):
+    partition = Partition.parse(path)
+    if partition is None:
+      continue
+    other = partitions.get(partition.first)
+    if other is None or other.compressed:
+      partitions[partition.first] = partition
+  return [partitions[k] for k in sorted(partitions)]
+
+
+def find_partition(partitions: list[Partition], first: datetime):
+  """Find the partition whose first row is at time first, if any."""
+  first = first.replace(microsecond=0)  # names hold whole seconds
+  for i, partition in enumerate(partitions):
+    if partition.first == first:
+      return i
+  return None
+
+
+def read_row_times(path: str):
+  """Read times of first and last rows of a data file, or None if empty."""
+  with open(path, 'rb') as f:
+    f.readline()  # headers
+    first = f.readline()
+    if not first.endswith(b'\n'):
+      return None
+    f.seek(-2, os.SEEK_END)
+    while f.read(1) != b'\n':
+      f.seek(-2, os.SEEK_CUR)
+    last = f.readline()
+
+  def parse(line: bytes):
+    return parse_time(line.split(b',', 1)[0])
+  return parse(first), parse(last)
+
+
+def rotate(data_path: str, directory: str, first: datetime, last: datetime):
+  """Move data file into partitions directory, returning its new path."""
+  if not os.path.exists(directory):
+    os.mkdir(directory)
+  name = f'data_{first.strftime(NAME_FORMAT)}_{last.strftime(NAME_FORMAT)}.csv'
+  path = os.path.join(directory, name)
+  os.replace(data_path, path)
+  logging.info('Rotated %s to %s', data_path, path)
+  return path
+
+
+def compress(path: str, compression: str):
+  """Compress a closed partition, replacing the uncompressed file."""
+  if compression == 'none' or not path.endswith('.csv'):
+    return path
+  compressed_path = path + COMPRESSIONS[compression]
+  tmp_path = compressed_path + '.tmp'
+  if compression == 'gzip':
+    opener = gzip.open
+  elif compression == 'xz':
+    opener = lzma.open
+  else:
+    opener = zstd_module().open
+
+  with open(path, 'rb') as src, opener(tmp_path, 'wb') as dst:
+    shutil.copyfileobj(src, dst, 1 << 20)
+  os.replace(tmp_path, compressed_path)
+  os.remove(path)
+  return compressed_path
+
+
+def apply_retention(directory: str, days: int | None,
+                    now: datetime | None = None):
+  """Remove partitions whose rows are all older than days."""
+  if days is None:
+    return []
+  if now is None:
+    now = utcnow()
+  cutoff = now - timedelta(days=days)
+  removed = []
+  for partition in list_partitions(directory):
+    if partition.last < cutoff:
+      os.remove(partition.path)
+      removed.append(partition.path)
+      logging.info('Removed expired partition %s', partition.path)
+  return removed
+
+
+def compact(directory: str, compression: str, days: int | None = None):
+  """Compress every closed partition and apply retention."""
+  if not os.path.exists(directory):
+    return [], []
+  for tmp_path in glob.glob(os.path.join(directory, '*.tmp')):
+    os.remove(tmp_path)  # left by interrupted compression
+
+  removed = apply_retention(directory, days)
+  compressed = []
+  for partition in list_partitions(directory):
+    if not partition.compressed and compression != 'none':
+      compressed.append(compress(partition.path, compression))
+  return compressed, removed
+
+
+_row_counts: dict[tuple[str, float], int] = {}
+
+
+def count_rows(partition: Partition):
+  """Count rows excluding headers; partitions are immutable so are cached."""
+  key = (partition.path, os.path.getmtime(partition.path))
+  if key not in _row_counts:
+    n = sum(chunk.count(b'\n') for chunk in partition.iter_chunks())
+    _row_counts[key] = n - 1
+  return _row_counts[key]
@@ -1,10 +1,21 @@
 """Preprocess data for Plotly/Dash."""
 
 from __future__ import annotations
-import itertools
+from typing import Any
+import os
+import json
 import asyncio
+import numpy as np
 import pandas as pd
-from bairy.device import configs
+from bairy.device import configs, dataset, drivers
+from bairy.device.rollup import RollupPyramid
+from bairy.device.downsample import downsample_df
+from bairy.device.timestamps import utcnow
+
+
+MAX_POINTS = 5000  # most buckets in any preprocessed file
+MIN_ROWS = 300  # fewer rows than this are not aggregated
+PLOT_METHOD = 'mean'  # one of downsample.METHODS
 
 
 def determine_plot_configs():
@@ -13,80 +24,176 @@ def determine_plot_configs():
   d = configs.load_device()
   # the order of the dictionaries below matter for plot tracing
   # order is least important to most important
-  sensor_headers: dict[str, list[str]] = {'random': [],
-                                          'digital': [],
-                                          'air': []}
-  sensor_units = {'random': 'random',
-                  'digital': 'intensity',
-                  'air': 'micrograms / cubic meter'}
-
-  for s in d.sensors:
-    if s.sensor_type == 'air':
-      sensor_headers['air'] += ['pm_1.0', 'pm_2.5', 'pm_10']
-    else:
-      sensor_headers[s.sensor_type].append(s.header)
-
-  # cleanup dictionaries
-  empties = [k for k in sensor_headers.keys() if sensor_headers[k] == []]
-  for k in empties:
+  sensor_headers: dict[str, list[str]] = {}
+  sensor_units: dict[str, str] = {}
+  sensors = [(drivers.get_driver(s.sensor_type), s) for s in d.sensors]
+  for driver, s in sorted(sensors, key=lambda x: x[0].priority):
+    sensor_headers.setdefault(driver.sensor_type, [])
+    sensor_headers[driver.sensor_type] += driver.headers_for(s)
+    sensor_units[driver.sensor_type] = driver.units
+
+  # keeping at most two types of headers, those most important
+  for k in list(sensor_headers)[:-2]:
     del sensor_headers[k]
     del sensor_units[k]
 
-  # keeping at most two types of headers
-  if len(sensor_headers) == 3:
-    del sensor_headers['random']
-    del sensor_units['random']
-
   return sensor_headers, sensor_units
 
 
-def preprocess_df(time_period: str = 'all'):
-  """Preprocess pandas DataFrame."""
-  df = pd.read_csv(configs.DATA_PATH)
-
-  df = df.set_index('time')
-  df.index = pd.to_datetime(df.index)
-
+def determine_columns():
+  """Determine columns kept for plotting."""
   sensor_headers, _ = determine_plot_configs()
-  cols_to_keep = [col for key in sensor_headers for col in sensor_headers[key]]
-  df = df[cols_to_keep]
+  return [col for key in sensor_headers for col in sensor_headers[key]]
+
 
+def get_start(time_period: str):
+  """Get start of time period, or None for the entire runtime."""
   if time_period == 'day':
-    start = pd.Timestamp.now() - pd.Timedelta('1 day')
-    df = df[df.index > start]
-  elif time_period == 'week':
-    start = pd.Timestamp.now() - pd.Timedelta('7 days')
-    df = df[df.index > start]
+    return pd.Timestamp(utcnow()) - pd.Timedelta('1 day')
+  if time_period == 'week':
+    return pd.Timestamp(utcnow()) - pd.Timedelta('7 days')
+  return None
 
-  df = resample_df(df)
-  return df.reset_index()  # move time back as a column
 
+def preprocess_df(time_period: str = 'all', method: str = PLOT_METHOD):
+  """Preprocess pandas DataFrame from scratch."""
+  start = get_start(time_period)
+  return summarize_df(dataset.load_df(start), start, method)
 
-def resample_df(df):
-  """Smooth and condense df by resampling."""
-  # 60 has many divisors
-  rules = ['1T', '2T', '3T', '4T', '5T', '6T', '10T', '20T', '30T', '1H']
 
-  if len(df) > 300:  # only resample if df large enough
-    for r in rules:
-      df = df.resample(r).mean()
-      if len(df) < 5000:
-        break
+def summarize_df(df: pd.DataFrame, start: pd.Timestamp | None = None,
+                 method: str = PLOT_METHOD):
+  """Reduce rows since start with a parsed time column to MAX_POINTS.
 
-  # smoothing even more
-  df = df.rolling(7, center=True, min_periods=1).mean()
-  return df
+  Under the 'mean' method rows are averaged and smoothed, otherwise actual
+  rows are selected by downsampling each column."""
+  df = df.set_index('time')
+  df = df.reindex(columns=determine_columns())
+  if method != 'mean':
+    return downsample(df, method).reset_index()
+
+  if len(df) > MIN_ROWS:  # only aggregate if df large enough
+    pyramid = RollupPyramid(list(df.columns))
+    pyramid.fold(df.index.to_numpy(), df.to_numpy(np.float64))
+    df = pyramid.query(start, budget=MAX_POINTS)
+  return smooth_df(df).reset_index()  # move time back as a column
+
+
+def smooth_df(df: pd.DataFrame):
+  """Smooth aggregated data with a centered rolling mean."""
+  return df.rolling(7, center=True, min_periods=1).mean()
+
+
+def downsample(df: pd.DataFrame, method: str = PLOT_METHOD):
+  """Select at most MAX_POINTS rows, sharing them between columns."""
+  budget = MAX_POINTS // max(len(df.columns), 1)
+  return downsample_df(df, budget, method)
+
+
+def envelope(pyramid: RollupPyramid, start: pd.Timestamp | None = None,
+             budget: int = MAX_POINTS):
+  """Build the minimum and maximum of each column since start.
+
+  Each bucket of the finest tier holding the range in budget / 2 buckets
+  gives two rows at its start, its minimums then its maximums, so extremes of
+  readings are kept after raw rows are summarized."""
+  df = pyramid.query(start, budget=budget // 2, stats=('min', 'max'))
+  lows = df[[f'{c}_min' for c in pyramid.columns]]
+  highs = df[[f'{c}_max' for c in pyramid.columns]]
+  lows.columns = highs.columns = pyramid.columns
+  df = pd.concat([lows, highs]).sort_index(kind='stable')
+  return df.dropna(how='all')
+
+
+class Preprocessor:
+  """Incrementally preprocess data by folding new rows into a rollup pyramid.
+
+  Only rows appended since the previous update are read. Each time period is
+  then served from the finest tier of the pyramid with at most MAX_POINTS
+  buckets, so nothing is resampled from raw data."""
+
+  def __init__(self, columns: list[str]):
+    self.columns = columns
+    self.cursor: dict[str, Any] | None = None
+    self.pyramid = RollupPyramid(columns)
+
+  @classmethod
+  def load(cls, path: str, columns: list[str]):
+    """Restore checkpoint from path if it matches columns."""
+    preprocessor = cls(columns)
+    try:
+      with np.load(path) as arrays:
+        meta = json.loads(str(arrays['meta']))
+        if meta['columns'] != columns:
+          return preprocessor
+        pyramid = RollupPyramid.from_arrays(columns, arrays)
+        preprocessor.cursor = meta['cursor']
+        preprocessor.pyramid = pyramid
+    except (OSError, ValueError, KeyError):  # missing, corrupt or outdated
+      pass
+    return preprocessor
+
+  def save(self, path: str):
+    """Checkpoint state atomically so a restart resumes from cursor."""
+    meta = json.dumps({'columns': self.columns, 'cursor': self.cursor})
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+      np.savez(f, meta=np.array(meta), **self.pyramid.to_arrays())
+    os.replace(tmp_path, path)
+
+  def update(self):
+    """Fold rows appended since the previous update."""
+    while True:
+      df, self.cursor, reset = dataset.read_new(self.cursor)
+      if reset:
+        self.pyramid = RollupPyramid(self.columns)
+      if df.empty:
+        break
+      times = df['time'].to_numpy()
+      values = df.reindex(columns=self.columns).to_numpy(np.float64)
+      self.pyramid.fold(times, values)
+    self.pyramid.evict()
+
+  def query(self, start: pd.Timestamp | None = None,
+            end: pd.Timestamp | None = None, budget: int = MAX_POINTS,
+            stats: tuple[str, ...] = ('mean',)):
+    """Aggregate data in [start, end) within budget points."""
+    return self.pyramid.query(start, end, budget, stats)
+
+  def frame(self, time_period: str = 'all', method: str = PLOT_METHOD):
+    """Build preprocessed DataFrame for time period from the pyramid.
+
+    Under the 'minmax' method the envelope is built from the minimum and
+    maximum of each bucket, and under 'lttb' points are selected from the
+    finest tier still holding the time period."""
+    start = get_start(time_period)
+    if self.pyramid.total_count(start) <= MIN_ROWS:  # too few to aggregate
+      df = dataset.load_df(start).set_index('time')
+      df = df.reindex(columns=self.columns)
+    elif method == 'minmax':
+      return envelope(self.pyramid, start).reset_index()
+    elif method == 'lttb':
+      df = self.pyramid.covering(start)[0].frame(start)
+    else:
+      df = self.query(start)
+    if method != 'mean':
+      return downsample(df, method).reset_index()
+    return smooth_df(df).reset_index()  # move time back as a column
 
 
 async def run_preprocess():
   """Run preprocessing indefinitely."""
 
-  time_periods = list(configs.PREPROCESSED_DATA_PATHS.keys())
-
   async def run():
-    for time_period in itertools.cycle(time_periods):
-      df = preprocess_df(time_period)
-      df.to_csv(configs.PREPROCESSED_DATA_PATHS[time_period])
+    preprocessor = None
+    while True:
+      columns = determine_columns()
+      if preprocessor is None or preprocessor.columns != columns:
+        preprocessor = Preprocessor.load(configs.PREPROCESS_STATE_PATH, columns)
+      preprocessor.update()
+      for time_period, path in configs.PREPROCESSED_DATA_PATHS.items():
+        preprocessor.frame(time_period).to_csv(path)
+      preprocessor.save(configs.PREPROCESS_STATE_PATH)
       await asyncio.sleep(60)
 
   return await asyncio.create_task(run())
@@ -0,0 +1,153 @@
+"""Select a time range, columns and resolution of device data for /data."""
+
+from __future__ import annotations
+from typing import Iterator
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from bairy.device import configs, dataset, preprocess
+from bairy.device.rollup import TIERS, Rollup
+from bairy.device.ring import SHARED
+from bairy.device.timestamps import parse_time, utcnow
+
+
+RAW = 'raw'
+
+
+def parse_bound(value: str | None):
+  """Parse a start or end time given as ISO 8601 or epoch seconds.
+
+  Times without a timezone are taken as UTC, matching stored data."""
+  if value is None:
+    return None
+  try:
+    return pd.Timestamp(float(value), unit='s')
+  except ValueError:
+    pass
+  t = pd.Timestamp(value)
+  if t.tzinfo is not None:
+    t = t.tz_convert('UTC').tz_localize(None)
+  return t
+
+
+def parse_resolution(resolution: str):
+  """Parse a resolution given as seconds or a pandas offset like 10min."""
+  try:
+    return pd.Timedelta(seconds=float(resolution))
+  except ValueError:
+    return pd.Timedelta(resolution)
+
+
+def choose_resolution(resolution: str | None, max_points: int | None,
+                      start: pd.Timestamp | None, end: pd.Timestamp | None):
+  """Choose raw rows or the width of the rollup tier to answer with.
+
+  A requested resolution is served by the finest tier at least as coarse,
+  or by raw rows if finer than every tier. Otherwise the finest level with
+  at most max_points points over the range is chosen, estimating raw rows
+  from the fastest sensor interval."""
+  widths = {w: pd.Timedelta(w) for w in TIERS}
+  if resolution == RAW or (resolution is None and max_points is None):
+    return RAW
+  if resolution is not None:
+    requested = parse_resolution(resolution)
+    if requested < min(widths.values()):
+      return RAW
+    coarser = [w for w, d in widths.items() if d >= requested]
+    return coarser[0] if coarser else list(widths)[-1]
+
+  if start is None:
+    first = dataset.first_time()
+    if first is None:
+      return RAW
+    start = pd.Timestamp(parse_time(first))
+  span = (pd.Timestamp(utcnow()) if end is None else end) - start
+  device = configs.load_device()
+  interval = min([s.interval or device.update_interval
+                  for s in device.sensors] or [device.update_interval])
+  if span / pd.Timedelta(seconds=interval) <= max_points:
+    return RAW
+  for w, d in widths.items():
+    if span / d <= max_points:
+      return w
+  return list(widths)[-1]
+
+
+def check_columns(columns: str | None):
+  """Split requested columns, raising ValueError on unknown ones."""
+  if columns is None:
+    return None
+  selected = [c for c in columns.split(',') if c]
+  unknown = [c for c in selected if c not in dataset.columns()]
+  if unknown:
+    raise ValueError(f'Unknown columns {unknown}')
+  return selected
+
+
+def iter_raw(start: pd.Timestamp | None, end: pd.Timestamp | None,
+             columns: list[str] | None) -> Iterator[bytes]:
+  """Stream raw rows within [start, end) as CSV."""
+  if columns is None:
+    columns = dataset.columns()
+  yield ('time,' + ','.join(columns) + '\n').encode()
+  for df in iter_frames(start, end, columns):
+    if not df.empty:
+      yield df.to_csv(header=False, index=False).encode()
+
+
+def iter_frames(start: pd.Timestamp | None, end: pd.Timestamp | None,
+                columns: list[str]) -> Iterator[pd.DataFrame]:
+  """Read rows within [start, end) as text, from shared memory if held."""
+  df = SHARED.text_frame(start, end, columns)
+  if df is not None:
+    yield df
+  else:
+    yield from dataset.iter_frames(start, end, columns)
+
+
+def aggregate(start: pd.Timestamp | None, end: pd.Timestamp | None,
+              columns: list[str] | None, width: str):
+  """Average columns over buckets of width within [start, end).
+
+  Columns kept for plotting are served from the preprocessor's rollup
+  pyramid, brought up to date with rows written since its checkpoint. Other
+  columns, ranges the tier no longer holds, or recent ranges held in shared
+  memory are folded from raw rows."""
+  if columns is None:
+    columns = dataset.columns()
+  plot_columns = preprocess.determine_columns()
+  recent = SHARED.frame(start, end, columns)
+  if recent is None and set(columns) <= set(plot_columns):
+    preprocessor = preprocess.Preprocessor.load(configs.PREPROCESS_STATE_PATH,
+                                                plot_columns)
+    if preprocessor.cursor is not None:
+      preprocessor.update()
+      rollup = preprocessor.pyramid.tiers[width]
+      if rollup.covers(start):
+        return rollup.frame(start, end)[columns]
+
+  rollup = Rollup(width, columns)
+  if recent is not None:
+    rollup.fold(recent['time'].to_numpy(), recent[columns].to_numpy(np.float64))
+    return rollup.frame(start, end)
+  for df in dataset.iter_frames(start, end, columns):
+    values = df[columns].apply(pd.to_numeric, errors='coerce')
+    rollup.fold(pd.to_datetime(df['time']).to_numpy(),
+                values.to_numpy(np.float64))
+  return rollup.frame(start, end)
+
+
+def iter_aggregate(start: pd.Timestamp | None, end: pd.Timestamp | None,
+                   columns: list[str] | None, width: str) -> Iterator[bytes]:
+  """Stream averages over buckets of width as CSV."""
+  yield aggregate(start, end, columns, width).to_csv().encode()
+
+
+def etag(params: dict[str, str | int | None]):
+  """Tag the response to a query by the versions of the data it reads."""
+  start, end = parse_bound(params['start']), parse_bound(params['end'])
+  # open ranges may include rows held in shared memory but not yet on disk
+  recent = SHARED.version() if end is None else None
+  key = json.dumps([params, dataset.version(start, end), recent], default=str)
+  return 'W/"' + hashlib.md5(key.encode()).hexdigest() + '"'
@@ -0,0 +1,140 @@
+"""Read sensors concurrently in a thread pool, off the asyncio event loop."""
+
+from __future__ import annotations
+from typing import Any
+import os
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from bairy.device.sensor import Sensor
+
+
+class SensorStats:
+  """Running statistics of reads from a single sensor."""
+
+  def __init__(self):
+    self.reads = 0
+    self.errors = 0
+    self.timeouts = 0
+    self.skipped = 0  # ticks skipped while a timed out read was pending
+    self.last = 0.0
+    self.total = 0.0
+    self.max = 0.0
+
+  def record(self, latency: float):
+    """Record the latency in seconds of a completed read."""
+    self.reads += 1
+    self.last = latency
+    self.total += latency
+    self.max = max(self.max, latency)
+
+  def as_dict(self):
+    """Summarize statistics with latencies in milliseconds."""
+    mean = self.total / self.reads if self.reads else 0.0
+    return {'reads': self.reads, 'errors': self.errors,
+            'timeouts': self.timeouts, 'skipped': self.skipped,
+            'last_ms': round(self.last * 1000, 3),
+            'mean_ms': round(mean * 1000, 3),
+            'max_ms': round(self.max * 1000, 3)}
+
+
+class SensorReader:
+  """Read every sensor concurrently, each within its own timeout.
+
+  A sensor missing its timeout records None for that tick. Its read keeps
+  running in the pool, and the sensor is skipped on later ticks until the
+  read returns, so a hung sensor occupies at most one worker. Statistics
+  are saved as json to stats_path every stats_interval seconds."""
+
+  def __init__(self, sensors: list[Sensor], max_workers: int = 4,
+               stats_path: str | None = None, stats_interval: float = 10.0):
+    self.sensors = sensors
+    self.executor = ThreadPoolExecutor(min(max_workers, len(sensors)) or 1,
+                                       thread_name_prefix='sensor')
+    self.pending: dict[int, asyncio.Future[Any]] = {}
+    self.stats = [SensorStats() for _ in sensors]
+    self.stats_path = stats_path
+    self.stats_interval = stats_interval
+    self.last_save = time.monotonic()
+
+  def timed_read(self, i: int):
+    """Read sensor i, recording its latency; runs in a worker thread."""
+    start = time.perf_counter()
+    reading = self.sensors[i].read()
+    self.stats[i].record(time.perf_counter() - start)
+    return reading
+
+  async def read_one(self, i: int) -> dict[str, int | None]:
+    """Read sensor i, returning None values if it errors or times out."""
+    sensor = self.sensors[i]
+    missing: dict[str, int | None] = {h: None for h in sensor.headers}
+    if i in self.pending:
+      self.stats[i].skipped += 1
+      return missing
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(self.executor, self.timed_read, i)
+    try:
+      return await asyncio.wait_for(asyncio.shield(future), sensor.timeout)
+    except asyncio.TimeoutError:
+      self.stats[i].timeouts += 1
+      logging.warning('Timed out reading sensor %s', sensor.name)
+      self.pending[i] = future
+      future.add_done_callback(lambda f: self.release(i, f))
+    except Exception as e:  # pylint: disable=broad-except
+      self.stats[i].errors += 1
+      logging.error('Failed to read sensor %s', sensor.name)
+      logging.error(e)
+    return missing
+
+  def release(self, i: int, future: asyncio.Future[Any]):
+    """Allow sensor i to be read again once its timed out read returns."""
+    del self.pending[i]
+    if not future.cancelled() and future.exception() is not None:
+      self.stats[i].errors += 1
+
+  async def read(self, due: list[int] | None = None):
+    """Read sensors at positions due, or all, concurrently and merge them."""
+    if due is None:
+      due = list(range(len(self.sensors)))
+    readings = await asyncio.gather(*[self.read_one(i) for i in due])
+    data: dict[str, int | None] = {}
+    for reading in readings:
+      for k in reading:
+        if k in data:
+          raise KeyError('Duplicate key found!')
+      data.update(reading)
+
+    if self.stats_path is not None and \
+            time.monotonic() - self.last_save >= self.stats_interval:
+      self.save_stats()
+    return data
+
+  def stats_dict(self):
+    """Map each sensor name to its statistics."""
+    return {s.name: stats.as_dict() for s, stats in zip(self.sensors,
+                                                         self.stats)}
+
+  def save_stats(self):
+    """Atomically write statistics as json for the app to read."""
+    self.last_save = time.monotonic()
+    tmp_path = self.stats_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+      json.dump(self.stats_dict(), f, indent=4)
+    os.replace(tmp_path, self.stats_path)
+
+  def close(self):
+    """Save statistics and stop worker threads without waiting on hung reads."""
+    if self.stats_path is not None:
+      self.save_stats()
+    self.executor.shutdown(wait=False)
+
+
+def load_stats(path: str) -> dict[str, Any]:
+  """Load statistics saved by a SensorReader, if any."""
+  if not os.path.exists(path):
+    return {}
+  with open(path) as f:
+    return json.load(f)
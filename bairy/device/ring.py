@@ -0,0 +1,324 @@
+"""Share recent readings between the sampler and the app in memory.
+
+The sampler writes each row into a fixed-size ring buffer of typed columns in
+shared memory, which the app process maps without copying. The block begins
+with a header holding a sequence number, the number of rows ever written, the
+time since which the buffer holds every row and a json description of its
+columns and capacity. It is followed by one region for the epoch times and
+one per sensor column, using the types of segment files.
+
+There is a single writer, which makes the sequence number odd while writing a
+row and even once done. Readers copy what they need and retry if the
+sequence number was odd or changed meanwhile, a seqlock, so they never block
+the sampler and never return a torn row."""
+
+from __future__ import annotations
+from typing import Any, Callable, TypeVar
+import json
+import math
+import time
+import struct
+import logging
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from bairy.device import dataset, drivers
+from bairy.device.validate import DeviceConfigs
+from bairy.device.segments import COLUMN_TYPES, TIME_DTYPE, decode_column
+from bairy.device.timestamps import format_epoch, from_epoch, to_epoch, \
+    utcnow
+try:
+  from multiprocessing.shared_memory import SharedMemory
+except ImportError:  # before Python 3.8, recent rows are read from disk
+  SharedMemory = None
+
+
+HEADER_SIZE = 4096
+SPEC_OFFSET = 24  # after sequence number, rows written and since
+RING_SECONDS = 25 * 3600  # a day of rows and an hour to spare
+MAX_BYTES = 64 << 20  # most memory taken by the ring buffer
+READ_ATTEMPTS = 1000
+T = TypeVar('T')
+
+
+def columns_from_configs(device: DeviceConfigs):
+  """Determine typed columns in the order the sampler writes them."""
+  sensors = [(s.interval or device.update_interval, s) for s in device.sensors]
+  columns: list[list[str]] = []
+  for _, s in sorted(sensors, key=lambda x: x[0]):
+    driver = drivers.get_driver(s.sensor_type)
+    columns += [[h, driver.column_type] for h in driver.headers_for(s)]
+  return columns
+
+
+def capacity_from_configs(device: DeviceConfigs,
+                          seconds: float = RING_SECONDS):
+  """Count the rows written over seconds, at most one per sensor tick."""
+  intervals = {s.interval or device.update_interval for s in device.sensors}
+  return max(math.ceil(seconds * sum(1 / i for i in intervals)), 1)
+
+
+def encode_values(values: np.ndarray, column_type: str):
+  """Convert floats with NaN for missing readings into a typed array."""
+  dtype, missing = COLUMN_TYPES[column_type]
+  values = np.asarray(values, np.float64)
+  return np.where(np.isnan(values), missing, values).astype(dtype)
+
+
+class RingBuffer:
+  """The latest capacity rows of typed columns in shared memory."""
+
+  def __init__(self, shm: SharedMemory, columns: list[list[str]],
+               capacity: int):
+    self.shm = shm
+    self.columns = columns
+    self.capacity = capacity
+    self.types = dict(map(tuple, columns))
+    self.header = np.ndarray((2,), '<i8', shm.buf)  # sequence, rows written
+    self.since = np.ndarray((1,), '<f8', shm.buf, 16)
+    offset = HEADER_SIZE
+    self.times = np.ndarray((capacity,), TIME_DTYPE, shm.buf, offset)
+    offset += self.times.nbytes
+    self.arrays: dict[str, np.ndarray] = {}
+    for name, column_type in columns:
+      dtype = COLUMN_TYPES[column_type][0]
+      self.arrays[name] = np.ndarray((capacity,), dtype, shm.buf, offset)
+      offset += self.arrays[name].nbytes
+
+  @staticmethod
+  def size(columns: list[list[str]], capacity: int):
+    """Bytes of shared memory holding capacity rows of columns."""
+    itemsizes = [np.dtype(TIME_DTYPE).itemsize]
+    itemsizes += [np.dtype(COLUMN_TYPES[t][0]).itemsize for _, t in columns]
+    return HEADER_SIZE + capacity * sum(itemsizes)
+
+  @classmethod
+  def create(cls, columns: list[list[str]], capacity: int,
+             name: str | None = None):
+    """Create an empty ring buffer in a new block of shared memory."""
+    spec = json.dumps({'columns': columns, 'capacity': capacity}).encode()
+    if len(spec) + SPEC_OFFSET + 4 > HEADER_SIZE:
+      raise OverflowError('Too many columns for ring buffer header')
+    shm = SharedMemory(name, create=True, size=cls.size(columns, capacity))
+    shm.buf[SPEC_OFFSET:SPEC_OFFSET + 4 + len(spec)] = \
+        struct.pack('<I', len(spec)) + spec
+    ring = cls(shm, columns, capacity)
+    ring.header[:] = 0
+    ring.since[0] = to_epoch(utcnow())
+    return ring
+
+  @classmethod
+  def attach(cls, name: str):
+    """Map the ring buffer created under name by another process."""
+    shm = SharedMemory(name)
+    (length,) = struct.unpack('<I', shm.buf[SPEC_OFFSET:SPEC_OFFSET + 4])
+    start = SPEC_OFFSET + 4
+    spec = json.loads(bytes(shm.buf[start:start + length]))
+    return cls(shm, spec['columns'], spec['capacity'])
+
+  @classmethod
+  def from_configs(cls, device: DeviceConfigs, seconds: float = RING_SECONDS,
+                   max_bytes: int = MAX_BYTES):
+    """Create a ring buffer holding seconds of rows of device."""
+    columns = columns_from_configs(device)
+    capacity = capacity_from_configs(device, seconds)
+    row_bytes = cls.size(columns, 1) - HEADER_SIZE
+    if cls.size(columns, capacity) > max_bytes:
+      capacity = (max_bytes - HEADER_SIZE) // row_bytes
+      logging.warning('Ring buffer holds only %d rows', capacity)
+    return cls.create(columns, capacity)
+
+  @property
+  def name(self):
+    return self.shm.name
+
+  def write(self, data: dict[str, int | None], now: datetime):
+    """Write a single row read at UTC time now."""
+    n = int(self.header[1])
+    i = n % self.capacity
+    self.header[0] += 1  # odd while writing
+    self.times[i] = to_epoch(now)
+    for name, array in self.arrays.items():
+      value = data.get(name)
+      array[i] = COLUMN_TYPES[self.types[name]][1] if value is None else value
+    self.header[1] = n + 1
+    self.header[0] += 1
+
+  def seed(self, df: pd.DataFrame, since: pd.Timestamp):
+    """Fill the buffer with rows of df, holding every row after since."""
+    if len(df) > self.capacity:  # holding every row after the last dropped
+      since = df['time'].iloc[-self.capacity - 1]
+      df = df.iloc[-self.capacity:]
+    n = len(df)
+    self.header[0] += 1
+    self.times[:n] = df['time'].to_numpy('datetime64[ns]').astype(
+        np.int64) / 1e9
+    for name, array in self.arrays.items():
+      values = df[name].astype(np.float64) if name in df else np.nan
+      array[:n] = encode_values(values, self.types[name])
+    self.since[0] = to_epoch(since)
+    self.header[1] = n
+    self.header[0] += 1
+
+  def reset(self):
+    """Drop every row, once stored data was removed."""
+    self.header[0] += 1
+    self.header[1] = 0
+    self.since[0] = to_epoch(utcnow())
+    self.header[0] += 1
+
+  def read(self, copy: Callable[[int], T]) -> T:
+    """Call copy with the number of rows written, under the seqlock."""
+    for _ in range(READ_ATTEMPTS):
+      seq = int(self.header[0])
+      if seq % 2 == 0:
+        result = copy(int(self.header[1]))
+        if int(self.header[0]) == seq:
+          return result
+      time.sleep(0)
+    raise TimeoutError('Ring buffer changed during every attempt to read')
+
+  def order(self, n: int):
+    """Positions of held rows, oldest first, given n rows written."""
+    return np.arange(max(n - self.capacity, 0), n) % self.capacity
+
+  def window(self, start: pd.Timestamp, end: pd.Timestamp | None = None,
+             columns: list[str] | None = None):
+    """Copy raw arrays of rows within [start, end), or return None if rows
+    after start may be missing from the buffer."""
+    t0 = to_epoch(start)
+    t1 = None if end is None else to_epoch(end)
+    if columns is None:
+      columns = list(self.arrays)
+
+    def copy(n: int):
+      positions = self.order(n)
+      times = self.times[positions]
+      if t0 <= self.since[0] or (n > self.capacity and t0 < times[0]):
+        return None
+      lo = int(np.searchsorted(times, t0))
+      hi = len(times) if t1 is None else int(np.searchsorted(times, t1))
+      arrays = {'time': times[lo:hi]}
+      for name in columns:
+        arrays[name] = self.arrays[name][positions[lo:hi]]
+      return arrays
+
+    return self.read(copy)
+
+  def frame(self, start: pd.Timestamp, end: pd.Timestamp | None = None,
+            columns: list[str] | None = None):
+    """Decode rows within [start, end) into a DataFrame with a time column,
+    or return None if the buffer may not hold all of them."""
+    arrays = self.window(start, end, columns)
+    if arrays is None:
+      return None
+    df = pd.DataFrame({name: decode_column(values, self.types[name])
+                       for name, values in arrays.items() if name != 'time'})
+    df.insert(0, 'time', from_epoch(arrays['time']))
+    return df
+
+  def text_frame(self, start: pd.Timestamp, end: pd.Timestamp | None = None,
+                 columns: list[str] | None = None):
+    """Decode rows within [start, end) as they would be written in
+    data.csv, or return None if the buffer may not hold all of them."""
+    arrays = self.window(start, end, columns)
+    if arrays is None:
+      return None
+    df = pd.DataFrame({'time': format_epoch(arrays['time'])})
+    for name, values in arrays.items():
+      if name != 'time':
+        column_type = self.types[name]
+        df[name] = decode_column(values, column_type)
+        if column_type != 'float':  # keep integers when values missing
+          df[name] = df[name].astype('Int64')
+    return df
+
+  def latest(self, max_rows: int = 4096):
+    """Get most recent value of each column, searching back max_rows rows."""
+
+    def copy(n: int):
+      positions = self.order(n)[-max_rows:]
+      return self.times[positions], {name: array[positions]
+                                     for name, array in self.arrays.items()}
+
+    times, arrays = self.read(copy)
+    if len(times) == 0:
+      return {}
+    d: dict[str, Any] = {'time': format_epoch(times[-1:])[0]}
+    for name, values in arrays.items():
+      present = np.flatnonzero(~np.isnan(
+          decode_column(values, self.types[name]).astype(np.float64)))
+      d[name] = int(values[present[-1]]) if len(present) else None
+    return d
+
+  def close(self):
+    """Unmap shared memory, releasing views of it first."""
+    del self.header, self.since, self.times, self.arrays
+    self.shm.close()
+
+  def unlink(self):
+    """Free shared memory once every process closed it."""
+    self.shm.unlink()
+
+
+def create_shared(device: DeviceConfigs):
+  """Create a ring buffer of device, filled with the rows already stored, or
+  return None if shared memory is unavailable."""
+  if SharedMemory is None:
+    return None
+  ring = RingBuffer.from_configs(device)
+  since = pd.Timestamp(utcnow()) - pd.Timedelta(seconds=RING_SECONDS)
+  try:
+    ring.seed(dataset.load_df(since), since)
+  except (FileNotFoundError, pd.errors.EmptyDataError):  # no data yet
+    pass
+  return ring
+
+
+class SharedRing:
+  """The ring buffer mapped by the app process, if the sampler shares one."""
+
+  def __init__(self):
+    self.ring: RingBuffer | None = None
+
+  def attach(self, name: str):
+    """Map the ring buffer created under name."""
+    self.ring = RingBuffer.attach(name)
+
+  def frame(self, start: pd.Timestamp | None,
+            end: pd.Timestamp | None = None,
+            columns: list[str] | None = None):
+    """Rows within [start, end) with a parsed time column, or None if
+    these are not all held in shared memory."""
+    if self.ring is None or start is None:
+      return None
+    if columns is not None and not set(columns) <= set(self.ring.arrays):
+      return None
+    return self.ring.frame(start, end, columns)
+
+  def text_frame(self, start: pd.Timestamp | None,
+                 end: pd.Timestamp | None = None,
+                 columns: list[str] | None = None):
+    """Rows within [start, end) as written in data.csv, or None if these
+    are not all held in shared memory."""
+    if self.ring is None or start is None:
+      return None
+    if columns is not None and not set(columns) <= set(self.ring.arrays):
+      return None
+    return self.ring.text_frame(start, end, columns)
+
+  def latest(self):
+    """Most recent value of each column, or None if nothing is held."""
+    if self.ring is None:
+      return None
+    return self.ring.latest() or None
+
+  def version(self):
+    """Number of rows written, or None without a ring buffer."""
+    if self.ring is None:
+      return None
+    return int(self.ring.header[1])
+
+
+# mapped by the app process when the sampler shares its ring buffer
+SHARED = SharedRing()
@@ -0,0 +1,261 @@
+"""Aggregate readings into fixed-width time buckets incrementally."""
+
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from bairy.device.timestamps import utcnow
+
+
+class Rollup:
+  """Running sum, count, min and max of each column per time bucket.
+
+  Buckets are keyed by the number of bucket widths since the epoch of the
+  (naive) timestamps, and are kept sorted by key. Buckets with keys below
+  horizon have been evicted."""
+
+  def __init__(self, width: str, columns: list[str]):
+    self.width = width
+    self.width_ns = pd.Timedelta(width).value
+    self.columns = columns
+    n = len(columns)
+    self.keys = np.zeros(0, np.int64)
+    self.sum = np.zeros((0, n))
+    self.count = np.zeros((0, n), np.int64)
+    self.min = np.zeros((0, n))
+    self.max = np.zeros((0, n))
+    self.horizon = np.iinfo(np.int64).min
+
+  def __len__(self):
+    return len(self.keys)
+
+  def to_arrays(self, prefix: str):
+    """Gather state as a dictionary of arrays for checkpointing."""
+    arrays = {prefix + k: getattr(self, k)
+              for k in ['keys', 'sum', 'count', 'min', 'max']}
+    arrays[prefix + 'horizon'] = np.array(self.horizon)
+    return arrays
+
+  @classmethod
+  def from_arrays(cls, width: str, columns: list[str],
+                  arrays: dict[str, np.ndarray], prefix: str):
+    """Restore state from a checkpoint."""
+    rollup = cls(width, columns)
+    for k in ['keys', 'sum', 'count', 'min', 'max']:
+      setattr(rollup, k, arrays[prefix + k])
+    rollup.horizon = int(arrays[prefix + 'horizon'])
+    return rollup
+
+  def fold(self, times: np.ndarray, values: np.ndarray):
+    """Fold new rows into their buckets.
+
+    Here times are datetime64 values and values is a 2d float array with
+    NaN marking missing readings."""
+    if len(times) == 0:
+      return
+    keys = times.astype('datetime64[ns]').astype(np.int64) // self.width_ns
+    order = np.argsort(keys, kind='stable')  # rows are nearly always sorted
+    keys, values = keys[order], values[order]
+
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+    valid = ~np.isnan(values)
+    new_keys = keys[starts]
+    new_sum = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    new_count = np.add.reduceat(valid.astype(np.int64), starts)
+    new_min = np.minimum.reduceat(np.where(valid, values, np.inf), starts)
+    new_max = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+
+    # merging buckets which already exist, typically just the latest
+    pos = np.searchsorted(self.keys, new_keys)
+    exists = pos < len(self.keys)
+    exists[exists] = self.keys[pos[exists]] == new_keys[exists]
+    i = pos[exists]
+    self.sum[i] += new_sum[exists]
+    self.count[i] += new_count[exists]
+    self.min[i] = np.minimum(self.min[i], new_min[exists])
+    self.max[i] = np.maximum(self.max[i], new_max[exists])
+
+    fresh = ~exists
+    if fresh.any():
+      in_order = len(self.keys) == 0 or new_keys[fresh][0] > self.keys[-1]
+      self.keys = np.concatenate([self.keys, new_keys[fresh]])
+      self.sum = np.concatenate([self.sum, new_sum[fresh]])
+      self.count = np.concatenate([self.count, new_count[fresh]])
+      self.min = np.concatenate([self.min, new_min[fresh]])
+      self.max = np.concatenate([self.max, new_max[fresh]])
+      if not in_order:
+        self.select(np.argsort(self.keys, kind='stable'))
+
+  def select(self, i: np.ndarray):
+    """Keep only buckets at positions (or boolean mask) i."""
+    self.keys = self.keys[i]
+    self.sum = self.sum[i]
+    self.count = self.count[i]
+    self.min = self.min[i]
+    self.max = self.max[i]
+
+  def key(self, t: pd.Timestamp):
+    """Find key of the bucket holding time t."""
+    return t.value // self.width_ns
+
+  def evict(self, before: pd.Timestamp):
+    """Drop buckets entirely before time before."""
+    key = self.key(before)
+    if key > self.horizon:
+      self.horizon = key
+      self.select(self.keys >= key)
+
+  def covers(self, start: pd.Timestamp | None):
+    """Check if no bucket since start has been evicted."""
+    if self.horizon == np.iinfo(np.int64).min:
+      return True
+    return start is not None and self.key(start) >= self.horizon
+
+  def locate(self, start: pd.Timestamp | None = None,
+             end: pd.Timestamp | None = None):
+    """Find positions of buckets overlapping [start, end)."""
+    lo = 0 if start is None else np.searchsorted(self.keys, self.key(start))
+    hi = len(self.keys)
+    if end is not None:
+      hi = np.searchsorted(self.keys, self.key(end - pd.Timedelta(1)), 'right')
+    return int(lo), int(hi)
+
+  def total_count(self, start: pd.Timestamp | None = None,
+                  end: pd.Timestamp | None = None):
+    """Count readings in [start, end), taking the most of any column."""
+    lo, hi = self.locate(start, end)
+    if lo >= hi:
+      return 0
+    return int(self.count[lo:hi].sum(axis=0).max())
+
+  def span(self, start: pd.Timestamp | None = None,
+           end: pd.Timestamp | None = None):
+    """Count buckets from the first to the last one within [start, end)."""
+    lo, hi = self.locate(start, end)
+    if lo >= hi:
+      return 0
+    return int(self.keys[hi - 1] - self.keys[lo] + 1)
+
+  def frame(self, start: pd.Timestamp | None = None,
+            end: pd.Timestamp | None = None, factor: int = 1,
+            stats: tuple[str, ...] = ('mean',)):
+    """Aggregate each column per bucket within [start, end) as a DataFrame.
+
+    Buckets are merged factor at a time and empty buckets between the first
+    and last appear as NaN, as they would under DataFrame.resample. Stats
+    are any of 'mean', 'min', 'max' and 'count'; columns are suffixed by
+    their stat unless stats is just ('mean',)."""
+    if stats == ('mean',):
+      names = self.columns
+    else:
+      names = [f'{c}_{stat}' for stat in stats for c in self.columns]
+
+    lo, hi = self.locate(start, end)
+    keys = self.keys[lo:hi] // factor
+    if len(keys) == 0:
+      return pd.DataFrame(columns=names,
+                          index=pd.DatetimeIndex([], name='time'))
+
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+    counts = np.add.reduceat(self.count[lo:hi], starts)
+    empty = counts == 0
+    arrays = []
+    for stat in stats:
+      if stat == 'mean':
+        sums = np.add.reduceat(self.sum[lo:hi], starts)
+        a = sums / np.maximum(counts, 1)
+      elif stat == 'min':
+        a = np.minimum.reduceat(self.min[lo:hi], starts)
+      elif stat == 'max':
+        a = np.maximum.reduceat(self.max[lo:hi], starts)
+      elif stat == 'count':
+        a = counts.astype(np.float64)
+      else:
+        raise ValueError(f'Unknown stat {stat}')
+      if stat != 'count':
+        a = np.where(empty, np.nan, a)
+      arrays.append(a)
+
+    all_keys = np.arange(keys[0], keys[-1] + 1)
+    full = np.full((len(all_keys), len(names)), np.nan)
+    full[keys[starts] - keys[0]] = np.hstack(arrays)
+    index = pd.to_datetime(all_keys * factor * self.width_ns)
+    return pd.DataFrame(full, index=index.rename('time'), columns=names)
+
+
+# bucket widths and how long each is retained; None keeps entire runtime
+TIERS: dict[str, str | None] = {'1min': '7 days',
+                                '10min': None,
+                                '1h': None,
+                                '1d': None}
+
+
+class RollupPyramid:
+  """Rollups of the same columns at several widths, from finest to coarsest.
+
+  Every tier is updated as rows arrive. A query for a time range and point
+  budget is answered from the finest tier which still holds the range and
+  has at most budget buckets within it."""
+
+  def __init__(self, columns: list[str],
+               tiers: dict[str, str | None] | None = None):
+    if tiers is None:
+      tiers = TIERS
+    self.columns = columns
+    self.tiers = {w: Rollup(w, columns) for w in tiers}
+    self.retention = {w: None if r is None else pd.Timedelta(r)
+                      for w, r in tiers.items()}
+
+  def to_arrays(self):
+    """Gather state of every tier for checkpointing."""
+    arrays = {}
+    for width, rollup in self.tiers.items():
+      arrays.update(rollup.to_arrays(width + '_'))
+    return arrays
+
+  @classmethod
+  def from_arrays(cls, columns: list[str], arrays: dict[str, np.ndarray],
+                  tiers: dict[str, str | None] | None = None):
+    """Restore every tier from a checkpoint."""
+    pyramid = cls(columns, tiers)
+    for width in pyramid.tiers:
+      pyramid.tiers[width] = Rollup.from_arrays(width, columns, arrays,
+                                                width + '_')
+    return pyramid
+
+  def fold(self, times: np.ndarray, values: np.ndarray):
+    """Fold new rows into every tier."""
+    for rollup in self.tiers.values():
+      rollup.fold(times, values)
+
+  def evict(self, now: pd.Timestamp | None = None):
+    """Drop buckets older than the retention of their tier."""
+    if now is None:
+      now = pd.Timestamp(utcnow())
+    for width, retention in self.retention.items():
+      if retention is not None:
+        self.tiers[width].evict(now - retention)
+
+  def covering(self, start: pd.Timestamp | None):
+    """List tiers holding every bucket since start, finest first."""
+    tiers = list(self.tiers.values())
+    return [r for r in tiers if r.covers(start)] or tiers[-1:]
+
+  def choose(self, start: pd.Timestamp | None = None,
+             end: pd.Timestamp | None = None, budget: int = 5000):
+    """Choose finest tier holding [start, end) within budget buckets."""
+    covering = self.covering(start)
+    for rollup in covering:
+      if rollup.span(start, end) <= budget:
+        return rollup
+    return covering[-1]
+
+  def total_count(self, start: pd.Timestamp | None = None,
+                  end: pd.Timestamp | None = None):
+    """Count readings in [start, end) using the finest tier holding them."""
+    return self.covering(start)[0].total_count(start, end)
+
+  def query(self, start: pd.Timestamp | None = None,
+            end: pd.Timestamp | None = None, budget: int = 5000,
+            stats: tuple[str, ...] = ('mean',)):
+    """Aggregate [start, end) from the finest tier fitting in budget."""
+    return self.choose(start, end, budget).frame(start, end, stats=stats)
@@ -0,0 +1,61 @@
+"""Schedule sensor sampling at fixed deadlines on the monotonic clock."""
+
+from __future__ import annotations
+import heapq
+import asyncio
+import logging
+
+
+# deadlines closer than this are treated as the same tick
+TOLERANCE = 1e-6
+
+
+class Scheduler:
+  """Produce ticks for several tasks, each every one of intervals seconds.
+
+  Task i is due at start + k * intervals[i] for k = 0, 1, 2, ... on the event
+  loop's monotonic clock, so neither the time spent within a tick nor
+  rounding accumulates as drift. Iterating yields each deadline together
+  with the sorted tasks due at it, taken from a heap of next deadlines. When
+  ticks are missed, say after a stall of the event loop, the 'skip' policy
+  runs only the latest missed tick of each task while the 'catchup' policy
+  runs every missed tick immediately."""
+
+  def __init__(self, intervals: list[float], policy: str = 'skip'):
+    if policy not in ['skip', 'catchup']:
+      raise ValueError(f'Unknown missed tick policy {policy}')
+    self.intervals = intervals
+    self.policy = policy
+    self.ticks = 0
+    self.missed = [0] * len(intervals)
+
+  async def __aiter__(self):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    counts = [0] * len(self.intervals)  # k for each task
+    heap = [(start, i) for i in range(len(self.intervals))]
+    heapq.heapify(heap)
+
+    while heap:
+      deadline = heap[0][0]
+      now = loop.time()
+      if now < deadline:
+        await asyncio.sleep(deadline - now)
+        now = loop.time()
+
+      due = []
+      while heap and heap[0][0] <= deadline + TOLERANCE:
+        _, i = heapq.heappop(heap)
+        due.append(i)
+        counts[i] += 1
+        interval = self.intervals[i]
+        late = now - (start + counts[i] * interval)
+        if self.policy == 'skip' and late >= 0:
+          missed = int(late // interval) + 1
+          self.missed[i] += missed
+          counts[i] += missed
+          logging.warning('Sampling fell behind, skipped %d ticks', missed)
+        heapq.heappush(heap, (start + counts[i] * interval, i))
+
+      self.ticks += 1
+      yield deadline, sorted(due)
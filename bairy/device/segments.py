@@ -0,0 +1,365 @@
+"""Store readings as fixed-width typed columns in chunked segment files.
+
+Each segment file begins with a fixed-size json header recording its columns,
+capacity, number of rows and min/max time. The header is followed by one
+preallocated region per column: first the epoch timestamps, then one region
+for each sensor header. Appending writes the new values into each region and
+then rewrites the header, so readers never see rows beyond n_rows."""
+
+from __future__ import annotations
+from typing import Any, Iterator
+import os
+import glob
+import json
+import struct
+import numpy as np
+import pandas as pd
+from bairy.device.sensor import Sensor
+from bairy.device.timestamps import format_epoch, format_time, from_epoch
+
+
+MAGIC = b'BAIRYSEG'
+HEADER_SIZE = 4096
+TIME_DTYPE = '<f8'
+# column type -> (numpy dtype, value marking a missing reading)
+COLUMN_TYPES: dict[str, tuple[str, Any]] = {'uint16': ('<u2', 0xFFFF),
+                                            'bool': ('u1', 0xFF),
+                                            'float': ('<f8', np.nan)}
+
+
+def columns_from_sensors(sensors: list[Sensor]):
+  """Determine typed columns for a list of sensors."""
+  return [[h, s.column_type] for s in sensors for h in s.headers]
+
+
+def encode_column(values: list[Any], column_type: str):
+  """Convert a list of readings into a typed array, marking missing values."""
+  dtype, missing = COLUMN_TYPES[column_type]
+  return np.array([missing if v is None else v for v in values], dtype=dtype)
+
+
+def decode_column(values: np.ndarray, column_type: str):
+  """Convert a typed array into floats with NaN for missing readings."""
+  _, missing = COLUMN_TYPES[column_type]
+  if column_type == 'float':
+    return values
+  is_missing = values == missing
+  if not is_missing.any():
+    return values.astype(np.int64)
+  values = values.astype(np.float64)
+  values[is_missing] = np.nan
+  return values
+
+
+class Segment:
+  """A single preallocated segment file holding up to capacity rows."""
+
+  def __init__(self, path: str, header: dict[str, Any]):
+    self.path = path
+    self.header = header
+
+    # byte offset of each column region, starting with time
+    self.offsets: dict[str, int] = {}
+    offset = HEADER_SIZE
+    for name, dtype in self.dtypes().items():
+      self.offsets[name] = offset
+      offset += header['capacity'] * np.dtype(dtype).itemsize
+    self.size = offset
+
+  @classmethod
+  def create(cls, path: str, columns: list[list[str]], capacity: int):
+    """Create an empty segment file with space for capacity rows."""
+    header = {'columns': columns, 'capacity': capacity, 'n_rows': 0,
+              'min_time': None, 'max_time': None}
+    segment = cls(path, header)
+    with open(path, 'wb') as f:
+      f.truncate(segment.size)  # sparse on most file systems
+      segment.write_header(f)
+    return segment
+
+  @classmethod
+  def open(cls, path: str):
+    """Load segment by reading its header."""
+    with open(path, 'rb') as f:
+      raw = f.read(HEADER_SIZE)
+    if raw[:8] != MAGIC:
+      raise ValueError(f'{path} is not a segment file')
+    (length,) = struct.unpack('<I', raw[8:12])
+    return cls(path, json.loads(raw[12:12 + length]))
+
+  @property
+  def n_rows(self) -> int:
+    return self.header['n_rows']
+
+  @property
+  def columns(self) -> list[list[str]]:
+    return self.header['columns']
+
+  def dtypes(self):
+    """Map column names, including time, to numpy dtypes."""
+    dtypes = {'time': TIME_DTYPE}
+    for name, column_type in self.columns:
+      dtypes[name] = COLUMN_TYPES[column_type][0]
+    return dtypes
+
+  def overlaps(self, start: float | None, end: float | None):
+    """Check if segment holds any rows within [start, end)."""
+    if self.n_rows == 0:
+      return False
+    if start is not None and self.header['max_time'] < start:
+      return False
+    if end is not None and self.header['min_time'] >= end:
+      return False
+    return True
+
+  def write_header(self, f):
+    """Write json header at the start of the file."""
+    raw = json.dumps(self.header).encode()
+    if len(raw) + 12 > HEADER_SIZE:
+      raise OverflowError('Too many columns for segment header')
+    os.pwrite(f.fileno(), MAGIC + struct.pack('<I', len(raw)) + raw, 0)
+
+  def append(self, f, times: np.ndarray, values: dict[str, np.ndarray]):
+    """Write arrays into each column region of the open file f."""
+    n = self.n_rows
+    dtypes = self.dtypes()
+    arrays = {'time': times, **values}
+    for name, dtype in dtypes.items():
+      array = np.ascontiguousarray(arrays[name], dtype=dtype)
+      offset = self.offsets[name] + n * array.itemsize
+      os.pwrite(f.fileno(), array.tobytes(), offset)
+
+    self.header['n_rows'] = n + len(times)
+    if self.header['min_time'] is None:
+      self.header['min_time'] = float(times[0])
+    self.header['max_time'] = float(times[-1])
+    self.write_header(f)
+
+  def read_times(self):
+    """Read the time column of every row."""
+    return np.fromfile(self.path, TIME_DTYPE, self.n_rows, offset=HEADER_SIZE)
+
+  def read_rows(self, lo: int, hi: int, columns: list[str] | None = None):
+    """Read raw typed arrays of rows lo through hi - 1."""
+    hi = min(hi, self.n_rows)
+    arrays: dict[str, np.ndarray] = {}
+    with open(self.path, 'rb') as f:
+      for name, dtype in self.dtypes().items():
+        if name != 'time' and columns is not None and name not in columns:
+          continue
+        itemsize = np.dtype(dtype).itemsize
+        f.seek(self.offsets[name] + lo * itemsize)
+        arrays[name] = np.fromfile(f, dtype, hi - lo)
+    return arrays
+
+  def read(self, start: float | None = None, end: float | None = None,
+           columns: list[str] | None = None):
+    """Read raw typed arrays of rows within [start, end)."""
+    lo, hi = 0, self.n_rows
+    if start is not None or end is not None:
+      times = self.read_times()
+      if start is not None:
+        lo = int(np.searchsorted(times, start))
+      if end is not None:
+        hi = int(np.searchsorted(times, end))
+    return self.read_rows(lo, hi, columns)
+
+  def text_frame(self, arrays: dict[str, np.ndarray]):
+    """Decode arrays into a DataFrame written as it would be in data.csv."""
+    df = pd.DataFrame({'time': format_epoch(arrays['time'])})
+    for name, column_type in self.columns:
+      if name not in arrays:
+        continue
+      df[name] = decode_column(arrays[name], column_type)
+      if column_type != 'float':  # keep integers when values missing
+        df[name] = df[name].astype('Int64')
+    return df
+
+  def frame(self, arrays: dict[str, np.ndarray]):
+    """Decode arrays read from segment into a DataFrame with a time column."""
+    types = dict(map(tuple, self.columns))
+    df = pd.DataFrame({name: decode_column(arrays[name], types[name])
+                       for name in arrays if name != 'time'})
+    df.insert(0, 'time', from_epoch(arrays['time']))
+    return df
+
+
+class SegmentStore:
+  """Append-only collection of segment files within a directory.
+
+  A new segment is started when the current one is full or when the sensor
+  columns change, so older segments keep their own columns."""
+
+  def __init__(self, directory: str, capacity: int = 86400):
+    self.directory = directory
+    self.capacity = capacity
+    if not os.path.exists(directory):
+      os.mkdir(directory)
+    self.active: Segment | None = None
+    self.f = None
+
+  def paths(self):
+    """Return sorted paths of all segment files."""
+    return sorted(glob.glob(os.path.join(self.directory, '*.seg')))
+
+  def segments(self):
+    """Load headers of every segment."""
+    return [Segment.open(p) for p in self.paths()]
+
+  def next_path(self):
+    """Path for a new segment following the latest one."""
+    paths = self.paths()
+    i = int(os.path.basename(paths[-1])[:-4]) + 1 if paths else 0
+    return os.path.join(self.directory, f'{i:06d}.seg')
+
+  def open_active(self, columns: list[list[str]]):
+    """Open latest segment for appending, creating one if needed."""
+    if self.active is not None and self.active.columns == columns and \
+            self.active.n_rows < self.active.header['capacity'] and \
+            not self.replaced():
+      return self.active
+
+    self.close()
+    paths = self.paths()
+    segment = Segment.open(paths[-1]) if paths else None
+    if segment is None or segment.columns != columns or \
+            segment.n_rows >= segment.header['capacity']:
+      segment = Segment.create(self.next_path(), columns, self.capacity)
+    self.active = segment
+    self.f = open(segment.path, 'r+b')
+    return segment
+
+  def replaced(self):
+    """Check if the active segment was removed or replaced since opening,
+    as when data is removed while the sampler runs."""
+    try:
+      return not os.path.samestat(os.fstat(self.f.fileno()),
+                                  os.stat(self.active.path))
+    except FileNotFoundError:
+      return True
+
+  def append(self, columns: list[list[str]], times: list[float],
+             rows: list[dict[str, Any]]):
+    """Append rows of readings, spilling into new segments as needed."""
+    types = dict(map(tuple, columns))
+    while times:
+      segment = self.open_active(columns)
+      n = segment.header['capacity'] - segment.n_rows
+      chunk_times, times = times[:n], times[n:]
+      chunk_rows, rows = rows[:n], rows[n:]
+      values = {name: encode_column([r.get(name) for r in chunk_rows], t)
+                for name, t in types.items()}
+      segment.append(self.f, np.array(chunk_times, dtype=TIME_DTYPE), values)
+
+  def sync(self):
+    """Force active segment onto storage device."""
+    if self.f is not None:
+      os.fsync(self.f.fileno())
+
+  def close(self):
+    """Close the active segment."""
+    if self.f is not None:
+      self.f.close()
+    self.f = None
+    self.active = None
+
+  def read_df(self, start: float | None = None, end: float | None = None,
+              columns: list[str] | None = None):
+    """Read rows within [start, end) as a DataFrame with a time column."""
+    dfs = []
+    for segment in self.segments():
+      if not segment.overlaps(start, end):
+        continue
+      dfs.append(segment.frame(segment.read(start, end, columns)))
+
+    if not dfs:
+      return pd.DataFrame(columns=['time'] + (columns or []))
+    # segments with older sensor sets are missing some columns
+    return pd.concat(dfs, ignore_index=True)
+
+  def read_after(self, name: str | None, row: int = 0):
+    """Read rows beyond row of segment name, or every row if name is None.
+
+    Returns a DataFrame and the name and row count of the last segment, or
+    None if segment name no longer exists."""
+    paths = self.paths()
+    names = [os.path.basename(p) for p in paths]
+    if name is None:
+      i, row = 0, 0
+    elif name in names:
+      i = names.index(name)
+    else:
+      return None
+
+    dfs = []
+    for path in paths[i:]:
+      segment = Segment.open(path)
+      dfs.append(segment.frame(segment.read_rows(row, segment.n_rows)))
+      name, row = os.path.basename(path), segment.n_rows
+    if not dfs:
+      return pd.DataFrame(columns=['time']), name, row
+    return pd.concat(dfs, ignore_index=True), name, row
+
+  def expire(self, before: float):
+    """Remove segments whose rows are all before epoch time before."""
+    removed = []
+    for segment in self.segments():
+      if self.active is not None and segment.path == self.active.path:
+        continue
+      if segment.n_rows and segment.header['max_time'] < before:
+        os.remove(segment.path)
+        removed.append(segment.path)
+    return removed
+
+  def count_rows(self):
+    """Count rows across all segments without reading any data."""
+    return sum(s.n_rows for s in self.segments())
+
+  def latest(self, max_rows: int = 4096):
+    """Get most recent value of each column as a dictionary.
+
+    Only the final max_rows rows of the latest segment are searched, as
+    sensors read at slower rates are missing from most rows."""
+    segments = [s for s in self.segments() if s.n_rows]
+    if not segments:
+      return {}
+    segment = segments[-1]
+    n = segment.n_rows
+    df = segment.frame(segment.read_rows(max(n - max_rows, 0), n))
+    d: dict[str, Any] = {'time': format_time(df['time'].iloc[-1])}
+    for k, v in df.drop(columns='time').ffill().iloc[-1].items():
+      d[k] = None if pd.isna(v) else int(v)
+    return d
+
+  def headers(self, segments: list[Segment] | None = None):
+    """List sensor headers of every segment, oldest first."""
+    headers: list[str] = []
+    for segment in self.segments() if segments is None else segments:
+      headers += [n for n, _ in segment.columns if n not in headers]
+    return headers
+
+  def iter_frames(self, start: float | None = None, end: float | None = None,
+                  columns: list[str] | None = None,
+                  chunk_rows: int = 10000) -> Iterator[pd.DataFrame]:
+    """Read rows within [start, end) as text, at most chunk_rows at a time."""
+    for segment in self.segments():
+      if not segment.overlaps(start, end):
+        continue
+      times = segment.read_times()
+      lo = 0 if start is None else int(np.searchsorted(times, start))
+      hi = len(times) if end is None else int(np.searchsorted(times, end))
+      for i in range(lo, hi, chunk_rows):
+        arrays = segment.read_rows(i, min(i + chunk_rows, hi), columns)
+        yield segment.text_frame(arrays)
+
+  def iter_csv(self, chunk_rows: int = 10000) -> Iterator[str]:
+    """Export all segments as CSV text, one segment chunk at a time."""
+    segments = self.segments()
+    headers = self.headers(segments)
+    yield 'time,' + ','.join(headers) + '\n'
+
+    for segment in segments:
+      for lo in range(0, segment.n_rows, chunk_rows):
+        df = segment.text_frame(segment.read_rows(lo, lo + chunk_rows))
+        df = df.reindex(columns=['time'] + headers)
+        yield df.to_csv(header=False, index=False)
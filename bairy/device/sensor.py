@@ -1,83 +1,171 @@
-"""Defining Sensor ABC and its derived classes."""
+"""Defining Sensor base class and the built in sensor drivers.
+
+Each driver declares the model validating its configs, the headers of the
+columns it writes, their column type and units, and imports any hardware
+library only once a sensor of its type is created."""
 
 from __future__ import annotations
+from typing import Any, Callable
 import random
 import logging
+from functools import partial
 from pydantic import BaseModel
-import smbus2  # or just smbus
-from gpiozero import DigitalInputDevice
+from bairy.device.bus import BUSES, BusManager
+from bairy.device.validate import AirSensorConfigs, DigitalSensorConfigs, \
+    RandomSensorConfigs
+
+
+# byte positions of readings within the air sensor's I2C block
+AIR_KEYS = {
+    'pm_1.0': (4, 5),
+    'pm_2.5': (6, 7),
+    'pm_10': (8, 9)}
+# ignoring the other possible readings
+# 'n_beyond_0.3': (16, 17),
+# 'n_beyond_0.5': (18, 19),
+# 'n_beyond_1.0': (20, 21),
+# 'n_beyond_2.5': (22, 23),
+# 'n_beyond_5.0': (24, 25),
+# 'n_beyond_10': (26, 27)}
 
 
 class Sensor:
-  """An abstract base class for sensors."""
+  """Base class of sensor drivers.
 
-  def __init__(self, configs: BaseModel, prev_reading: int | None = None):
-    for k, v in configs.dict().items():
-      setattr(self, k, v)
-    self.prev_reading = prev_reading
+  Subclasses set the class attributes below and implement reader, which
+  returns the callable taking a reading. It is bound once to read, so each
+  tick calls it directly."""
+
+  sensor_type = ''
+  config_model: type[BaseModel] = BaseModel
+  column_type = 'float'  # one of the segments COLUMN_TYPES
+  units = ''
+  priority = 0  # plots keep the sensor types of highest priority
+
+  __slots__ = ('name', 'headers', 'interval', 'timeout', 'read')
+
+  def __init__(self, configs: Any):
+    self.headers = self.headers_for(configs)
+    self.name = self.headers[0]
+    self.interval: float | None = configs.interval
+    self.timeout: float = configs.timeout
+    self.read: Callable[[], dict[str, Any]] = self.reader()
+
+  @classmethod
+  def headers_for(cls, configs: Any) -> list[str]:
+    """Headers of the columns written by a sensor with these configs."""
+    return [configs.header]
 
-    if self.sensor_type == 'digital':
-      self.device = DigitalInputDevice(self.bcm_pin)
+  def reader(self) -> Callable[[], dict[str, Any]]:
+    """Create the callable taking a reading as a dictionary of values."""
+    raise NotImplementedError
 
-  def read(self) -> dict[str, int | None]:
-    """Read sensor measurements and return dictionary of values."""
-    read_dict = {'air': self.read_air,
-                 'random': self.read_random,
-                 'digital': self.read_digital}
-    return read_dict[self.sensor_type]()
+
+class AirSensor(Sensor):
+  """Particulate matter sensor read over I2C."""
+
+  sensor_type = 'air'
+  config_model = AirSensorConfigs
+  column_type = 'uint16'
+  units = 'micrograms / cubic meter'
+  priority = 2
+
+  __slots__ = ('read_block',)
+
+  def __init__(self, configs: AirSensorConfigs, buses: BusManager = BUSES):
+    bus = buses.get(configs.bus)
+    self.read_block = partial(bus.read_block, configs.i2c_address, 0, 32)
+    super().__init__(configs)
+    self.name = f'air_{configs.bus}_{configs.i2c_address:#04x}'
+
+  @classmethod
+  def headers_for(cls, configs: AirSensorConfigs):
+    return list(AIR_KEYS)
+
+  def reader(self):
+    return self.read_air
 
   def read_air(self):
     """Read I2C data from air sensor."""
+    data_dict: dict[str, int | None] = {k: None for k in AIR_KEYS}
+
+    try:
+      data: list[int] = self.read_block()
+    except OSError:  # couldn't read data -- sensor disconnected?
+      logging.warning('Unable to connect to air sensor over I2C')
+      return data_dict
 
-    keys_dict = {
-        'pm_1.0': (4, 5),
-        'pm_2.5': (6, 7),
-        'pm_10': (8, 9)}
-    # ignoring the other possible readings
-    # 'n_beyond_0.3': (16, 17),
-    # 'n_beyond_0.5': (18, 19),
-    # 'n_beyond_1.0': (20, 21),
-    # 'n_beyond_2.5': (22, 23),
-    # 'n_beyond_5.0': (24, 25),
-    # 'n_beyond_10': (26, 27)}
-
-    data_dict: dict[str, int | None] = {k: None for k in keys_dict}
-
-    with smbus2.SMBus(1) as bus:
-      try:
-        data: list[int] = bus.read_i2c_block_data(self.i2c_address, 0, 32)
-      except OSError:  # couldn't read data -- sensor disconnected?
-        logging.warning('Unable to connect to air sensor over I2C')
-        return data_dict
-
-      # start characters, check sum, error byte
-      try:
-        assert data[0] == 0x42
-        assert data[1] == 0x4d
-        assert data[29] == 0
-      except AssertionError:
-        logging.warning('Internal error on air sensor.')
-      if sum(data[:30]) != (data[30] << 8) + data[31]:
-        logging.warning('Bad checksum from air sensor.')
-        logging.warning(data)
-
-      for k, (byte1, byte2) in keys_dict.items():
-        data_dict[k] = (data[byte1] << 8) + data[byte2]
+    # start characters, check sum, error byte
+    try:
+      assert data[0] == 0x42
+      assert data[1] == 0x4d
+      assert data[29] == 0
+    except AssertionError:
+      logging.warning('Internal error on air sensor.')
+    if sum(data[:30]) != (data[30] << 8) + data[31]:
+      logging.warning('Bad checksum from air sensor.')
+      logging.warning(data)
+
+    for k, (byte1, byte2) in AIR_KEYS.items():
+      data_dict[k] = (data[byte1] << 8) + data[byte2]
     return data_dict
 
+
+class DigitalSensor(Sensor):
+  """Generic digital sensor read from a GPIO pin."""
+
+  sensor_type = 'digital'
+  config_model = DigitalSensorConfigs
+  column_type = 'bool'
+  units = 'intensity'
+  priority = 1
+
+  __slots__ = ('bcm_pin', 'device', 'device_class')
+
+  def __init__(self, configs: DigitalSensorConfigs):
+    # importing gpiozero only once a digital sensor is used
+    from gpiozero import DigitalInputDevice  # pylint: disable=import-outside-toplevel
+    self.bcm_pin = configs.bcm_pin
+    self.device_class = DigitalInputDevice
+    self.device = DigitalInputDevice(self.bcm_pin)
+    super().__init__(configs)
+
+  def reader(self):
+    return self.read_digital
+
   def read_digital(self):
     """Read value associated to generic digital sensor."""
     try:
       v: int | None = self.device.value
     except RuntimeError:
-      logging.warning('RuntimeError on sensor with header: %s', self.header)
+      logging.warning('RuntimeError on sensor with header: %s', self.name)
       v = None
 
       # try closing then reopening
       self.device.close()
-      self.device = DigitalInputDevice(self.bcm_pin)
+      self.device = self.device_class(self.bcm_pin)
+
+    return {self.name: v}
+
+
+class RandomSensor(Sensor):
+  """Random walk for testing device."""
+
+  sensor_type = 'random'
+  config_model = RandomSensorConfigs
+  column_type = 'uint16'
+  units = 'random'
+  priority = 0
+
+  __slots__ = ('prev_reading',)
+
+  def __init__(self, configs: RandomSensorConfigs,
+               prev_reading: int | None = None):
+    self.prev_reading = prev_reading
+    super().__init__(configs)
 
-    return {self.header: v}
+  def reader(self):
+    return self.read_random
 
   def read_random(self):
     """Create random data for testing device."""
@@ -87,4 +175,4 @@ class Sensor:
       r = self.prev_reading + random.randint(-1, 1)
       r = max(min(r, 50), 0)  # clipping
     self.prev_reading = r
-    return {self.header: r}
+    return {self.name: r}
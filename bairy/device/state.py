@@ -0,0 +1,123 @@
+"""Maintain a summary of stored data as the sampler writes it.
+
+The sampler keeps the number of rows, the time of the first row and the
+latest value of each column up to date with every row it writes, and
+periodically saves them with the size of stored data to a small json file.
+The app answers /status from this file without reading any data."""
+
+from __future__ import annotations
+from typing import Any
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from bairy.device import dataset
+from bairy.device.timestamps import format_time
+
+
+STALE_AGE = 10.0  # seconds after which state saved by the sampler is stale
+
+
+class DataState:
+  """Summary of stored data, updated with each row written."""
+
+  def __init__(self, headers: list[str], n_rows: int = 1, size: int = 0,
+               first: str | None = None,
+               latest: dict[str, Any] | None = None):
+    self.headers = headers
+    self.n_rows = n_rows  # including a line of headers
+    self.size = size  # bytes of stored data when last saved
+    self.first = first
+    self.latest: dict[str, Any] = {'time': None}
+    self.latest.update({h: None for h in headers})
+    if latest:
+      self.latest.update({k: v for k, v in latest.items() if k in self.latest})
+    self.updated: float | None = None  # epoch seconds when last saved
+    self.saved = False
+
+  @classmethod
+  def scan(cls, headers: list[str]):
+    """Summarize stored data by reading it, which is slow for large data."""
+    logging.info('Scanning stored data for status')
+    return cls(headers, dataset.count_rows(), dataset.data_size(),
+               dataset.first_time(), dataset.latest())
+
+  @classmethod
+  def load(cls, path: str):
+    """Load saved state, or None if there is none."""
+    try:
+      with open(path) as f:
+        d = json.load(f)
+    except (FileNotFoundError, ValueError):
+      return None
+    state = cls(d['headers'], d['n_rows'], d['size'], d['first'], d['latest'])
+    state.updated = d['updated']
+    return state
+
+  @classmethod
+  def current(cls, path: str):
+    """Load saved state if the sampler is running or data is unchanged.
+
+    State is current if saved within the last STALE_AGE seconds, or if data
+    still has the size recorded when the sampler stopped."""
+    state = cls.load(path)
+    if state is None or state.updated is None:
+      return None
+    if time.time() - state.updated < STALE_AGE or \
+            state.size == dataset.data_size():
+      return state
+    return None
+
+  @classmethod
+  def resume(cls, path: str, headers: list[str]):
+    """Load saved state if it still matches stored data, else scan data.
+
+    State saved on a clean shutdown records the final size of data, so a
+    crash, or data changed while stopped, shows up as a different size."""
+    state = cls.load(path)
+    if state is None or state.headers != headers or \
+            state.size != dataset.data_size():
+      return cls.scan(headers)
+    return state
+
+  def update(self, data: dict[str, Any], now: datetime):
+    """Account for a row written at time now."""
+    t = format_time(now)
+    self.n_rows += 1
+    if self.first is None:
+      self.first = t
+    self.latest['time'] = t
+    for k, v in data.items():
+      if v is not None:
+        self.latest[k] = v
+
+  def as_dict(self):
+    """Gather state as a dictionary."""
+    return {'headers': self.headers, 'n_rows': self.n_rows, 'size': self.size,
+            'first': self.first, 'last': self.latest['time'],
+            'latest': self.latest, 'updated': self.updated}
+
+  def write(self, path: str):
+    """Atomically write state as json."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+      json.dump(self.as_dict(), f)
+    os.replace(tmp_path, path)
+
+  def save(self, path: str):
+    """Measure the size of stored data and write state, returning whether
+    data was removed since the last save.
+
+    A missing state file after the first save means data was removed, so
+    stored data is scanned again."""
+    removed = self.saved and not os.path.exists(path)
+    if removed:
+      scanned = self.scan(self.headers)
+      self.n_rows, self.first = scanned.n_rows, scanned.first
+      self.latest = scanned.latest
+    self.size = dataset.data_size()
+    self.updated = time.time()
+    self.write(path)
+    self.saved = True
+    return removed
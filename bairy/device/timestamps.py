@@ -0,0 +1,61 @@
+"""Format and parse the UTC timestamps stamped on each row of data.
+
+Rows are stamped with naive UTC times at millisecond resolution. Rows
+written by earlier versions hold local times at second resolution; the
+device converts these to UTC when it starts."""
+
+from __future__ import annotations
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'  # truncated to milliseconds
+
+
+def utcnow():
+  """Current time as a naive UTC datetime."""
+  return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def format_time(t: datetime):
+  """Format a time as written in data files."""
+  return t.strftime(TIME_FORMAT)[:-3]
+
+
+def parse_time(time: bytes | str):
+  """Parse a time as written in data files."""
+  if isinstance(time, bytes):
+    time = time.decode()
+  return datetime.fromisoformat(time)
+
+
+def to_epoch(t: datetime):
+  """Convert a naive UTC time into epoch seconds."""
+  return t.replace(tzinfo=timezone.utc).timestamp()
+
+
+def from_epoch(times: np.ndarray):
+  """Convert epoch seconds into naive UTC timestamps.
+
+  Epoch seconds are rounded to microseconds, the precision of the times they
+  were converted from, since a float such as 1.922 may be held as
+  1.92199999 and would otherwise be truncated a millisecond early."""
+  micros = np.round(np.asarray(times, np.float64) * 1e6).astype(np.int64)
+  return pd.to_datetime(micros, unit='us')
+
+
+def format_epoch(times: np.ndarray):
+  """Format epoch seconds as written in data files."""
+  return from_epoch(times).strftime(TIME_FORMAT).str[:-3]
+
+
+def local_to_utc(times: pd.Series):
+  """Convert naive local times into naive UTC times.
+
+  The offset of the local timezone is found once per distinct hour. Times
+  within the hour repeated when clocks go back take its first offset."""
+  hours = times.dt.floor('h')
+  offsets = {h: h.to_pydatetime().astimezone().utcoffset()
+             for h in hours.drop_duplicates()}
+  return times - pd.to_timedelta(hours.map(offsets))
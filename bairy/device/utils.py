@@ -2,9 +2,12 @@
 
 from __future__ import annotations
 import os
+import time
 import socket
 import shutil
-import pkg_resources
+import threading
+import functools
+from typing import Any, Callable
 from bairy.device import configs
 
 
@@ -15,35 +18,38 @@ def read_headers():
     return headers.rstrip()
 
 
-def read_last_line():
-  """Read last line of data."""
-  # fast approach to get final line of a file
-  # see https://stackoverflow.com/questions/46258499/
+def read_tail(max_bytes: int = 1 << 16):
+  """Read complete lines of data within the final max_bytes, newest first."""
   with open(configs.DATA_PATH, 'rb') as f:
-    f.seek(-2, os.SEEK_END)
-    while f.read(1) != b'\n':
-      f.seek(-2, os.SEEK_CUR)
-    return f.readline().decode()
+    size = f.seek(0, os.SEEK_END)
+    f.seek(max(size - max_bytes, 0))
+    lines = f.read().split(b'\n')
+  # the first line is partial or holds headers; the last follows a newline
+  return [line.decode() for line in reversed(lines[1:-1])]
 
 
 def latest_data():
-  """Get last line of data as dictionary."""
-  last_line = read_last_line()
-  values = last_line.split(',')
-  time = values.pop(0)
-  values = [int(v) for v in values]
+  """Get most recent value of each column as dictionary.
 
-  d: dict[str, str | int] = {'time': time}
+  Sensors read at slower rates leave their cells empty in most rows, so rows
+  are scanned backward from the end of the file."""
   headers = read_headers().split(',')[1:]
-  d.update(dict(zip(headers, values)))
+  d: dict[str, str | int | None] = {'time': None}
+  d.update({h: None for h in headers})
+  for line in read_tail():
+    values = line.split(',')
+    if d['time'] is None:
+      d['time'] = values[0]
+    for h, v in zip(headers, values[1:]):
+      if d[h] is None and v.strip():
+        d[h] = int(v)
+    if all(v is not None for v in d.values()):
+      break
   return d
 
 
-def get_data_size():
-  """Return the size of the data file as a string."""
-  if not os.path.exists(configs.DATA_PATH):
-    return '0'
-  n = os.path.getsize(configs.DATA_PATH)
+def format_size(n: float):
+  """Format a number of bytes as a string."""
   for unit in ['', 'Ki', 'Mi', 'Gi']:
     if n < 1024.0:
       return f'{n:.2f} {unit}B'
@@ -58,22 +64,120 @@ def count_rows(path: str):
     return sum(1 for _ in f)
 
 
+def file_etag(path: str):
+  """Tag a file by its modification time and size."""
+  stat = os.stat(path)
+  return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str):
+  """Check an If-None-Match header against etag, ignoring weakness."""
+  if if_none_match is None:
+    return False
+  tags = [strip_weak(t.strip()) for t in if_none_match.split(',')]
+  return '*' in tags or strip_weak(etag) in tags
+
+
+def strip_weak(etag: str):
+  """Drop the weakness indicator of an ETag."""
+  return etag[2:] if etag.startswith('W/') else etag
+
+
+def parse_range(header: str, size: int):
+  """Parse a single byte range header into first and last byte positions.
+
+  Raises ValueError if the range is malformed or not satisfiable."""
+  unit, _, spec = header.partition('=')
+  first, sep, last = spec.strip().partition('-')
+  if unit.strip() != 'bytes' or not sep or ',' in spec:
+    raise ValueError(f'Unsupported range {header}')
+  if first:
+    lo = int(first)
+    hi = int(last) if last else size - 1
+  else:  # suffix range holding the final bytes
+    lo, hi = max(size - int(last), 0), size - 1
+  hi = min(hi, size - 1)
+  if lo > hi:
+    raise ValueError(f'Unsatisfiable range {header}')
+  return lo, hi
+
+
+def iter_file(path: str, first: int = 0, last: int | None = None,
+              chunk_size: int = 1 << 16):
+  """Stream bytes first through last of a file, closing it when done."""
+  with open(path, 'rb') as f:
+    f.seek(first)
+    remaining = None if last is None else last - first + 1
+    while remaining is None or remaining > 0:
+      chunk = f.read(chunk_size if remaining is None else
+                     min(chunk_size, remaining))
+      if not chunk:
+        break
+      if remaining is not None:
+        remaining -= len(chunk)
+      yield chunk
+
+
+def ttl_cache(seconds: float):
+  """Cache the result of a function without arguments for seconds."""
+  def decorator(f: Callable[[], Any]):
+    cached: list[Any] = []  # holding expiry time and result once called
+
+    @functools.wraps(f)
+    def wrapper():
+      now = time.monotonic()
+      if not cached or now >= cached[0]:
+        cached[:] = [now + seconds, f()]
+      return cached[1]
+    wrapper.cache_clear = cached.clear  # type: ignore
+    return wrapper
+  return decorator
+
+
+@ttl_cache(300)
 def get_local_ip_address():
-  """See https://stackoverflow.com/questions/166506/"""
+  """See https://stackoverflow.com/questions/166506/
 
+  Returns None when offline."""
   s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-  s.connect(('8.8.8.8', 80))
-  ip: str = s.getsockname()[0]
-  s.close()
+  try:
+    # connecting a UDP socket sends no packets, but needs a route
+    s.connect(('8.8.8.8', 80))
+    ip: str | None = s.getsockname()[0]
+  except OSError:
+    ip = None
+  finally:
+    s.close()
   return ip
 
 
+@ttl_cache(10)
 def get_disk_space():
   """Get available disk space."""
   gb = shutil.disk_usage('/').free / (1 << 30)
   return f'{gb:.3f} GB'
 
 
+@ttl_cache(3600)
 def get_bairy_version():
   """Use pkg_resources to get bairy version."""
+  import pkg_resources  # pylint: disable=import-outside-toplevel
   return pkg_resources.get_distribution('bairy').version
+
+
+class LazyWSGIApp:
+  """WSGI app built by factory on its first request.
+
+  Mounting Dash apps this way keeps Dash and Plotly out of startup."""
+
+  def __init__(self, factory: Callable[[], Any]):
+    self.factory = factory
+    self.app: Any = None
+    self.lock = threading.Lock()
+
+  def __call__(self, environ: dict[str, Any], start_response: Any):
+    if self.app is None:
+      with self.lock:
+        if self.app is None:
+          self.app = self.factory()
+    return self.app(environ, start_response)
@@ -3,13 +3,25 @@ d -> Device(**d.dict()) is an involution."""
 
 
 # cannot use __future__ annotations with pydantic
-from typing import List, Union
+from typing import Any, List, Optional
 from pydantic import BaseModel, validator
 
 
-class AirSensorConfigs(BaseModel):
+class SensorConfigs(BaseModel):
+  """Base of the configs models of sensors, each with an interval field."""
+
+  @validator('interval', check_fields=False)
+  def check_interval(cls, value: Optional[float]):
+    assert value is None or value >= 0.01
+    return value
+
+
+class AirSensorConfigs(SensorConfigs):
   sensor_type: str = 'air'
   i2c_address: int
+  bus: int = 1  # I2C bus number, as in /dev/i2c-1
+  timeout: float = 2.0  # seconds before a reading is recorded as missing
+  interval: Optional[float] = None  # defaults to update_interval
 
   @validator('sensor_type')
   def check_sensor_type(cls, value: str):
@@ -17,10 +29,12 @@ class AirSensorConfigs(BaseModel):
     return value
 
 
-class DigitalSensorConfigs(BaseModel):
+class DigitalSensorConfigs(SensorConfigs):
   sensor_type: str = 'digital'
   bcm_pin: int
   header: str
+  timeout: float = 2.0  # seconds before a reading is recorded as missing
+  interval: Optional[float] = None  # defaults to update_interval
 
   @validator('sensor_type')
   def check_sensor_type(cls, value: str):
@@ -28,9 +42,11 @@ class DigitalSensorConfigs(BaseModel):
     return value
 
 
-class RandomSensorConfigs(BaseModel):
+class RandomSensorConfigs(SensorConfigs):
   sensor_type: str = 'random'
   header: str
+  timeout: float = 2.0  # seconds before a reading is recorded as missing
+  interval: Optional[float] = None  # defaults to update_interval
 
   @validator('sensor_type')
   def check_sensor_type(cls, value: str):
@@ -38,13 +54,89 @@ class RandomSensorConfigs(BaseModel):
     return value
 
 
+class StorageConfigs(BaseModel):
+  """Control how readings are buffered before being written to disk."""
+  backend: str = 'csv'  # one of 'csv', 'segments'
+  segment_rows: int = 86400  # capacity of each segment file
+  flush_interval: float = 5.0  # seconds between flushes
+  flush_rows: int = 100  # flush early once this many rows are buffered
+  fsync: str = 'flush'  # one of 'never', 'flush', 'interval'
+  fsync_interval: float = 60.0  # seconds between fsyncs under 'interval'
+  index_interval: float = 60.0  # seconds between entries of data.csv index
+  partition: str = 'day'  # one of 'none', 'hour', 'day', 'week', 'month'
+  compression: str = 'gzip'  # one of 'none', 'gzip', 'xz', 'zstd'
+  retention_days: Optional[int] = None  # keep raw data forever if None
+
+  @validator('fsync')
+  def check_fsync(cls, value: str):
+    assert value in ['never', 'flush', 'interval']
+    return value
+
+  @validator('backend')
+  def check_backend(cls, value: str):
+    assert value in ['csv', 'segments']
+    return value
+
+  @validator('partition')
+  def check_partition(cls, value: str):
+    assert value in ['none', 'hour', 'day', 'week', 'month']
+    return value
+
+  @validator('compression')
+  def check_compression(cls, value: str):
+    assert value in ['none', 'gzip', 'xz', 'zstd']
+    return value
+
+  @validator('retention_days')
+  def check_retention_days(cls, value: Optional[int]):
+    assert value is None or value >= 1
+    return value
+
+  @validator('flush_interval', 'fsync_interval')
+  def check_interval(cls, value: float):
+    assert value >= 0
+    return value
+
+  @validator('index_interval')
+  def check_index_interval(cls, value: float):
+    assert value > 0
+    return value
+
+  @validator('flush_rows', 'segment_rows')
+  def check_rows(cls, value: int):
+    assert value >= 1
+    return value
+
+
 class DeviceConfigs(BaseModel):
   """A Class holding configuration fields of the device."""
   name: str
-  sensors: List[Union[AirSensorConfigs,
-                      DigitalSensorConfigs,
-                      RandomSensorConfigs]]
-  update_interval: int
+  sensors: List[Any]  # configs models of each sensor's driver
+  update_interval: float  # seconds between samples
+  missed_ticks: str = 'skip'  # one of 'skip', 'catchup'
+  read_workers: int = 4  # threads reading sensors concurrently
+  storage: StorageConfigs = StorageConfigs()
+
+  @validator('sensors', each_item=True)
+  def check_sensor(cls, value: Any):
+    # dispatching on sensor_type to the configs model of its driver
+    from bairy.device import drivers  # pylint: disable=import-outside-toplevel
+    return drivers.parse_configs(value)
+
+  @validator('update_interval')
+  def check_update_interval(cls, value: float):
+    assert value >= 0.01
+    return value
+
+  @validator('missed_ticks')
+  def check_missed_ticks(cls, value: str):
+    assert value in ['skip', 'catchup']
+    return value
+
+  @validator('read_workers')
+  def check_read_workers(cls, value: int):
+    assert value >= 1
+    return value
 
 
 def random_configs():
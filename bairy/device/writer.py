@@ -0,0 +1,309 @@
+"""Buffer sensor readings in memory and append them to disk in batches."""
+
+from __future__ import annotations
+from typing import Any
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from bairy.device.validate import StorageConfigs
+from bairy.device.segments import SegmentStore
+from bairy.device.index import SparseIndex
+from bairy.device import partitions
+from bairy.device.timestamps import utcnow, format_time, to_epoch
+
+
+def format_row(data: dict[str, int | None], now: datetime | None = None,
+               headers: list[str] | None = None):
+  """Format a single reading taken at UTC time now as a line of CSV.
+
+  If headers are given, values are written in their order and trailing
+  empty cells, left by sensors not read this time, are dropped."""
+  if now is None:
+    now = utcnow()
+  if headers is None:
+    values = list(data.values())
+  else:
+    values = [data.get(h) for h in headers]
+    while values and values[-1] is None:
+      values.pop()
+  values_as_str = [str(v) if v is not None else '' for v in values]
+  return format_time(now) + ',' + ','.join(values_as_str) + '\n'
+
+
+def ends_with_newline(path: str):
+  """Check if a non-empty file ends with a complete line."""
+  with open(path, 'rb') as f:
+    f.seek(0, os.SEEK_END)
+    if f.tell() == 0:
+      return True
+    f.seek(-1, os.SEEK_END)
+    return f.read(1) == b'\n'
+
+
+class DataWriter:
+  """Keep a data file open and append buffered rows to it as a batch.
+
+  Rows are flushed once flush_rows are buffered or flush_interval seconds
+  have passed since the previous flush. The fsync policy is one of 'never',
+  'flush' (after every flush) or 'interval' (at most every fsync_interval
+  seconds). If headers are given, they are written whenever the writer
+  (re)opens an empty file. If index_path is given, a SparseIndex of the file
+  is kept up to date with each flush."""
+
+  def __init__(self, path: str, headers: list[str] | None = None,
+               flush_interval: float = 5.0, flush_rows: int = 100,
+               fsync: str = 'flush', fsync_interval: float = 60.0,
+               index_path: str | None = None, index_interval: float = 60.0):
+    if fsync not in ['never', 'flush', 'interval']:
+      raise ValueError(f'Unknown fsync policy {fsync}')
+    self.path = path
+    self.headers = headers
+    self.flush_interval = flush_interval
+    self.flush_rows = flush_rows
+    self.fsync = fsync
+    self.fsync_interval = fsync_interval
+    self.index_path = index_path
+    self.index_interval = index_interval
+    self.index: SparseIndex | None = None
+
+    self.buffer: list[Any] = []
+    self.times: list[float] = []  # epoch times of buffered rows
+    self.closed = False
+    self.f = self.open()
+    self.last_flush = time.monotonic()
+    self.last_sync = self.last_flush
+
+  @classmethod
+  def from_configs(cls, path: str, headers: list[str] | None,
+                   configs: StorageConfigs, index_path: str | None = None):
+    """Create writer from the storage section of device configs."""
+    return cls(path, headers, configs.flush_interval, configs.flush_rows,
+               configs.fsync, configs.fsync_interval, index_path,
+               configs.index_interval)
+
+  def open(self):
+    """Open data file for appending, writing headers to an empty file."""
+    f = open(self.path, 'a')
+    if self.headers is not None and f.tell() == 0:
+      f.write('time,' + ','.join(self.headers) + '\n')
+    elif not ends_with_newline(self.path):
+      f.write('\n')  # terminating a row left partially written by a crash
+    f.flush()
+
+    if self.index_path is not None:
+      self.index = SparseIndex.open(self.index_path, self.path,
+                                    self.index_interval)
+    return f
+
+  def write(self, data: dict[str, int | None], now: datetime | None = None):
+    """Buffer a row taken at UTC time now, flushing if full or stale."""
+    if now is None:
+      now = utcnow()
+    self.buffer.append(self.encode(data, now))
+    if self.index is not None:
+      self.times.append(to_epoch(now))
+    if len(self.buffer) >= self.flush_rows:
+      self.flush()
+    elif time.monotonic() - self.last_flush >= self.flush_interval:
+      self.flush()
+
+  def flush(self):
+    """Write all buffered rows with a single call and apply fsync policy."""
+    now = time.monotonic()
+    self.last_flush = now
+    if not self.buffer:
+      return
+
+    self.write_buffer()
+    self.buffer.clear()
+
+    if self.fsync == 'flush':
+      self.sync(now)
+    elif self.fsync == 'interval' and now - self.last_sync >= self.fsync_interval:
+      self.sync(now)
+
+  def encode(self, data: dict[str, int | None], now: datetime | None):
+    """Convert a reading into the form held in the buffer."""
+    return format_row(data, now, self.headers)
+
+  def write_buffer(self):
+    """Append every buffered row to the data file."""
+    self.reopen_if_replaced()
+    self.f.write(''.join(self.buffer))
+    self.f.flush()
+
+    if self.index is not None:
+      offset, row = self.index.offset, self.index.rows
+      for line, t in zip(self.buffer, self.times):
+        self.index.observe(t, offset, row)
+        offset += len(line)  # rows are ascii
+        row += 1
+      self.index.commit(offset, row)
+      self.times.clear()
+
+  def sync(self, now: float | None = None):
+    """Force written rows onto the storage device."""
+    os.fsync(self.f.fileno())
+    self.last_sync = time.monotonic() if now is None else now
+
+  def reopen_if_replaced(self):
+    """Reopen the data file if it was removed or replaced since opening."""
+    try:
+      replaced = not os.path.samestat(os.fstat(self.f.fileno()),
+                                      os.stat(self.path))
+    except FileNotFoundError:
+      replaced = True
+    if replaced:
+      self.f.close()
+      self.f = self.open()
+
+  def close(self):
+    """Flush remaining rows and close the file."""
+    if self.closed:
+      return
+    self.flush()
+    if self.fsync != 'never':
+      self.sync()
+    self.f.close()
+    self.closed = True
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *_):
+    self.close()
+
+
+class SegmentWriter(DataWriter):
+  """Buffer rows and append them as typed columns to a SegmentStore."""
+
+  def __init__(self, store: SegmentStore, columns: list[list[str]],
+               flush_interval: float = 5.0, flush_rows: int = 100,
+               fsync: str = 'flush', fsync_interval: float = 60.0,
+               retention_days: int | None = None):
+    self.store = store
+    self.columns = columns
+    self.retention_days = retention_days
+    super().__init__(store.directory, None, flush_interval, flush_rows,
+                     fsync, fsync_interval)
+
+  @classmethod
+  def from_configs(cls, store: SegmentStore, columns: list[list[str]],
+                   configs: StorageConfigs):
+    """Create writer from the storage section of device configs."""
+    return cls(store, columns, configs.flush_interval, configs.flush_rows,
+               configs.fsync, configs.fsync_interval, configs.retention_days)
+
+  def open(self):
+    """Segments are opened by the store as rows arrive."""
+    return self.store
+
+  def encode(self, data: dict[str, int | None], now: datetime | None):
+    """Keep reading as epoch time and dictionary of values."""
+    t = time.time() if now is None else to_epoch(now)
+    return t, data
+
+  def write_buffer(self):
+    """Append every buffered row to the active segment."""
+    times = [t for t, _ in self.buffer]
+    rows = [data for _, data in self.buffer]
+    active = self.store.active
+    self.store.append(self.columns, times, rows)
+    if self.retention_days is not None and self.store.active is not active:
+      # expiring old segments whenever a new one is started
+      self.store.expire(times[-1] - self.retention_days * 86400)
+
+  def sync(self, now: float | None = None):
+    """Force written rows onto the storage device."""
+    self.store.sync()
+    self.last_sync = time.monotonic() if now is None else now
+
+
+class PartitionedWriter(DataWriter):
+  """Write rows to the active partition at path, rotating it every period.
+
+  Closed partitions are compressed in a background thread, after which
+  partitions older than retention_days are removed."""
+
+  def __init__(self, path: str, headers: list[str] | None, directory: str,
+               period: str = 'day', compression: str = 'gzip',
+               retention_days: int | None = None, **kwargs: Any):
+    self.directory = directory
+    self.period = period
+    self.compression = compression
+    self.retention_days = retention_days
+    self.first: datetime | None = None  # time of first row in active file
+    self.last: datetime | None = None
+    self.compactor: threading.Thread | None = None
+    super().__init__(path, headers, **kwargs)
+
+  @classmethod
+  def from_configs(cls, path: str, headers: list[str] | None,
+                   configs: StorageConfigs, index_path: str | None = None,
+                   directory: str = ''):
+    """Create writer from the storage section of device configs."""
+    return cls(path, headers, directory, configs.partition,
+               configs.compression, configs.retention_days,
+               flush_interval=configs.flush_interval,
+               flush_rows=configs.flush_rows, fsync=configs.fsync,
+               fsync_interval=configs.fsync_interval, index_path=index_path,
+               index_interval=configs.index_interval)
+
+  def open(self):
+    """Open active partition and find times of its first and last rows.
+
+    If the active partition has other headers, as after sensors change, it
+    is closed first."""
+    if self.headers is not None and os.path.exists(self.path):
+      with open(self.path) as f:
+        headers = f.readline().rstrip('\n').split(',')[1:]
+      if headers != self.headers:
+        times = partitions.read_row_times(self.path)
+        if times is None:
+          os.remove(self.path)
+        else:
+          self.close_partition(*times)
+    f = super().open()
+    times = partitions.read_row_times(self.path)
+    self.first, self.last = (None, None) if times is None else times
+    return f
+
+  def write(self, data: dict[str, int | None], now: datetime | None = None):
+    """Buffer a row, first rotating if it belongs to a new period."""
+    if now is None:
+      now = utcnow()
+    if self.first is not None and self.period != 'none' and \
+            partitions.period_key(now, self.period) != \
+            partitions.period_key(self.first, self.period):
+      self.rotate()
+    if self.first is None:
+      self.first = now
+    self.last = now
+    super().write(data, now)
+
+  def rotate(self):
+    """Close active partition and start compacting it in the background."""
+    self.flush()
+    self.f.close()
+    self.close_partition(self.first, self.last)
+    self.f = self.open()
+
+  def close_partition(self, first: datetime, last: datetime):
+    """Move active partition into directory and compact in the background."""
+    partitions.rotate(self.path, self.directory, first, last)
+    if self.index_path is not None and os.path.exists(self.index_path):
+      os.remove(self.index_path)
+    if self.compactor is None or not self.compactor.is_alive():
+      self.compactor = threading.Thread(target=self.compact, daemon=True)
+      self.compactor.start()
+
+  def compact(self):
+    """Compress closed partitions and apply retention."""
+    try:
+      partitions.compact(self.directory, self.compression,
+                         self.retention_days)
+    except (OSError, ImportError) as e:
+      logging.error('Failed to compact partitions')
+      logging.error(e)
@@ -1,18 +1,27 @@
 """FastAPI app to display device data."""
 
+from typing import Optional
 import json
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.responses import PlainTextResponse, RedirectResponse
 from fastapi.middleware.wsgi import WSGIMiddleware
 import uvicorn
-from bairy.hub import configs
-from bairy.hub.request import get_all_statuses
-from bairy.hub.dash_plot import dash_plot
+from bairy.hub import configs, cache
+from bairy.hub.poller import StatusPoller
+from bairy.hub.client import load_stats
+from bairy.device.utils import LazyWSGIApp
 from bairy import log_configs
 
 
+def plot_server():
+  """Build Dash plot on first request."""
+  from bairy.hub.dash_plot import dash_plot  # pylint: disable=import-outside-toplevel
+  return dash_plot.server
+
+
 app = FastAPI()
-app.mount('/plot', WSGIMiddleware(dash_plot.server))
+POLLER = StatusPoller()
+app.mount('/plot', WSGIMiddleware(LazyWSGIApp(plot_server)))
 
 
 @app.get('/')
@@ -21,18 +30,48 @@ def root():
   return RedirectResponse(url='/plot')
 
 
+@app.on_event('startup')
+async def start_poller():
+  """Poll device statuses in the background."""
+  POLLER.start()
+
+
 @app.get('/status', response_class=PlainTextResponse)
-def status():
-  """Get status of each device."""
-  statuses = get_all_statuses()
-  return json.dumps(statuses, indent=4)
+async def status(refresh: bool = False):
+  """Get cached status of each device with its age in seconds.
+
+  With refresh, first wait on a refresh of every status."""
+  if refresh or POLLER.task is None:
+    await POLLER.refresh()
+  return json.dumps(POLLER.snapshot(), indent=4)
+
+
+@app.get('/client-stats', response_class=PlainTextResponse)
+def client_stats():
+  """Get latency, failures and circuit state of requests to each device."""
+  return json.dumps(load_stats(configs.CLIENT_STATS_PATH), indent=4)
+
+
+@app.get('/cache-stats', response_class=PlainTextResponse)
+def cache_stats():
+  """Get hits, misses and size of the plot's caches."""
+  return json.dumps(cache.stats(), indent=4)
 
 
 @app.get('/logs', response_class=PlainTextResponse)
-def logs():
-  """Return app log as plain text."""
-  with open(configs.LOG_PATH) as f:
-    return f.read()
+def logs(limit: int = log_configs.LOG_LIMIT, before: Optional[int] = None,
+         level: Optional[str] = None):
+  """Return app log as plain text, newest records first.
+
+  At most limit records at or above level are returned. Older records are
+  found by passing the X-Before header as before."""
+  try:
+    text, cursor = log_configs.read_logs(configs.LOG_PATH, limit, before,
+                                         level)
+  except ValueError as e:
+    raise HTTPException(400, str(e)) from e
+  headers = {} if cursor is None else {'X-Before': str(cursor)}
+  return PlainTextResponse(text, headers=headers)
 
 
 def run_app():
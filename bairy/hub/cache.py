@@ -0,0 +1,78 @@
+"""Cache parsed device files and built figures for the hub dashboard.
+
+Files are keyed by path and revalidated against their modification time and
+size on every read, so only files changed by a sync are parsed again.
+Figures are keyed by time period together with the versions of the files
+they were built from, and rebuilt only once one of these changes, in the
+cache the device dashboard uses."""
+
+from __future__ import annotations
+from typing import Any, Callable
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from bairy.hub import configs
+from bairy.hub.store import read_day
+from bairy.device.figures import ResultCache
+
+
+def file_version(path: str):
+  """Identify the contents of a file by its modification time and size."""
+  stat = os.stat(path)
+  return stat.st_mtime_ns, stat.st_size
+
+
+class FileCache:
+  """Parsed files, evicting the least recently used beyond max_bytes.
+
+  Cached frames are shared between callers, who must not modify them."""
+
+  def __init__(self, max_bytes: int = configs.CACHE_BYTES,
+               read: Callable[[str], pd.DataFrame] = read_day):
+    self.max_bytes = max_bytes
+    self.read_file = read
+    self.entries: OrderedDict[str, tuple[Any, pd.DataFrame, int]] = \
+        OrderedDict()
+    self.bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.lock = threading.Lock()
+
+  def read(self, path: str):
+    """Read file at path, parsing it only if changed since last read."""
+    version = file_version(path)
+    with self.lock:
+      entry = self.entries.get(path)
+      if entry is not None and entry[0] == version:
+        self.entries.move_to_end(path)
+        self.hits += 1
+        return entry[1]
+      self.misses += 1
+
+    df = self.read_file(path)
+    size = int(df.memory_usage(deep=True).sum())
+    with self.lock:
+      old = self.entries.pop(path, None)
+      if old is not None:
+        self.bytes -= old[2]
+      self.entries[path] = (version, df, size)
+      self.bytes += size
+      while self.bytes > self.max_bytes and len(self.entries) > 1:
+        _, (_, _, evicted) = self.entries.popitem(last=False)
+        self.bytes -= evicted
+    return df
+
+  def stats(self):
+    """Summarize hits, misses and memory held."""
+    return {'hits': self.hits, 'misses': self.misses,
+            'entries': len(self.entries), 'bytes': self.bytes}
+
+
+FILES = FileCache()
+FIGURES = ResultCache()
+
+
+def stats():
+  """Summarize both caches."""
+  return {'files': FILES.stats(), 'figures': FIGURES.stats()}
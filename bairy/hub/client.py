@@ -0,0 +1,236 @@
+"""Share one bounded and resilient HTTP client for requests to devices.
+
+Requests go through a single aiohttp session per event loop, keeping
+connections alive with a limit per device, and a semaphore bounds requests
+in flight across all devices. Failed requests are retried with exponential
+backoff and jitter. A circuit breaker per device stops requesting a device
+after repeated failures until a cooldown passes, so one dead device costs
+little."""
+
+from __future__ import annotations
+from typing import Any, Callable
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import aiohttp
+from bairy.hub import configs
+
+
+class CircuitOpenError(aiohttp.ClientError):
+  """Raised instead of requesting a device whose circuit is open."""
+
+
+class CircuitBreaker:
+  """Track consecutive failures of a device and open after threshold.
+
+  Once open, requests are refused until cooldown seconds pass. Then a
+  single trial request is let through, closing the circuit on success and
+  opening it again on failure."""
+
+  def __init__(self, threshold: int, cooldown: float,
+               clock: Callable[[], float] = time.monotonic):
+    self.threshold = threshold
+    self.cooldown = cooldown
+    self.clock = clock
+    self.failures = 0  # consecutive failures
+    self.opened_at: float | None = None
+    self.trial = False  # a trial request is in flight
+
+  @property
+  def state(self):
+    """One of 'closed', 'open' or 'half-open'."""
+    if self.opened_at is None:
+      return 'closed'
+    if self.clock() - self.opened_at < self.cooldown:
+      return 'open'
+    return 'half-open'
+
+  def allow(self):
+    """Check if a request may be made, claiming the trial if half-open."""
+    state = self.state
+    if state == 'closed':
+      return True
+    if state == 'half-open' and not self.trial:
+      self.trial = True
+      return True
+    return False
+
+  def record_success(self):
+    """Close the circuit."""
+    self.failures = 0
+    self.opened_at = None
+    self.trial = False
+
+  def record_failure(self):
+    """Count a failure, opening the circuit at threshold or after a trial."""
+    self.failures += 1
+    if self.trial or self.failures >= self.threshold:
+      self.opened_at = self.clock()
+    self.trial = False
+
+
+class DeviceStats:
+  """Running statistics of requests to a single device."""
+
+  def __init__(self):
+    self.requests = 0
+    self.failures = 0
+    self.retries = 0
+    self.refused = 0  # requests refused while the circuit was open
+    self.last = 0.0
+    self.total = 0.0
+    self.max = 0.0
+
+  def record(self, latency: float):
+    """Record the latency in seconds of a successful request."""
+    self.requests += 1
+    self.last = latency
+    self.total += latency
+    self.max = max(self.max, latency)
+
+  def as_dict(self):
+    """Summarize statistics with latencies in milliseconds."""
+    mean = self.total / self.requests if self.requests else 0.0
+    return {'requests': self.requests, 'failures': self.failures,
+            'retries': self.retries, 'refused': self.refused,
+            'last_ms': round(self.last * 1000, 3),
+            'mean_ms': round(mean * 1000, 3),
+            'max_ms': round(self.max * 1000, 3)}
+
+
+class HubClient:
+  """HTTP client shared by every request from the hub to devices."""
+
+  def __init__(self, max_concurrency: int = configs.MAX_CONCURRENCY,
+               limit_per_host: int = configs.LIMIT_PER_HOST,
+               connect_timeout: float = configs.CONNECT_TIMEOUT,
+               read_timeout: float = configs.READ_TIMEOUT,
+               retries: int = configs.RETRIES,
+               backoff: float = configs.BACKOFF,
+               max_backoff: float = configs.MAX_BACKOFF,
+               failure_threshold: int = configs.FAILURE_THRESHOLD,
+               cooldown: float = configs.COOLDOWN,
+               stats_path: str | None = None, stats_interval: float = 10.0,
+               port: int = 8000):
+    self.max_concurrency = max_concurrency
+    self.limit_per_host = limit_per_host
+    self.timeout = aiohttp.ClientTimeout(connect=connect_timeout,
+                                         sock_read=read_timeout)
+    self.retries = retries
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self.failure_threshold = failure_threshold
+    self.cooldown = cooldown
+    self.breakers: dict[str, CircuitBreaker] = {}
+    self.stats: dict[str, DeviceStats] = {}
+    self.stats_path = stats_path
+    self.stats_interval = stats_interval
+    self.last_save = time.monotonic()
+    self.session: aiohttp.ClientSession | None = None
+    self.semaphore: asyncio.Semaphore | None = None
+    self.loop: asyncio.AbstractEventLoop | None = None
+    self.port = port
+
+  def connect(self):
+    """Get the session of the running event loop, creating it if needed."""
+    loop = asyncio.get_running_loop()
+    if self.session is None or self.session.closed or self.loop is not loop:
+      connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host)
+      self.session = aiohttp.ClientSession(connector=connector,
+                                           timeout=self.timeout)
+      self.semaphore = asyncio.Semaphore(self.max_concurrency)
+      self.loop = loop
+    return self.session
+
+  def delay(self, attempt: int):
+    """Seconds to wait before retry attempt, with full jitter."""
+    cap = min(self.backoff * 2 ** attempt, self.max_backoff)
+    return random.uniform(0, cap)
+
+  async def get(self, ip_address: str, path: str,
+                params: dict[str, str] | None = None):
+    """Request path from device, returning the body and headers.
+
+    Raises CircuitOpenError if the device's circuit is open, or the error
+    of the final attempt once retries are exhausted. Client errors such as
+    a 404 are not retried."""
+    breaker = self.breakers.setdefault(
+        ip_address, CircuitBreaker(self.failure_threshold, self.cooldown))
+    stats = self.stats.setdefault(ip_address, DeviceStats())
+    if not breaker.allow():
+      stats.refused += 1
+      raise CircuitOpenError(f'Circuit open for {ip_address}')
+
+    session = self.connect()
+    url = f'http://{ip_address}:{self.port}/{path}'
+    attempt = 0
+    while True:
+      start = time.perf_counter()
+      try:
+        async with self.semaphore:
+          async with session.get(url, params=params) as r:
+            r.raise_for_status()
+            body = await r.read()
+            headers = dict(r.headers)
+        stats.record(time.perf_counter() - start)
+        breaker.record_success()
+        self.maybe_save_stats()
+        return body, headers
+      except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        # a client error means the device is up but refused the request
+        refused = isinstance(e, aiohttp.ClientResponseError) and e.status < 500
+        if refused or attempt >= self.retries:
+          stats.failures += 1
+          if refused:
+            breaker.record_success()
+          else:
+            breaker.record_failure()
+          self.maybe_save_stats()
+          raise
+        stats.retries += 1
+        logging.warning('Retrying request to %s after %r', url, e)
+        await asyncio.sleep(self.delay(attempt))
+        attempt += 1
+
+  async def get_json(self, ip_address: str, path: str):
+    """Request path from device and parse its body as json."""
+    body, _ = await self.get(ip_address, path)
+    d: dict[str, Any] = json.loads(body)
+    return d
+
+  def stats_dict(self):
+    """Map each device to its request statistics and circuit state."""
+    return {ip: {**stats.as_dict(), 'circuit': self.breakers[ip].state}
+            for ip, stats in self.stats.items()}
+
+  def maybe_save_stats(self):
+    """Save statistics if stats_interval passed since the last save."""
+    if self.stats_path is not None and \
+            time.monotonic() - self.last_save >= self.stats_interval:
+      self.save_stats()
+
+  def save_stats(self):
+    """Atomically write statistics as json for the app to read."""
+    self.last_save = time.monotonic()
+    tmp_path = self.stats_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+      json.dump(self.stats_dict(), f, indent=4)
+    os.replace(tmp_path, self.stats_path)
+
+  async def close(self):
+    """Close the session, saving statistics."""
+    if self.stats_path is not None:
+      self.save_stats()
+    if self.session is not None:
+      await self.session.close()
+
+
+def load_stats(path: str) -> dict[str, Any]:
+  """Load statistics saved by a HubClient, if any."""
+  if not os.path.exists(path):
+    return {}
+  with open(path) as f:
+    return json.load(f)
@@ -3,12 +3,10 @@
 from __future__ import annotations
 import os
 import sys
-import glob
 import ipaddress
 import json
 
 
-# creating data directory within module
 MODULE_DIR = os.path.dirname(__file__)
 PACKAGE_DIR = os.path.dirname(MODULE_DIR)
 DATA_DIR = os.path.join(PACKAGE_DIR, 'data')
@@ -16,11 +14,31 @@ HUB_DATA_DIR = os.path.join(DATA_DIR, 'hub')
 
 IP_PATH = os.path.join(HUB_DATA_DIR, 'ip_addresses.json')
 LOG_PATH = os.path.join(HUB_DATA_DIR, 'app.logs')
-RECACHE_INTERVAL = 60 * 60  # update every hour
-if not os.path.exists(DATA_DIR):
-  os.mkdir(DATA_DIR)
-if not os.path.exists(HUB_DATA_DIR):
-  os.mkdir(HUB_DATA_DIR)
+CLIENT_STATS_PATH = os.path.join(HUB_DATA_DIR, 'client_stats.json')
+RECACHE_INTERVAL = 5 * 60  # request new rows every five minutes
+STATUS_INTERVAL = 30  # seconds between requests for device statuses
+CACHE_BYTES = 64 << 20  # most memory held by parsed files for the plot
+PLOT_METHOD = 'mean'  # one of bairy.device.downsample.METHODS
+PLOT_POINTS = 2000  # most points of each trace
+SYNC_RESOLUTION = 60  # seconds averaged into each synced row
+SYNC_WINDOW = '1 day'  # longest range requested at once while backfilling
+INITIAL_BACKFILL = '7 days'  # synced from a new device not reporting its start
+
+# HTTP client used for requests to devices
+MAX_CONCURRENCY = 8  # requests in flight across all devices
+LIMIT_PER_HOST = 2  # connections kept open to each device
+CONNECT_TIMEOUT = 5.0  # seconds
+READ_TIMEOUT = 30.0  # seconds without receiving any data
+RETRIES = 3
+BACKOFF = 1.0  # seconds before the first retry, doubling after each
+MAX_BACKOFF = 30.0
+FAILURE_THRESHOLD = 5  # consecutive failures opening a device's circuit
+COOLDOWN = 5 * 60  # seconds an open circuit refuses requests
+
+
+def make_data_dirs():
+  """Create data directories if missing."""
+  os.makedirs(HUB_DATA_DIR, exist_ok=True)
 
 
 def set_ips(path: str):
@@ -33,6 +51,7 @@ def set_ips(path: str):
     except ValueError as e:
       if a != 'self':
         raise e
+  make_data_dirs()
   with open(IP_PATH, 'w') as f:
     json.dump(addresses, f)
 
@@ -51,8 +70,8 @@ if __name__ == '__main__':
     os.remove(IP_PATH)
     print(f'Removed stored file at {IP_PATH}')
   elif arg == '--remove-data':
-    for data_file in glob.glob(DATA_DIR + '*.csv'):
-      os.remove(data_file)
+    from bairy.hub.store import remove_stores  # pylint: disable=import-outside-toplevel
+    remove_stores(HUB_DATA_DIR)
     print('Removed all stored data.')
   elif arg == '--remove-logs':
     os.remove(LOG_PATH)
@@ -1,30 +1,41 @@
 """Dash app to plot device data."""
 
 import os
-import glob
+import math
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from dash import Dash
 import dash_core_components as dcc
 import dash_html_components as html
-from bairy.hub import configs
+from bairy.hub import configs, cache
+from bairy.hub.store import list_stores
+from bairy.device.timestamps import utcnow
+from bairy.device.downsample import downsample_df
+from bairy.device.figures import figure_data
 
 
-def load_data(time_period: str = 'all'):
-  """Load cached data."""
+def get_start(time_period: str):
+  """Get start of time period, or None for the entire runtime."""
+  if time_period == 'day':
+    return pd.Timestamp(utcnow()) - pd.Timedelta('1 day')
+  if time_period == 'week':
+    return pd.Timestamp(utcnow()) - pd.Timedelta('7 days')
+  return None
 
-  dfs = glob.glob(configs.HUB_DATA_DIR + '/*' + time_period + '.csv')
-  names = [f.split('/')[-1].split('_')[0] for f in dfs]
 
-  dfs = [pd.read_csv(f) for f in dfs]
+def load_data(time_period: str = 'all'):
+  """Load data synced from every device."""
+  start = get_start(time_period)
+  stores = list_stores(configs.HUB_DATA_DIR)
+  dfs = [store.load(start, cache.FILES.read) for store in stores]
+  names = [store.name for store in stores]
 
   # must include time
-  cols_to_keep = {'time', 'pm_10', 'pm_2.5', 'random1'}
-  dfs = [df[cols_to_keep & set(df.columns)] for df in dfs]
+  cols_to_keep = ['time', 'pm_10', 'pm_2.5', 'random1']
+  dfs = [df[[c for c in cols_to_keep if c in df.columns]] for df in dfs]
 
-  dfs = [df.set_index(pd.to_datetime(df['time'])) for df in dfs]
-  dfs = [df.drop('time', axis=1) for df in dfs]
+  dfs = [df.set_index('time') for df in dfs]
   dfs = [df.rename(columns={k: name + ' ' + k for k in df.columns})
          for df, name in zip(dfs, names)]
   if dfs == []:
@@ -32,18 +43,48 @@ def load_data(time_period: str = 'all'):
   return pd.concat(dfs)
 
 
+def data_version(time_period: str):
+  """Identify the versions of every file holding data of time period."""
+  start = get_start(time_period)
+  paths = [p for store in list_stores(configs.HUB_DATA_DIR)
+           for p in store.paths_since(start)]
+  return tuple((p,) + cache.file_version(p) for p in paths)
+
+
 def create_fig(time_period: str):
-  """Create plotly figure using one or two y-axes."""
+  """Create plotly figure, reusing it until its data changes."""
 
   # avoiding errors when device not configured to run as hub
   if not os.path.exists(configs.IP_PATH):
     return px.line()
+  return cache.FIGURES.get(time_period, data_version(time_period),
+                           lambda: figure_data(build_fig(time_period)))
 
+
+def average(df: pd.DataFrame, budget: int):
+  """Average synced rows into buckets of whole multiples of SYNC_RESOLUTION,
+  so each column has at most about budget points."""
+  span = (df.index.max() - df.index.min()).total_seconds()
+  syncs = math.ceil(span / configs.SYNC_RESOLUTION / budget)
+  if syncs <= 1:  # every synced row fits
+    return df.sort_index()
+  width = f'{syncs * configs.SYNC_RESOLUTION}s'
+  return df.resample(width).mean().dropna(how='all')
+
+
+def build_fig(time_period: str):
+  """Build plotly figure using one or two y-axes."""
   df = load_data(time_period)
   if df.empty:
     return px.line()
+  if configs.PLOT_METHOD == 'mean':
+    df = average(df, configs.PLOT_POINTS)
+  else:
+    df = downsample_df(df.sort_index(), configs.PLOT_POINTS,
+                       configs.PLOT_METHOD)
 
   fig = px.line(df, x=df.index, y=df.columns)
+  fig.update_traces(connectgaps=True)  # devices sample at different times
 
   # showing pm2.5 safe threshold in any column exceeds
   for k in df.columns:
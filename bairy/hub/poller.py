@@ -0,0 +1,75 @@
+"""Poll the status of every device in the background for the hub app."""
+
+from __future__ import annotations
+from typing import Any, Awaitable, Callable
+import time
+import asyncio
+import logging
+from bairy.hub import configs
+from bairy.hub.request import get_status
+
+
+class StatusPoller:
+  """Cache of the latest status of each device, refreshed every interval.
+
+  Concurrent refreshes share a single fan-out of requests, so the hub never
+  requests the fleet more than once at a time."""
+
+  def __init__(self, interval: float = configs.STATUS_INTERVAL,
+               fetch: Callable[[str], Awaitable[dict[str, Any]]] = get_status):
+    self.interval = interval
+    self.fetch = fetch
+    self.statuses: dict[str, dict[str, Any]] = {}
+    self.updated: dict[str, float] = {}  # epoch time of last status
+    self.errors: dict[str, str] = {}
+    self.refreshing: asyncio.Task[None] | None = None
+    self.task: asyncio.Task[None] | None = None
+
+  async def poll(self, ip_address: str):
+    """Request status of a single device, recording any error."""
+    try:
+      self.statuses[ip_address] = await self.fetch(ip_address)
+      self.updated[ip_address] = time.time()
+      self.errors.pop(ip_address, None)
+    except Exception as e:  # pylint: disable=broad-except
+      logging.warning('Failed to get status of %s', ip_address)
+      self.errors[ip_address] = repr(e)
+
+  async def poll_all(self):
+    """Request status of every device concurrently."""
+    ip_addresses = configs.load_ips()
+    await asyncio.gather(*[self.poll(ip) for ip in ip_addresses])
+    for ip_address in set(self.statuses) - set(ip_addresses):
+      del self.statuses[ip_address], self.updated[ip_address]
+
+  async def refresh(self):
+    """Refresh every status, joining a refresh already in flight."""
+    if self.refreshing is None or self.refreshing.done():
+      self.refreshing = asyncio.ensure_future(self.poll_all())
+    # shielding so a cancelled caller does not cancel the shared refresh
+    await asyncio.shield(self.refreshing)
+
+  async def run(self):
+    """Refresh statuses indefinitely."""
+    while True:
+      await self.refresh()
+      await asyncio.sleep(self.interval)
+
+  def start(self):
+    """Run in the background on the running event loop."""
+    if self.task is None or self.task.done():
+      self.task = asyncio.ensure_future(self.run())
+
+  def snapshot(self):
+    """List cached statuses, each with its age in seconds and any error."""
+    now = time.time()
+    snapshot = []
+    for ip_address in configs.load_ips():
+      status = dict(self.statuses.get(ip_address, {}))
+      updated = self.updated.get(ip_address)
+      status['hub'] = {
+          'ip_address': ip_address,
+          'age': None if updated is None else round(now - updated, 3),
+          'error': self.errors.get(ip_address)}
+      snapshot.append(status)
+    return snapshot
@@ -1,48 +1,56 @@
 """Gather configuration and data from devices."""
 
 from __future__ import annotations
-from typing import Any
+from typing import Any, Callable
+import io
+import functools
 import logging
-import os
 import json
 import asyncio
-import nest_asyncio
 import aiohttp
+import pandas as pd
 from bairy.hub import configs
-from bairy.device import configs as device_configs, app as device_app
+from bairy.hub.store import DeviceStore
+from bairy.hub.client import HubClient, CircuitOpenError
+from bairy.device.timestamps import utcnow
 
 
-nest_asyncio.apply()
+# shared by every request; statistics are saved only by run_requests
+CLIENT = HubClient()
+
+
+async def in_thread(function: Callable[..., Any], *args: Any):
+  """Call function in the default executor, keeping the event loop free."""
+  loop = asyncio.get_running_loop()
+  return await loop.run_in_executor(None, functools.partial(function, *args))
 
 
 async def get_status(ip_address: str):
   """Get status of device associated to ip_address."""
   if ip_address == 'self':
-    status_as_str = device_app.status()
+    from bairy.device import app as device_app  # pylint: disable=import-outside-toplevel
+    status_as_str = await in_thread(device_app.status)
     d: dict[str, Any] = json.loads(status_as_str)
     return d
 
-  async with aiohttp.ClientSession() as session:
-    url = 'http://' + ip_address + ':8000/' + 'status'
-    async with session.get(url) as r:
-      d: dict[str, Any] = await r.json(content_type='text/plain')
-      return d
+  return await CLIENT.get_json(ip_address, 'status')
 
 
-def get_all_statuses():
+async def get_all_statuses():
   """Get status of every device known to hub."""
   ip_addresses = configs.load_ips()
-  tasks = [get_status(ip_address) for ip_address in ip_addresses]
-  gathered = asyncio.gather(*tasks)
-
-  loop = asyncio.get_event_loop()
-  statuses = loop.run_until_complete(gathered)
-  return statuses
+  return await asyncio.gather(*[get_status(ip) for ip in ip_addresses])
 
 
 def validate_names():
   """Check device names to guarantee no duplicates."""
-  statuses = get_all_statuses()
+  async def gather():
+    try:
+      return await get_all_statuses()
+    finally:
+      await CLIENT.close()
+
+  statuses = asyncio.run(gather())
   names = [s['device_configs']['name'] for s in statuses]
   if len(set(names)) < len(list(names)):
     raise ValueError('Discovered repeated name within devices!')
@@ -50,55 +58,93 @@ def validate_names():
 
 
 async def get_data(ip_address: str):
-  """Request /data endpoint from device and save response to file."""
+  """Request rows newer than those stored from device and merge them.
+
+  Rows are requested from the high-water mark of the device onward, a
+  SYNC_WINDOW at a time, so after an outage the hub backfills the missed
+  range over several requests. The final bucket may still be filling, so
+  the mark is left at its start to request it again next time."""
   try:
     status = await get_status(ip_address)
     name: str = status['device_configs']['name']
+    store = DeviceStore(configs.HUB_DATA_DIR, name)
+    start = store.load_mark()
+    if start is None:
+      first = status['data_details'].get('first')
+      backfill = pd.Timestamp(utcnow()) - pd.Timedelta(configs.INITIAL_BACKFILL)
+      start = backfill if first is None else pd.Timestamp(first)
+    # aligning requests to buckets, so none is split across two requests
+    start = start.floor(f'{configs.SYNC_RESOLUTION}s')
+
+    while True:
+      end: pd.Timestamp | None = start + pd.Timedelta(configs.SYNC_WINDOW)
+      if end >= pd.Timestamp(utcnow()):
+        end = None
+      logging.info('Requesting data since %s from %s', start, ip_address)
+      df = await request_rows(ip_address, start, end)
+      # writing to disk off the event loop
+      await in_thread(store.merge, df)
+      if end is None:
+        if not df.empty:
+          await in_thread(store.save_mark, df['time'].iloc[-1])
+        break
+      await in_thread(store.save_mark, end)
+      start = end
+    logging.info('Synced data from %s into %s', ip_address, store.directory)
+
+  except CircuitOpenError:
+    logging.warning('Skipping %s after repeated failures', ip_address)
+  except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+    logging.error('Failed to request data from %s', ip_address)
+    logging.error(e)
 
-    for selection in ['day', 'week']:
-      filename = name + '_' + selection + '.csv'
-      data_path = os.path.join(configs.HUB_DATA_DIR, filename)
 
-      if ip_address == 'self':  # making a symlink to data
-        if selection == 'day':
-          device_path = device_configs.DATA_DAY_PATH
-        else:
-          device_path = device_configs.DATA_WEEK_PATH
-        os.symlink(device_path, data_path)
+async def request_rows(ip_address: str, start: pd.Timestamp,
+                       end: pd.Timestamp | None):
+  """Request rows averaged over SYNC_RESOLUTION within [start, end)."""
+  resolution = str(configs.SYNC_RESOLUTION)
+  if ip_address == 'self':  # reading data within this process
+    content = await in_thread(read_rows, start, end, resolution)
+  else:
+    params = {'start': str(start), 'resolution': resolution}
+    if end is not None:
+      params['end'] = str(end)
+    content, headers = await CLIENT.get(ip_address, 'data', params)
+    if 'X-Resolution' not in headers:
+      raise aiohttp.ClientError(f'Device at {ip_address} must be updated')
+  return await in_thread(parse_rows, content)
 
-      url = 'http://' + ip_address + ':8000/data?selection=' + selection
-      logging.info('Requesting %s data from %s', selection, ip_address)
-      await stream_request(url, data_path)
-      logging.info('Saved data from %s to %s', ip_address, data_path)
 
-  except aiohttp.ClientConnectionError as e:
-    logging.error('Failed to connect to %s', ip_address)
-    logging.error(e)
+def parse_rows(content: bytes):
+  """Parse rows of CSV, dropping empty buckets between the first and last."""
+  df = pd.read_csv(io.BytesIO(content), parse_dates=['time'])
+  return df.dropna(how='all', subset=df.columns[1:])
 
 
-async def stream_request(url: str, save_path: str):
-  """Make stream request and save data with aiohttp."""
-  async with aiohttp.ClientSession() as session:
-    async with session.get(url) as r:
-      with open(save_path, 'wb') as f:
-        while True:
-          chunk = await r.content.read(1024)
-          if not chunk:
-            break
-          f.write(chunk)
+def read_rows(start: pd.Timestamp, end: pd.Timestamp | None, resolution: str):
+  """Read rows of this device as CSV, as its /data endpoint would."""
+  # pylint: disable=import-outside-toplevel
+  from bairy.device import query
+  width = query.choose_resolution(resolution, None, start, end)
+  if width == query.RAW:
+    return b''.join(query.iter_raw(start, end, None))
+  return b''.join(query.iter_aggregate(start, end, None, width))
 
 
 async def request_data_indefinitely(ip_address: str):
   """Request data from each device indefinitely."""
-  assert ip_address != 'self'
   while True:
     await get_data(ip_address)
     await asyncio.sleep(configs.RECACHE_INTERVAL)
 
 
 async def run_requests():
-  """Run requests indefinitely."""
+  """Run requests indefinitely, saving statistics of the client."""
   ip_addresses = configs.load_ips()
-  tasks = [request_data_indefinitely(
-      ip_address) for ip_address in ip_addresses if ip_address != 'self']
-  return await asyncio.gather(*tasks)
+  CLIENT.stats_path = configs.CLIENT_STATS_PATH
+  tasks = [request_data_indefinitely(ip_address)
+           for ip_address in ip_addresses]
+  try:
+    return await asyncio.gather(*tasks)
+  finally:
+    await CLIENT.close()
@@ -0,0 +1,103 @@
+"""Store data synced from each device in daily CSV files.
+
+Each device has a directory within HUB_DATA_DIR holding one CSV per UTC day
+and a sync.json recording its high-water mark, the time from which the hub
+next requests rows. Rows merged into a day replace stored rows with the same
+time, and files are replaced atomically so readers never see partial data."""
+
+from __future__ import annotations
+from typing import Callable
+import os
+import json
+import glob
+import shutil
+import pandas as pd
+
+
+def read_day(path: str):
+  """Read a daily file with a parsed time column."""
+  return pd.read_csv(path, parse_dates=['time'])
+
+
+class DeviceStore:
+  """Daily CSV files of data synced from a single device."""
+
+  def __init__(self, directory: str, name: str):
+    self.name = name
+    self.directory = os.path.join(directory, name.replace(os.sep, '_'))
+    self.sync_path = os.path.join(self.directory, 'sync.json')
+    os.makedirs(self.directory, exist_ok=True)
+
+  def path(self, day: str):
+    """Path of CSV holding rows of day, formatted as YYYY-MM-DD."""
+    return os.path.join(self.directory, day + '.csv')
+
+  def days(self):
+    """List days with stored rows, oldest first."""
+    paths = glob.glob(os.path.join(self.directory, '*.csv'))
+    return sorted(os.path.basename(p)[:-4] for p in paths)
+
+  def load_mark(self) -> pd.Timestamp | None:
+    """Load the time from which rows are next requested."""
+    try:
+      with open(self.sync_path) as f:
+        return pd.Timestamp(json.load(f)['mark'])
+    except (FileNotFoundError, ValueError, KeyError):
+      return None
+
+  def save_mark(self, mark: pd.Timestamp):
+    """Atomically save the time from which rows are next requested."""
+    write_atomic(self.sync_path, json.dumps({'mark': str(mark)}))
+
+  def merge(self, df: pd.DataFrame):
+    """Merge rows with a parsed time column into their daily files."""
+    if df.empty:
+      return
+    for day, rows in df.groupby(df['time'].dt.strftime('%Y-%m-%d')):
+      path = self.path(day)
+      if os.path.exists(path):
+        stored = read_day(path)
+        rows = pd.concat([stored, rows], ignore_index=True)
+      rows = rows.drop_duplicates('time', keep='last').sort_values('time')
+      write_atomic(path, rows.to_csv(index=False))
+
+  def paths_since(self, start: pd.Timestamp | None = None):
+    """List paths of the daily files holding rows since start."""
+    days = self.days()
+    if start is not None:
+      days = [d for d in days if d >= start.strftime('%Y-%m-%d')]
+    return [self.path(d) for d in days]
+
+  def load(self, start: pd.Timestamp | None = None,
+           read: Callable[[str], pd.DataFrame] = read_day):
+    """Load rows since start, reading only the daily files holding them."""
+    paths = self.paths_since(start)
+    if not paths:
+      return pd.DataFrame(columns=['time'])
+    df = pd.concat([read(p) for p in paths], ignore_index=True)
+    if start is not None:
+      df = df[df['time'] > start]
+    return df
+
+
+def list_stores(directory: str):
+  """List stores of every device synced to the hub."""
+  names = [os.path.basename(os.path.dirname(p))
+           for p in glob.glob(os.path.join(directory, '*', 'sync.json'))]
+  return [DeviceStore(directory, name) for name in sorted(names)]
+
+
+def remove_stores(directory: str):
+  """Remove data synced from every device, returning removed directories."""
+  removed = [s.directory for s in list_stores(directory)]
+  for path in removed:
+    shutil.rmtree(path)
+  return removed
+
+
+def write_atomic(path: str, text: str):
+  """Write text to a temporary file, then rename it over path."""
+  tmp_path = path + '.tmp'
+  with open(tmp_path, 'w') as f:
+    f.write(text)
+  os.replace(tmp_path, path)
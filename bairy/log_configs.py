@@ -1,13 +1,101 @@
-"""Configure logging."""
+"""Configure logging.
+
+Records are formatted by the logging thread, then put on a queue drained by a
+listener thread writing to the console and to a log file rotated by size, so
+no thread ever blocks on the disk to log. A process forked afterwards, such
+as the app, starts a listener of its own on first logging, so its records are
+still written if its parent exits. Each listener reopens the file once
+another has rotated it.
+
+Logs are read back newest first by seeking backwards from the end of the file
+in blocks, so serving recent records costs the same however long the file."""
 
 from __future__ import annotations
-from typing import Any
+from typing import Any, BinaryIO
+import os
+import re
 import logging
-import uvicorn
+import multiprocessing
+import multiprocessing.util
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+MAX_BYTES = 5 << 20  # size of log file before rotating
+BACKUP_COUNT = 2  # rotated log files kept
+BLOCK_SIZE = 1 << 16  # bytes read at once when seeking back through logs
+LOG_LIMIT = 1000  # records served at once by default
+RECORD_START = re.compile(rb'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d - (\w+) - ')
+
+# listeners writing each log file, with the process that started them
+LISTENERS: dict[str, tuple[int, QueueListener]] = {}
+
+
+class SharedRotatingFileHandler(RotatingFileHandler):
+  """Rotating file handler reopening its file once rotated or removed by
+  another process writing the same file."""
+
+  def emit(self, record: logging.LogRecord):
+    if self.stream is not None and self.replaced():
+      self.stream.close()
+      self.stream = self._open()
+    super().emit(record)
+
+  def replaced(self):
+    """Whether the open file is no longer at the path of the log."""
+    try:
+      path_stat = os.stat(self.baseFilename)
+    except FileNotFoundError:
+      return True
+    return path_stat.st_ino != os.fstat(self.stream.fileno()).st_ino
+
+
+class ProcessQueueHandler(QueueHandler):
+  """Queue handler passing records to the listener of the current process,
+  so handlers inherited by a forked process do not rely on its parent."""
+
+  def __init__(self, filename: str):
+    self.filename = filename
+    super().__init__(get_listener(filename).queue)
+
+  def enqueue(self, record: logging.LogRecord):
+    self.queue = get_listener(self.filename).queue
+    super().enqueue(record)
+
+
+def get_listener(log_path: str):
+  """Get listener of this process writing records to log_path, starting it
+  on first use."""
+  pid = os.getpid()
+  if LISTENERS.get(log_path, (None,))[0] != pid:
+    file_handler = SharedRotatingFileHandler(log_path, maxBytes=MAX_BYTES,
+                                             backupCount=BACKUP_COUNT)
+    console_handler = logging.StreamHandler()
+    # records arrive formatted, and only console records from the root
+    console_handler.addFilter(lambda record: getattr(record, 'console', True))
+    listener = QueueListener(multiprocessing.Queue(-1), file_handler,
+                             console_handler)
+    listener.start()
+    # stopped on exit of the main process and of processes it starts, which
+    # skip atexit, before the queue closes at exit priority 10
+    multiprocessing.util.Finalize(listener, listener.stop, exitpriority=20)
+    LISTENERS[log_path] = (pid, listener)
+  return LISTENERS[log_path][1]
+
+
+def queue_handler(filename: str, console: bool = True):
+  """Create handler passing records to the listener writing filename."""
+  handler = ProcessQueueHandler(filename)
+  if not console:  # already printed by another handler
+    handler.addFilter(mark_file_only)
+  return handler
+
+
+def mark_file_only(record: logging.LogRecord):
+  """Keep record out of the console written by the listener."""
+  record.console = False
+  return True
 
 
 def configure_root_logging(log_path: str):
@@ -18,16 +106,14 @@ def configure_root_logging(log_path: str):
       fmt=LOG_FORMAT,
       datefmt=DATE_FORMAT
   )
-  file_handler = logging.FileHandler(log_path)
-  file_handler.setFormatter(formatter)
-  logger.addHandler(file_handler)
-  console_handler = logging.StreamHandler()
-  console_handler.setFormatter(formatter)
-  logger.addHandler(console_handler)
+  handler = queue_handler(log_path)
+  handler.setFormatter(formatter)
+  logger.addHandler(handler)
 
 
 def get_uvicorn_logger(log_path: str):
   """Configure uvicorn default logger to save to file."""
+  import uvicorn  # pylint: disable=import-outside-toplevel
 
   lc: dict[str, Any] = uvicorn.config.LOGGING_CONFIG
 
@@ -37,17 +123,88 @@ def get_uvicorn_logger(log_path: str):
   lc['formatters']['default']['fmt'] = LOG_FORMAT
   lc['formatters']['default']['datefmt'] = DATE_FORMAT
 
-  # adding FileHandler to LOGGING_CONFIG
+  # adding queued handlers of the rotated log file to LOGGING_CONFIG
+  # uvicorn prints to the console itself
   lc['handlers']['default_file'] = {
       'formatter': 'default',
-      'class': 'logging.FileHandler',
-      'filename': log_path}
+      '()': queue_handler,
+      'filename': log_path,
+      'console': False}
   lc['handlers']['access_file'] = {
       'formatter': 'access',
-      'class': 'logging.FileHandler',
-      'filename': log_path}
+      '()': queue_handler,
+      'filename': log_path,
+      'console': False}
 
   # telling loggers to use the additional handler
-  lc['loggers']['uvicorn']['handlers'].append('default_file')
-  lc['loggers']['uvicorn.access']['handlers'].append('access_file')
+  for logger, handler in [('uvicorn', 'default_file'),
+                          ('uvicorn.access', 'access_file')]:
+    if handler not in lc['loggers'][logger]['handlers']:
+      lc['loggers'][logger]['handlers'].append(handler)
   return lc
+
+
+def reversed_lines(f: BinaryIO, end: int):
+  """Yield the byte offset and content of each line of f before offset end,
+  last line first, reading backwards in blocks."""
+  position = end
+  head = b''  # start of a line continued in the block after
+  while position > 0:
+    size = min(BLOCK_SIZE, position)
+    position -= size
+    f.seek(position)
+    lines = (f.read(size) + head).split(b'\n')
+    head = lines[0]
+    line_end = position + sum(len(line) + 1 for line in lines) - 1
+    for line in reversed(lines[1:]):
+      line_end -= len(line)
+      if line:
+        yield line_end, line
+      line_end -= 1
+  if head:
+    yield 0, head
+
+
+def level_number(level: str):
+  """Convert name of a logging level to its number."""
+  number = logging.getLevelName(level.upper())
+  if not isinstance(number, int):
+    raise ValueError(f'Unknown logging level {level}')
+  return number
+
+
+def read_logs(log_path: str, limit: int = LOG_LIMIT, before: int | None = None,
+              level: str | None = None):
+  """Read at most limit records starting before byte offset before, newest
+  first, keeping those at or above level.
+
+  Return the text of the records and the offset at which to continue, or
+  None once the start of the file is reached."""
+  if limit < 1:
+    raise ValueError('Limit must be positive')
+  min_level = logging.NOTSET if level is None else level_number(level)
+  records: list[bytes] = []
+  pending: list[bytes] = []  # lines following the start of a record
+  cursor = None
+  with open(log_path, 'rb') as f:
+    end = f.seek(0, os.SEEK_END)
+    if before is not None:
+      end = min(max(before, 0), end)
+    for start, line in reversed_lines(f, end):
+      pending.append(line)
+      match = RECORD_START.match(line)
+      if match is None:  # such as a line of a traceback
+        continue
+      number = logging.getLevelName(match[1].decode())
+      if isinstance(number, int) and number >= min_level:
+        records.append(b'\n'.join(reversed(pending)))
+      pending = []
+      if len(records) == limit:
+        cursor = start or None
+        break
+    else:  # lines before any record
+      if pending and min_level == logging.NOTSET:
+        records.append(b'\n'.join(reversed(pending)))
+
+  text = b''.join(record + b'\n' for record in records)
+  return text.decode(errors='replace'), cursor
@@ -0,0 +1,50 @@
+"""Break down the time taken to import bairy with python -X importtime."""
+
+from __future__ import annotations
+import sys
+import subprocess
+
+
+# imported by every command, and additionally when running in device mode
+COMMAND_MODULES = ['bairy.__main__']
+DEVICE_MODULES = ['bairy.device.app', 'bairy.device.device',
+                  'bairy.device.preprocess']
+
+
+def measure_imports(modules: list[str]):
+  """Import modules in a fresh interpreter, timing every module imported.
+
+  Returns tuples of module name, self time and cumulative time, both in
+  microseconds, in the order imports completed."""
+  code = 'import ' + ', '.join(modules)
+  p = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                     stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                     check=True)
+  records = []
+  for line in p.stderr.decode().splitlines():
+    if not line.startswith('import time:') or '[us]' in line:
+      continue
+    self_us, cumulative_us, name = line[len('import time:'):].split('|')
+    records.append((name.strip(), int(self_us), int(cumulative_us)))
+  return records
+
+
+def group_by_package(records: list[tuple[str, int, int]]):
+  """Total self time of the modules within each top level package."""
+  totals: dict[str, int] = {}
+  for name, self_us, _ in records:
+    package = name.split('.')[0]
+    totals[package] = totals.get(package, 0) + self_us
+  return totals
+
+
+def print_profile(top: int = 15):
+  """Print import time of commands and device mode by package."""
+  for label, modules in [('commands', COMMAND_MODULES),
+                         ('device mode', DEVICE_MODULES)]:
+    records = measure_imports(modules)
+    totals = group_by_package(records)
+    total = sum(totals.values())
+    print(f'{label}: {total / 1e6:.3f} s importing {len(records)} modules')
+    for package, us in sorted(totals.items(), key=lambda x: -x[1])[:top]:
+      print(f'  {us / 1e3:9.1f} ms  {package}')
@@ -13,7 +13,7 @@ install_requires = [
     'dash',
     'plotly',
     'pandas',
-    'nest_asyncio',
+    'numpy',
     'aiohttp',
     'smbus2',
     'gpiozero'
@@ -30,6 +30,7 @@ setuptools.setup(
     packages=setuptools.find_namespace_packages(exclude=['tests*']),
     python_requires='>=3.7.0',
     install_requires=install_requires,
+    extras_require={'bench': ['httpx']},  # for bairy bench
     entry_points={'console_scripts': ['bairy = bairy.__main__:main']},
     version='0.1.7',
     classifiers=['License :: OSI Approved :: MIT License',
@@ -0,0 +1,55 @@
+"""Test synthetic data and measurements of benchmarks."""
+
+import sys
+import numpy as np
+import pytest
+from bairy.bench import cases, measure, suite, synthetic
+from bairy.device import configs, device
+
+
+def test_random_walks():
+  """Readings move by at most one within [0, 50], as the random sensor."""
+  values = synthetic.random_walks(10000, 3, seed=1)
+  assert values.shape == (10000, 3)
+  assert values.min() >= 0 and values.max() <= synthetic.MAX_READING
+  assert np.abs(np.diff(values, axis=0)).max() == 1
+  assert (values == synthetic.random_walks(10000, 3, seed=1)).all()
+
+
+def test_data_dir(tmp_path):
+  """Data paths point within another directory only meanwhile."""
+  data_path = configs.DATA_PATH
+  with synthetic.data_dir(str(tmp_path)):
+    assert configs.DATA_PATH.startswith(str(tmp_path))
+    assert device.DATA_PATH == configs.DATA_PATH
+    assert configs.PREPROCESSED_DATA_PATHS['day'].startswith(str(tmp_path))
+  assert configs.DATA_PATH == device.DATA_PATH == data_path
+
+
+def test_compare():
+  """Only metrics higher than baseline beyond threshold are regressions."""
+  metrics = {'seconds': 1.0, 'peak_rss_mb': 100.0, 'peak_alloc_mb': 10.0}
+  baseline = {'params': {'days': 1}, 'cases': {'a': metrics}}
+  results = {'params': {'days': 1}, 'cases': {'a': dict(metrics, seconds=1.1),
+                                              'b': metrics}}
+  assert measure.compare(results, baseline, 0.2) == []
+  results['cases']['a']['peak_alloc_mb'] = 13.0
+  regressions = measure.compare(results, baseline, 0.2)
+  assert [(r['case'], r['metric']) for r in regressions] == \
+      [('a', 'peak_alloc_mb')]
+
+
+def test_run_suite():
+  """Cases are measured on generated data, each in a forked process."""
+  results = suite.run_suite(days=1, interval=60, repeat=1, select='table')
+  assert list(results['cases']) == ['serve_table',
+                                    'serve_table sorted filtered']
+  for result in results['cases'].values():
+    assert result['seconds'] > 0 and result['peak_alloc_mb'] > 0
+
+
+def test_missing_httpx(monkeypatch):
+  """Without httpx the suite stops early, naming the extra to install."""
+  monkeypatch.setitem(sys.modules, 'fastapi.testclient', None)
+  with pytest.raises(ImportError, match='bairy\\[bench\\]'):
+    cases.app_client()
@@ -0,0 +1,65 @@
+"""Test shared I2C bus connections with a fake bus."""
+
+from bairy.device.bus import BusManager
+from bairy.device.sensor import AirSensor
+from bairy.device.validate import AirSensorConfigs
+
+
+class FakeSMBus:
+  """Stand in for smbus2.SMBus answering like an air sensor."""
+  opened = 0
+  fail_open = False
+  fail_read = False
+
+  def __init__(self, number: int):
+    if FakeSMBus.fail_open:
+      raise OSError('no bus')
+    FakeSMBus.opened += 1
+    self.number = number
+
+  def read_i2c_block_data(self, address: int, register: int, length: int):
+    if FakeSMBus.fail_read:
+      raise OSError('no ack')
+    data = [0x42, 0x4d] + [0] * 28
+    data[7] = address  # pm_2.5
+    checksum = sum(data)
+    return data + [checksum >> 8, checksum & 0xFF]
+
+  def close(self):
+    pass
+
+
+def test_shared_bus():
+  """Sensors on one bus share a single connection."""
+  FakeSMBus.opened = 0
+  manager = BusManager(FakeSMBus)
+  sensors = [AirSensor(AirSensorConfigs(i2c_address=a), buses=manager)
+             for a in [0x12, 0x13]]
+  sensors.append(AirSensor(AirSensorConfigs(i2c_address=0x12, bus=3),
+                           buses=manager))
+  for _ in range(3):
+    readings = [s.read()['pm_2.5'] for s in sensors]
+  assert readings == [0x12, 0x13, 0x12]
+  assert FakeSMBus.opened == 2
+  assert sorted(manager.buses) == [1, 3]
+
+
+def test_reconnect_backoff():
+  """A failed bus is reopened, backing off while it stays unavailable."""
+  now = [0.0]
+  FakeSMBus.opened = 0
+  manager = BusManager(FakeSMBus, backoff=1.0, clock=lambda: now[0])
+  sensor = AirSensor(AirSensorConfigs(i2c_address=0x12), buses=manager)
+  assert sensor.read()['pm_2.5'] == 0x12
+
+  FakeSMBus.fail_read = True
+  assert sensor.read()['pm_2.5'] is None  # connection dropped
+  FakeSMBus.fail_read = False
+  FakeSMBus.fail_open = True
+  assert sensor.read()['pm_2.5'] is None  # reopening fails
+  FakeSMBus.fail_open = False
+  now[0] = 0.5
+  assert sensor.read()['pm_2.5'] is None  # still backing off
+  now[0] = 1.5
+  assert sensor.read()['pm_2.5'] == 0x12
+  assert FakeSMBus.opened == 2
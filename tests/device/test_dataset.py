@@ -0,0 +1,45 @@
+"""Test converting rows written by earlier versions."""
+
+import os
+import time
+from bairy.device import configs
+from bairy.device.dataset import migrate_local_times
+
+
+def test_migrate_local_times(tmp_path, monkeypatch):
+  """Local times at second resolution are rewritten in UTC."""
+  monkeypatch.setenv('TZ', 'America/Los_Angeles')
+  time.tzset()
+  try:
+    path = str(tmp_path / 'data.csv')
+    index_path = str(tmp_path / 'data.csv.idx')
+    with open(path, 'w') as f:
+      f.write('time,a,b\n'
+              '2021-01-01 12:00:00,1,\n'
+              '2021-07-01 12:00:01,2,3\n'
+              '2021-07-01 19:00:02.500,4,5\n')
+    with open(index_path, 'wb') as f:
+      f.write(b'stale')
+    assert migrate_local_times(path, index_path)
+    with open(path) as f:
+      assert f.read() == ('time,a,b\n'
+                          '2021-01-01 20:00:00.000,1,\n'
+                          '2021-07-01 19:00:01.000,2,3\n'
+                          '2021-07-01 19:00:02.500,4,5\n')
+    assert not os.path.exists(index_path)
+    assert not migrate_local_times(path, index_path)
+  finally:
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_migrate_configured_paths(tmp_path, monkeypatch):
+  """Without arguments, the data paths in use at call time are migrated."""
+  path = str(tmp_path / 'data.csv')
+  monkeypatch.setattr(configs, 'DATA_PATH', path)
+  monkeypatch.setattr(configs, 'DATA_INDEX_PATH', path + '.idx')
+  with open(path, 'w') as f:
+    f.write('time,a\n2021-01-01 12:00:00,1\n')
+  assert migrate_local_times()
+  with open(path) as f:
+    assert '.000' in f.read()
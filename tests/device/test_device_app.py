@@ -21,7 +21,7 @@ def test_all_endpoint_status():
   r = client.get('/openapi.json')
   assert r.status_code == 200
   for k, v in r.json()['paths'].items():
-    if 'get' in v:
+    if 'get' in v and k != '/stream':  # streaming until disconnected
       r = client.get(k)
       assert r.status_code == 200
 
@@ -51,11 +51,70 @@ def test_data():
   assert len(df) == n_rows - 1  # don't want to count headers
 
 
+def test_data_selection():
+  """Test selecting rows and columns of data."""
+  df = pd.read_csv(BytesIO(client.get('/data').content))
+  column = df.columns[-1]
+  start, end = df['time'].iloc[0], df['time'].iloc[-1]
+  params = {'start': start, 'end': end, 'columns': column}
+  r = client.get('/data', params=params)
+  assert r.headers['x-resolution'] == 'raw'
+  selected = pd.read_csv(BytesIO(r.content))
+  assert list(selected.columns) == ['time', column]
+  assert list(selected['time']) == list(df['time'].iloc[:-1])
+
+  r = client.get('/data', params=params,
+                 headers={'If-None-Match': r.headers['etag']})
+  assert r.status_code == 304
+  r = client.get('/data', params={'columns': 'fake'})
+  assert r.status_code == 400
+
+
+def test_data_resolution():
+  """Test averaging data to a resolution or within max_points."""
+  r = client.get('/data', params={'resolution': '60'})
+  assert r.headers['x-resolution'] == '1min'
+  df = pd.read_csv(BytesIO(r.content), parse_dates=['time'])
+  assert (df['time'].diff().dropna() >= pd.Timedelta('60s')).all()
+
+  r = client.get('/data', headers={'Range': 'bytes=0-9'})
+  assert r.status_code == 200
+  assert r.headers['accept-ranges'] == 'none'
+
+  r = client.get('/data', params={'max_points': 10})
+  assert r.status_code == 200
+  assert len(pd.read_csv(BytesIO(r.content))) <= 10
+  assert client.get('/data?resolution=bogus').status_code == 400
+
+
+def test_data_range():
+  """Test byte ranges of preprocessed data."""
+  whole = client.get('/data?selection=day')
+  assert whole.headers['accept-ranges'] == 'bytes'
+  size = len(whole.content)
+  r = client.get('/data?selection=day', headers={'Range': 'bytes=0-9'})
+  assert r.status_code == 206
+  assert r.content == whole.content[:10]
+  assert r.headers['content-range'] == f'bytes 0-9/{size}'
+
+  r = client.get('/data?selection=day',
+                 headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+  assert r.status_code == 200
+  assert r.content == whole.content
+  r = client.get('/data?selection=day',
+                 headers={'Range': f'bytes={size}-'})
+  assert r.status_code == 416
+  assert r.headers['content-range'] == f'bytes */{size}'
+
+
 def test_logs():
   """Test logs endpoint."""
   r = client.get('/logs')
   assert 'INFO' in r.text
   assert 'Uvicorn' in r.text
+  r = client.get('/logs?limit=1&level=debug')
+  assert r.text.count(' - ') >= 2
+  assert client.get('/logs?level=bogus').status_code == 400
 
 
 def test_status():
@@ -0,0 +1,46 @@
+"""Test peak preserving downsampling of traces."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from bairy.device.downsample import lttb, minmax, downsample_df
+
+
+def random_walk(n):
+  """Create a random walk with a single spike."""
+  rng = np.random.default_rng(0)
+  y = np.cumsum(rng.normal(size=n))
+  y[n // 3] += 1000
+  return np.arange(n, dtype=np.float64), y
+
+
+def test_lttb():
+  """LTTB keeps endpoints and spikes within budget."""
+  x, y = random_walk(10000)
+  kept = lttb(x, y, 100)
+  assert len(kept) == 100 and np.all(np.diff(kept) > 0)
+  assert kept[0] == 0 and kept[-1] == 9999
+  assert 10000 // 3 in kept
+  assert list(lttb(x[:5], y[:5], 100)) == [0, 1, 2, 3, 4]
+
+
+def test_minmax():
+  """Min/max keeps the extremes of every bucket."""
+  x, y = random_walk(10000)
+  kept = minmax(x, y, 100)
+  assert len(kept) <= 100 and np.all(np.diff(kept) > 0)
+  assert np.argmax(y) in kept and np.argmin(y) in kept
+  assert kept[0] == 0 and kept[-1] == 9999
+
+
+def test_downsample_df():
+  """Rows selected for any column keep every column."""
+  _, y = random_walk(1000)
+  index = pd.date_range('2021-01-01', periods=1000, freq='s', name='time')
+  df = pd.DataFrame({'a': y, 'b': -y}, index=index)
+  df.iloc[::2, 1] = np.nan
+  small = downsample_df(df, 50, 'minmax')
+  assert len(small) <= 100 and small['a'].max() == df['a'].max()
+  assert small['b'].min() == df['b'].min()
+  with pytest.raises(ValueError):
+    downsample_df(df, 50, 'median')
@@ -0,0 +1,52 @@
+"""Test sensor driver registry."""
+
+import pytest
+from pydantic import BaseModel
+from bairy.device import drivers
+from bairy.device.sensor import Sensor, RandomSensor
+from bairy.device.validate import DeviceConfigs, RandomSensorConfigs
+
+
+class ConstantSensorConfigs(BaseModel):
+  sensor_type: str = 'constant'
+  header: str
+  value: int = 7
+  timeout: float = 1.0
+  interval: float = None
+
+
+class ConstantSensor(Sensor):
+  """Driver as a third party package might declare it."""
+  sensor_type = 'constant'
+  config_model = ConstantSensorConfigs
+  units = 'constant'
+
+  __slots__ = ('value',)
+
+  def __init__(self, configs: ConstantSensorConfigs):
+    self.value = configs.value
+    super().__init__(configs)
+
+  def reader(self):
+    return lambda: {self.name: self.value}
+
+
+def test_registered_driver():
+  """Configs of a registered driver validate and create its sensor."""
+  with pytest.raises(ValueError):
+    DeviceConfigs(name='d', update_interval=1,
+                  sensors=[{'sensor_type': 'constant', 'header': 'c'}])
+
+  drivers.DRIVERS['constant'] = ConstantSensor
+  try:
+    d = DeviceConfigs(name='d', update_interval=1,
+                      sensors=[{'sensor_type': 'constant', 'header': 'c'},
+                               RandomSensorConfigs(header='r')])
+    assert d == DeviceConfigs(**d.dict())
+    sensors = [drivers.create_sensor(s) for s in d.sensors]
+  finally:
+    del drivers.DRIVERS['constant']
+
+  assert sensors[0].read() == {'c': 7}
+  assert isinstance(sensors[1], RandomSensor)
+  assert not hasattr(sensors[1], '__dict__')
@@ -0,0 +1,32 @@
+"""Test the figure cache of the /plot dashboard."""
+
+import time
+import threading
+import plotly.graph_objects as go
+from bairy.device.figures import ResultCache, figure_data
+
+
+def test_figure_cache():
+  """Figures are built once per version, even when requested concurrently."""
+  figures = ResultCache()
+  builds = []
+
+  def build():
+    builds.append(1)
+    time.sleep(0.05)  # long enough for every request to arrive
+    return figure_data(go.Figure(go.Scatter(x=[1, 2], y=[3, len(builds)])))
+
+  results = []
+  threads = [threading.Thread(
+      target=lambda: results.append(figures.get('day', 1, build)))
+      for _ in range(5)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  assert len(builds) == 1 and len(results) == 5
+  assert all(r is results[0] for r in results)
+  assert results[0]['data'][0]['y'] == [3, 1]  # plain JSON data
+
+  assert figures.get('day', 2, build)['data'][0]['y'] == [3, 2]
+  assert figures.stats() == {'hits': 4, 'misses': 2, 'entries': 1}
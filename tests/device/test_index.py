@@ -0,0 +1,49 @@
+"""Test sparse index of data.csv."""
+
+import os
+from datetime import datetime, timedelta
+from bairy.device.index import SparseIndex, read_range
+from bairy.device.writer import DataWriter
+
+
+def write_rows(data_path, index_path, n_rows):
+  """Write a row every 10 seconds through an indexing writer."""
+  start = datetime(2021, 1, 17)
+  with DataWriter(data_path, ['a'], fsync='never', index_path=index_path,
+                  flush_rows=7) as writer:
+    for i in range(n_rows):
+      writer.write({'a': i}, start + timedelta(seconds=10 * i))
+  return start
+
+
+def test_index_range(tmp_path):
+  """Range reads only parse rows near start."""
+  data_path = str(tmp_path / 'data.csv')
+  index_path = str(tmp_path / 'data.csv.idx')
+  start = write_rows(data_path, index_path, 100)
+
+  index = SparseIndex.load(index_path)
+  assert index.rows == 100
+  assert index.offset == os.path.getsize(data_path)
+  assert len(index.entries) == 17  # one per minute
+
+  t = (start + timedelta(minutes=10, seconds=20)).timestamp()
+  df = read_range(data_path, index_path, t)
+  assert df['a'].iloc[0] == 60  # first row of that minute
+  assert len(df) == 40
+
+
+def test_index_rebuild(tmp_path):
+  """Rebuilding an index from scratch matches the writer's index."""
+  data_path = str(tmp_path / 'data.csv')
+  index_path = str(tmp_path / 'data.csv.idx')
+  write_rows(data_path, index_path, 100)
+  entries = SparseIndex.load(index_path).entries
+
+  os.remove(index_path)
+  with open(data_path, 'a') as f:
+    f.write('2021-01-17 00:1')  # partially written row
+  index = SparseIndex.open(index_path, data_path)
+  assert (index.entries == entries).all()
+  assert index.rows == 100
+  assert index.offset < os.path.getsize(data_path)
@@ -0,0 +1,56 @@
+"""Test pushing new readings to live viewers."""
+
+import json
+import queue
+import asyncio
+from datetime import datetime
+from bairy.device.live import Broadcaster, publish_row
+
+
+def test_publish_row():
+  """Rows carry their time and a full source drops new rows."""
+  source = queue.Queue(1)
+  now = datetime(2021, 1, 1)
+  publish_row(source, {'a': 1, 'b': None}, now)
+  publish_row(source, {'a': 2}, now)
+  assert source.get_nowait() == {'a': 1, 'time': '2021-01-01 00:00:00.000'}
+  assert source.empty()
+
+
+def test_broadcaster():
+  """Every subscriber gets each row and slow ones lose the oldest rows."""
+
+  async def run():
+    broadcaster = Broadcaster(maxsize=2)
+    fast, slow = broadcaster.subscribe(), broadcaster.subscribe()
+    for i in range(3):
+      broadcaster.publish({'i': i})
+      if i < 2:
+        assert (await fast.get())['i'] == i
+    assert [slow.get_nowait()['i'] for _ in range(2)] == [1, 2]
+    assert broadcaster.dropped == 1
+    broadcaster.unsubscribe(slow)
+    assert broadcaster.stats()['subscribers'] == 1
+
+  asyncio.run(run())
+
+
+def test_stream():
+  """Rows relayed from source are streamed as server-sent events."""
+
+  async def run():
+    broadcaster = Broadcaster()
+    stream = broadcaster.stream(keepalive=0.01)
+    assert await stream.__anext__() == ': keepalive\n\n'
+    source = queue.Queue()
+    broadcaster.relay(source)
+    source.put({'a': 1})
+    event = await asyncio.wait_for(stream.__anext__(), 1)
+    assert event.startswith('data: ')
+    assert json.loads(event[6:]) == {'a': 1}
+    source.put(None)
+    await stream.aclose()
+    assert broadcaster.stats() == {'subscribers': 0, 'published': 1,
+                                   'dropped': 0}
+
+  asyncio.run(run())
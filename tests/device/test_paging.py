@@ -0,0 +1,40 @@
+"""Test server side paging of the /table dashboard."""
+
+import numpy as np
+import pandas as pd
+from bairy.device.paging import Pages, split_filter_part
+
+
+def make_pages():
+  """Pages of ten rows, newest first."""
+  times = pd.date_range('2021-01-01', periods=10, freq='min').astype(str)
+  df = pd.DataFrame({'time': times, 'pm': [3, 1, 4, 1, 5, 9, 2, 6, np.nan, 3]})
+  return Pages(df.iloc[::-1])
+
+
+def test_split_filter_part():
+  """Conditions of DataTable filter queries are parsed."""
+  assert split_filter_part('{pm} ge 4') == ('pm', 'ge', '4')
+  assert split_filter_part('{pm} >= 4') == ('pm', 'ge', '4')
+  assert split_filter_part('{time} contains "01:0"') == \
+      ('time', 'contains', '01:0')
+
+
+def test_pages():
+  """Only rows of the requested page are sent, after sorting and filtering."""
+  pages = make_pages()
+  data, page_count = pages.page(0, 4)
+  assert page_count == 3 and len(data) == 4
+  assert data[0]['pm'] == 3 and data[0]['time'].endswith('00:09:00')
+
+  data, page_count = pages.page(2, 4)  # the last page is partial
+  assert [r['pm'] for r in data] == [1, 3]
+
+  sort_by = [{'column_id': 'pm', 'direction': 'desc'}]
+  data, _ = pages.page(0, 3, sort_by)
+  assert [r['pm'] for r in data] == [9, 6, 5]
+
+  data, page_count = pages.page(0, 3, sort_by, '{pm} lt 4')
+  assert page_count == 2 and [r['pm'] for r in data] == [3, 3, 2]
+  assert list(pages.orders) == [('pm', False)]  # order reused for filtering
+  assert list(pages.masks) == ['{pm} lt 4']
@@ -0,0 +1,49 @@
+"""Test rotating data.csv into compressed time partitions."""
+
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+from bairy.device import partitions
+from bairy.device.writer import PartitionedWriter
+
+
+def test_rotate_and_compact(tmp_path):
+  """Writer rotates data.csv once a day and partitions are compressed."""
+  path = str(tmp_path / 'data.csv')
+  directory = str(tmp_path / 'partitions')
+  start = datetime(2021, 3, 1, 23, 58)
+  with PartitionedWriter(path, ['a'], directory, 'day', 'gzip',
+                         fsync='never') as writer:
+    for i in range(300):
+      writer.write({'a': i}, start + timedelta(seconds=i))
+    writer.compactor.join()
+
+  closed = partitions.list_partitions(directory)
+  assert len(closed) == 1
+  assert closed[0].compressed
+  assert closed[0].first == start
+  assert closed[0].last == datetime(2021, 3, 1, 23, 59, 59)
+  assert partitions.count_rows(closed[0]) == 120
+
+  df = pd.concat([pd.read_csv(closed[0].open()), pd.read_csv(path)])
+  assert list(df['a']) == list(range(300))
+  assert not closed[0].overlaps(datetime(2021, 3, 2))
+
+
+def test_retention(tmp_path):
+  """Partitions older than the retention period are removed."""
+  directory = str(tmp_path)
+  for day in range(1, 4):
+    path = str(tmp_path / 'data.csv')
+    with open(path, 'w') as f:
+      f.write('time,a\n')
+    first = datetime(2021, 3, day)
+    partitions.rotate(path, directory, first, first + timedelta(hours=23))
+
+  compressed, removed = partitions.compact(directory, 'xz')
+  assert len(compressed) == 3 and not removed
+  removed = partitions.apply_retention(directory, 1, datetime(2021, 3, 4, 12))
+  assert len(removed) == 2
+  assert [os.path.basename(p.path) for p in
+          partitions.list_partitions(directory)] == \
+      ['data_20210303T000000_20210303T230000.csv.xz']
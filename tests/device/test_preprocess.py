@@ -0,0 +1,24 @@
+"""Test building plotted data from rollups."""
+
+import numpy as np
+import pandas as pd
+from bairy.device.preprocess import envelope
+from bairy.device.rollup import RollupPyramid
+
+
+def test_envelope():
+  """The envelope keeps extremes that bucket means would average away."""
+  index = pd.date_range('2021-01-01', periods=10000, freq='s', name='time')
+  df = pd.DataFrame({'a': np.ones(10000), 'b': np.arange(10000.0)},
+                    index=index)
+  df.iloc[5000, 0] = 1000
+  df.iloc[100:200, 1] = np.nan
+  pyramid = RollupPyramid(['a', 'b'])
+  pyramid.fold(df.index.to_numpy(), df.to_numpy())
+
+  env = envelope(pyramid, budget=100)
+  assert len(env) <= 100 and list(env.columns) == ['a', 'b']
+  assert env['a'].max() == 1000 and env['b'].max() == 9999
+  assert env['a'].min() == 1 and env['b'].min() == 0
+  assert env.index.is_monotonic_increasing
+  assert pyramid.query(budget=50)['a'].max() < 1000
@@ -0,0 +1,45 @@
+"""Test concurrent sensor reads with timeouts."""
+
+import time
+import asyncio
+from bairy.device.reader import SensorReader
+
+
+class SlowSensor:
+  """Stand in for a sensor whose reads take delay seconds."""
+
+  def __init__(self, header: str, delay: float, timeout: float):
+    self.name = header
+    self.headers = [header]
+    self.delay = delay
+    self.timeout = timeout
+
+  def read(self):
+    time.sleep(self.delay)
+    return {self.name: 1}
+
+
+def test_reader_timeout():
+  """A hung sensor records None without delaying the other sensors."""
+  fast = SlowSensor('fast', 0.01, 1.0)
+  slow = SlowSensor('slow', 0.3, 0.05)
+  reader = SensorReader([fast, slow])
+
+  async def run():
+    start = time.perf_counter()
+    data = await reader.read()
+    assert time.perf_counter() - start < 0.2
+    assert data == {'fast': 1, 'slow': None}
+    data = await reader.read()  # slow read still pending, so skipped
+    assert data == {'fast': 1, 'slow': None}
+    await asyncio.sleep(0.4)
+    slow.delay = 0.0
+    return await reader.read()
+
+  assert asyncio.run(run()) == {'fast': 1, 'slow': 1}
+  stats = reader.stats_dict()
+  assert stats['fast']['reads'] == 3
+  assert stats['slow']['timeouts'] == 1
+  assert stats['slow']['skipped'] == 1
+  assert stats['slow']['max_ms'] >= 300
+  reader.close()
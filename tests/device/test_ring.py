@@ -0,0 +1,123 @@
+"""Test the ring buffer of recent readings in shared memory."""
+
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from bairy.device.ring import RingBuffer, capacity_from_configs
+from bairy.device.validate import random_configs
+from bairy.device.timestamps import format_time, utcnow
+
+
+COLUMNS = [['a', 'uint16'], ['b', 'float']]
+T0 = datetime(2021, 1, 1)
+
+
+def test_capacity():
+  """Capacity covers the ticks of each distinct interval."""
+  device = random_configs()
+  assert capacity_from_configs(device, 60) == 60
+  device.sensors[0].interval = 0.5
+  assert capacity_from_configs(device, 60) == 180
+
+
+def test_ring_buffer():
+  """Rows are read back in order from another mapping, even after wrapping."""
+  ring = RingBuffer.create(COLUMNS, 4)
+  ring.since[0] = 0
+  try:
+    reader = RingBuffer.attach(ring.name)
+    assert reader.latest() == {}
+    for i in range(6):
+      ring.write({'a': i, 'b': None if i == 5 else i / 2},
+                 T0 + timedelta(seconds=i))
+
+    df = reader.frame(pd.Timestamp(T0 + timedelta(seconds=2)))
+    assert list(df['a']) == [2, 3, 4, 5]
+    assert np.isnan(df['b'].iloc[-1])
+    assert reader.frame(pd.Timestamp(T0)) is None  # rows were overwritten
+    text = reader.text_frame(pd.Timestamp(T0 + timedelta(seconds=3)),
+                             pd.Timestamp(T0 + timedelta(seconds=5)), ['a'])
+    assert list(text.columns) == ['time', 'a']
+    assert list(text['time']) == ['2021-01-01 00:00:03.000',
+                                  '2021-01-01 00:00:04.000']
+    assert reader.latest() == {'time': '2021-01-01 00:00:05.000',
+                               'a': 5, 'b': 2}
+    reader.close()
+  finally:
+    ring.close()
+    ring.unlink()
+
+
+def test_seed():
+  """Seeded rows cover the range since the seed started."""
+  ring = RingBuffer.create(COLUMNS, 3)
+  try:
+    times = pd.date_range(T0, periods=4, freq='s')
+    df = pd.DataFrame({'time': times, 'a': [1, np.nan, 3, 4]})
+    ring.seed(df, pd.Timestamp(T0) - pd.Timedelta('1s'))
+    assert ring.frame(pd.Timestamp(T0)) is None  # the first row was dropped
+    df = ring.frame(times[1])
+    assert list(df['a'].fillna(-1)) == [-1, 3, 4]
+    assert df['b'].isna().all()
+  finally:
+    ring.close()
+    ring.unlink()
+
+
+def test_round_trip_times():
+  """Times read back are exactly those written to data.csv."""
+  ring = RingBuffer.create(COLUMNS, 64)
+  ring.since[0] = 0
+  try:
+    start = datetime(2026, 10, 17, 21, 0, 1)
+    times = [start + timedelta(microseconds=i * 7919) for i in range(50)]
+    for i, t in enumerate(times):
+      ring.write({'a': i, 'b': None}, t)
+    text = ring.text_frame(pd.Timestamp(start))
+    assert list(text['time']) == [format_time(t) for t in times]
+    df = ring.frame(pd.Timestamp(start))
+    assert list(df['time']) == [pd.Timestamp(t) for t in times]
+    assert ring.latest()['time'] == format_time(times[-1])
+  finally:
+    ring.close()
+    ring.unlink()
+
+
+def test_reset():
+  """Rows written before a reset are no longer served."""
+  ring = RingBuffer.create(COLUMNS, 3)
+  ring.since[0] = 0
+  try:
+    ring.write({'a': 1, 'b': 1.0}, T0)
+    ring.reset()
+    assert ring.latest() == {}
+    assert ring.frame(pd.Timestamp(T0)) is None
+    now = utcnow()
+    ring.write({'a': 2, 'b': None}, now)
+    assert list(ring.frame(pd.Timestamp(now))['a']) == [2]
+  finally:
+    ring.close()
+    ring.unlink()
+
+
+def test_seqlock():
+  """Reads retry while a row is being written."""
+  ring = RingBuffer.create(COLUMNS, 2)
+  try:
+    calls = []
+
+    def copy(n):
+      calls.append(n)
+      if len(calls) == 1:
+        ring.write({'a': 1}, T0)  # a write racing the first read
+      return n
+
+    assert ring.read(copy) == 1 and calls == [0, 1]
+    ring.header[0] += 1  # a writer stuck mid row
+    with pytest.raises(TimeoutError):
+      ring.read(lambda n: n)
+    ring.header[0] += 1
+  finally:
+    ring.close()
+    ring.unlink()
@@ -0,0 +1,62 @@
+"""Test incremental rollups."""
+
+import numpy as np
+import pandas as pd
+from bairy.device.rollup import Rollup, RollupPyramid
+
+
+def random_df(n_rows):
+  """Create readings every 7 seconds with some missing values."""
+  index = pd.date_range('2021-01-17', periods=n_rows, freq='7s', name='time')
+  values = np.random.randint(0, 50, (n_rows, 2)).astype(float)
+  values[::5, 1] = np.nan
+  return pd.DataFrame(values, index=index, columns=['a', 'b'])
+
+
+def test_fold_matches_resample():
+  """Folding rows in batches agrees with DataFrame.resample."""
+  df = random_df(5000)
+  rollup = Rollup('1min', ['a', 'b'])
+  for i in range(0, len(df), 333):
+    batch = df.iloc[i:i + 333]
+    rollup.fold(batch.index.to_numpy(), batch.to_numpy())
+
+  expected = df.resample('5T').mean()
+  actual = rollup.frame(factor=5)
+  assert np.allclose(actual.to_numpy(), expected.to_numpy(), equal_nan=True)
+  assert (actual.index == expected.index).all()
+
+  assert rollup.total_count() == 5000
+  assert rollup.min[:, 0].min() == df['a'].min()
+  assert rollup.max[:, 1].max() == df['b'].max()
+
+
+def test_evict_and_restore():
+  """Evicted buckets are dropped and state survives a checkpoint."""
+  df = random_df(1000)
+  rollup = Rollup('1min', ['a', 'b'])
+  rollup.fold(df.index.to_numpy(), df.to_numpy())
+  rollup.evict(df.index[500])
+  assert rollup.span() == len(rollup)
+  assert rollup.frame().index[0] == df.index[500].floor('1min')
+
+  restored = Rollup.from_arrays('1min', ['a', 'b'], rollup.to_arrays('x_'), 'x_')
+  assert (restored.frame().fillna(-1) == rollup.frame().fillna(-1)).all().all()
+
+
+def test_pyramid_query():
+  """Queries are answered by the finest tier within budget."""
+  df = random_df(20000)  # about 39 hours
+  pyramid = RollupPyramid(['a', 'b'])
+  pyramid.fold(df.index.to_numpy(), df.to_numpy())
+  now = df.index[-1]
+
+  assert pyramid.choose(now - pd.Timedelta('1h'), budget=100).width == '1min'
+  assert pyramid.choose(budget=1000).width == '10min'
+  assert pyramid.choose(budget=100).width == '1h'
+  assert pyramid.choose(budget=1).width == '1d'
+
+  stats = pyramid.query(budget=100, stats=('min', 'max'))
+  assert list(stats.columns) == ['a_min', 'b_min', 'a_max', 'b_max']
+  assert stats['a_max'].max() == df['a'].max()
+  assert pyramid.total_count() == len(df)
@@ -0,0 +1,57 @@
+"""Test drift-free multi-rate sampling scheduler."""
+
+import time
+import asyncio
+from bairy.device.scheduler import Scheduler
+from bairy.device.timestamps import format_time, parse_time, utcnow
+
+
+def run_ticks(scheduler: Scheduler, n: int, stall_at: int = 0):
+  """Collect n ticks, blocking the loop once at tick stall_at."""
+  async def run():
+    ticks = []
+    async for deadline, due in scheduler:
+      ticks.append((deadline, due))
+      if len(ticks) == stall_at:
+        time.sleep(5.5 * scheduler.intervals[0])
+      if len(ticks) == n:
+        return ticks
+  return asyncio.run(run())
+
+
+def steps(ticks, interval: float):
+  """Count intervals between consecutive deadlines."""
+  deadlines = [d for d, _ in ticks]
+  return [round((b - a) / interval) for a, b in zip(deadlines, deadlines[1:])]
+
+
+def test_skip():
+  """Missed ticks are skipped while deadlines stay on the original grid."""
+  scheduler = Scheduler([0.01], 'skip')
+  ticks = run_ticks(scheduler, 10, 3)
+  assert scheduler.missed == [4]
+  assert steps(ticks, 0.01) == [1, 1, 1, 5, 1, 1, 1, 1, 1]
+
+
+def test_catchup():
+  """Missed ticks are all run, late, on the original grid."""
+  scheduler = Scheduler([0.01], 'catchup')
+  ticks = run_ticks(scheduler, 10, 3)
+  assert scheduler.missed == [0]
+  assert steps(ticks, 0.01) == [1] * 9
+
+
+def test_multi_rate():
+  """Each task is due at its own rate, sharing ticks where they coincide."""
+  ticks = run_ticks(Scheduler([0.03, 0.01, 0.02]), 7)
+  assert [due for _, due in ticks] == \
+      [[0, 1, 2], [1], [1, 2], [0, 1], [1, 2], [1], [0, 1, 2]]
+  assert steps(ticks, 0.01) == [1] * 6
+
+
+def test_timestamps():
+  """Times are written in UTC with milliseconds and parse back."""
+  now = utcnow().replace(microsecond=123456)
+  assert format_time(now)[-4:] == '.123'
+  assert parse_time(format_time(now)) == now.replace(microsecond=123000)
+  assert parse_time(b'2021-01-17 21:46:40').second == 40
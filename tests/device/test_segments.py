@@ -0,0 +1,75 @@
+"""Test columnar segment store."""
+
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+from bairy.device.segments import SegmentStore
+from bairy.device.timestamps import format_time, to_epoch
+
+
+def test_append_and_read(tmp_path):
+  """Rows spill across segments and read back with missing values."""
+  store = SegmentStore(str(tmp_path), capacity=4)
+  columns = [['pm_2.5', 'uint16'], ['ir_state', 'bool']]
+  times = [float(t) for t in range(10)]
+  rows = [{'pm_2.5': t, 'ir_state': t % 2} for t in range(10)]
+  rows[3]['pm_2.5'] = None
+  store.append(columns, times, rows)
+  store.close()
+
+  assert len(store.paths()) == 3
+  assert store.count_rows() == 10
+
+  df = store.read_df(start=2.0, end=8.0)
+  assert len(df) == 6
+  assert pd.isna(df['pm_2.5'].iloc[1])
+  assert list(df['ir_state']) == [0, 1, 0, 1, 0, 1]
+
+  segment = store.segments()[0]
+  assert segment.header['min_time'] == 0.0
+  assert segment.header['max_time'] == 3.0
+
+
+def test_sensor_change(tmp_path):
+  """Changing columns starts a new segment without rewriting old ones."""
+  store = SegmentStore(str(tmp_path))
+  store.append([['a', 'uint16']], [0.0, 1.0], [{'a': 1}, {'a': 2}])
+  store.append([['b', 'float']], [2.0], [{'b': 0.5}])
+  store.close()
+
+  assert len(store.paths()) == 2
+  df = store.read_df()
+  assert list(df.columns) == ['time', 'a', 'b']
+  assert df['b'].isna().sum() == 2
+
+  lines = ''.join(store.iter_csv()).splitlines()
+  assert lines[0] == 'time,a,b'
+  assert lines[1].endswith(',1,')
+  assert lines[3].endswith(',,0.5')
+
+
+def test_removed_segment(tmp_path):
+  """Rows appended after segments are removed start a new segment."""
+  store = SegmentStore(str(tmp_path), capacity=100)
+  columns = [['pm_2.5', 'uint16']]
+  store.append(columns, [0.0, 1.0], [{'pm_2.5': 1}, {'pm_2.5': 2}])
+  for path in store.paths():
+    os.remove(path)
+  store.append(columns, [2.0, 3.0, 4.0], [{'pm_2.5': t} for t in range(3)])
+  assert store.count_rows() == 3
+  assert list(store.read_df()['pm_2.5']) == [0, 1, 2]
+
+
+def test_round_trip_times(tmp_path):
+  """Times read back are exactly those written to data.csv."""
+  store = SegmentStore(str(tmp_path))
+  start = datetime(2026, 10, 17, 21, 0, 1)
+  times = [start + timedelta(microseconds=i * 7919) for i in range(50)]
+  store.append([['a', 'uint16']], [to_epoch(t) for t in times],
+               [{'a': i} for i in range(50)])
+  store.close()
+
+  text = pd.concat(store.iter_frames())
+  assert list(text['time']) == [format_time(t) for t in times]
+  assert list(store.read_df()['time']) == [pd.Timestamp(t) for t in times]
+  assert store.latest()['time'] == format_time(times[-1])
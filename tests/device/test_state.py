@@ -0,0 +1,32 @@
+"""Test the summary of stored data maintained by the sampler."""
+
+import os
+from datetime import datetime
+from bairy.device.state import DataState
+
+
+def test_update_and_load(tmp_path):
+  """Updates count rows and keep the latest value of each column."""
+  state = DataState(['a', 'b'])
+  state.update({'a': 1, 'b': 2}, datetime(2021, 3, 1, 12))
+  state.update({'a': 3}, datetime(2021, 3, 1, 12, 0, 0, 500000))
+  assert state.n_rows == 3
+  assert state.first == '2021-03-01 12:00:00.000'
+  assert state.latest == {'time': '2021-03-01 12:00:00.500', 'a': 3, 'b': 2}
+
+  path = str(tmp_path / 'state.json')
+  state.size = 100
+  state.write(path)
+  loaded = DataState.load(path)
+  assert loaded.as_dict() == state.as_dict()
+  assert DataState.load(str(tmp_path / 'missing.json')) is None
+
+
+def test_save_after_removal(tmp_path):
+  """Saving reports data removed along with the state file."""
+  path = str(tmp_path / 'state.json')
+  state = DataState(['a', 'b'])
+  assert not state.save(path)
+  assert not state.save(path)
+  os.remove(path)
+  assert state.save(path)
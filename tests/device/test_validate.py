@@ -1,5 +1,7 @@
 """Test validate module."""
 
+import pytest
+from pydantic import ValidationError
 from bairy.device.validate import *
 
 
@@ -15,6 +17,13 @@ def test_sensor_configs():
   s = AirSensorConfigs(i2c_address=0x12)
   assert s == AirSensorConfigs(**s.dict())
 
+  for model, fields in [(DigitalSensorConfigs, {'bcm_pin': 17, 'header': 'a'}),
+                        (RandomSensorConfigs, {'header': 'a'}),
+                        (AirSensorConfigs, {'i2c_address': 0x12})]:
+    assert model(interval=0.5, **fields).interval == 0.5
+    with pytest.raises(ValidationError):
+      model(interval=0.001, **fields)
+
 
 def test_device_configs():
   """Test DeviceConfigs model."""
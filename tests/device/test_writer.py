@@ -0,0 +1,49 @@
+"""Test buffered DataWriter."""
+
+import os
+import pandas as pd
+from bairy.device.writer import DataWriter
+
+
+def test_writer_buffers(tmp_path):
+  """Rows reach the file only after a flush."""
+  path = str(tmp_path / 'data.csv')
+  writer = DataWriter(path, ['a', 'b'], flush_interval=3600, flush_rows=3)
+  writer.write({'a': 1, 'b': None})
+  writer.write({'a': 2, 'b': 3})
+  assert len(open(path).readlines()) == 1  # only headers
+
+  writer.write({'a': 3, 'b': 4})  # reaching flush_rows
+  assert len(open(path).readlines()) == 4
+
+  writer.write({'a': 4, 'b': 5})
+  writer.close()
+  df = pd.read_csv(path)
+  assert list(df.columns) == ['time', 'a', 'b']
+  assert list(df['a']) == [1, 2, 3, 4]
+  assert df['b'].isna().sum() == 1
+
+
+def test_writer_reopens(tmp_path):
+  """Writer recreates a removed data file with headers."""
+  path = str(tmp_path / 'data.csv')
+  with DataWriter(path, ['a'], fsync='never') as writer:
+    writer.write({'a': 1})
+    writer.flush()
+    os.remove(path)
+    writer.write({'a': 2})
+  assert open(path).readline() == 'time,a\n'
+  assert len(pd.read_csv(path)) == 1
+
+
+def test_sparse_rows(tmp_path):
+  """Rows holding only the first columns end without empty cells."""
+  path = str(tmp_path / 'data.csv')
+  with DataWriter(path, ['fast', 'slow'], fsync='never') as writer:
+    writer.write({'fast': 1, 'slow': 2})
+    writer.write({'fast': 3})
+    writer.write({'slow': 4})
+  lines = open(path).read().splitlines()
+  assert [line.count(',') for line in lines] == [2, 2, 1, 2]
+  df = pd.read_csv(path)
+  assert df['slow'].isna().tolist() == [False, True, False]
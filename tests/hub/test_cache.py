@@ -0,0 +1,54 @@
+"""Test caching of parsed files and figures for the hub dashboard."""
+
+import pandas as pd
+from bairy.hub.cache import FileCache, ResultCache
+
+
+def write_day(path, n_rows):
+  """Write a daily file of n_rows rows."""
+  times = pd.date_range('2021-01-01', periods=n_rows, freq='min')
+  pd.DataFrame({'time': times, 'x': range(n_rows)}).to_csv(path, index=False)
+
+
+def test_file_cache(tmp_path):
+  """Unchanged files are read once and changed files are read again."""
+  path = str(tmp_path / '2021-01-01.csv')
+  write_day(path, 3)
+  files = FileCache()
+  assert len(files.read(path)) == 3
+  assert len(files.read(path)) == 3
+  assert files.hits == 1 and files.misses == 1
+
+  write_day(path, 5)
+  assert len(files.read(path)) == 5
+  assert files.misses == 2 and files.stats()['entries'] == 1
+
+
+def test_file_cache_eviction(tmp_path):
+  """Least recently used files are evicted beyond max_bytes."""
+  paths = [str(tmp_path / f'2021-01-0{i}.csv') for i in range(1, 4)]
+  for path in paths:
+    write_day(path, 100)
+  files = FileCache()
+  size = files.read(paths[0]).memory_usage(deep=True).sum()
+  files = FileCache(max_bytes=2 * size)
+  for path in paths:
+    files.read(path)
+  assert list(files.entries) == paths[1:]
+  assert files.bytes <= files.max_bytes
+
+
+def test_result_cache():
+  """Results are rebuilt only when their version changes."""
+  results = ResultCache()
+  builds = []
+
+  def build():
+    builds.append(1)
+    return len(builds)
+
+  assert results.get('day', 1, build) == 1
+  assert results.get('day', 1, build) == 1
+  assert results.get('day', 2, build) == 2
+  assert results.get('week', 2, build) == 3
+  assert results.hits == 1 and results.misses == 3
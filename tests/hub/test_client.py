@@ -0,0 +1,67 @@
+"""Test retries and circuit breaking of the hub's HTTP client."""
+
+import asyncio
+import pytest
+from aiohttp import web, ClientResponseError
+from aiohttp.test_utils import TestServer
+from bairy.hub.client import HubClient, CircuitBreaker, CircuitOpenError
+
+
+def test_circuit_breaker():
+  """Circuit opens at threshold and lets one trial through after cooldown."""
+  now = [0.0]
+  breaker = CircuitBreaker(2, 10.0, lambda: now[0])
+  breaker.record_failure()
+  assert breaker.allow()
+  breaker.record_failure()
+  assert breaker.state == 'open' and not breaker.allow()
+
+  now[0] = 11.0
+  assert breaker.allow() and not breaker.allow()  # a single trial
+  breaker.record_failure()
+  assert breaker.state == 'open'
+  now[0] = 22.0
+  assert breaker.allow()
+  breaker.record_success()
+  assert breaker.state == 'closed'
+
+
+def test_retries():
+  """Server errors are retried and repeated failures open the circuit."""
+  calls = []
+
+  async def handler(request):
+    calls.append(request.path)
+    if request.path == '/flaky' and len(calls) < 3:
+      return web.Response(status=503)
+    if request.path == '/missing':
+      return web.Response(status=404)
+    if request.path == '/down':
+      return web.Response(status=500)
+    return web.Response(text='ok')
+
+  async def run():
+    app = web.Application()
+    app.router.add_get('/{path}', handler)
+    async with TestServer(app) as server:
+      client = HubClient(retries=2, backoff=0.01, failure_threshold=1,
+                         port=server.port)
+      body, _ = await client.get(server.host, 'flaky')
+      assert body == b'ok' and len(calls) == 3
+
+      with pytest.raises(ClientResponseError):  # not retried
+        await client.get(server.host, 'missing')
+      assert len(calls) == 4
+      with pytest.raises(ClientResponseError):
+        await client.get(server.host, 'down')
+      assert len(calls) == 7
+      with pytest.raises(CircuitOpenError):
+        await client.get(server.host, 'flaky')
+      assert len(calls) == 7
+
+      stats = client.stats_dict()[server.host]
+      assert stats['retries'] == 4 and stats['failures'] == 2
+      assert stats['refused'] == 1 and stats['circuit'] == 'open'
+      await client.close()
+
+  asyncio.run(run())
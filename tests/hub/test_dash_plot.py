@@ -0,0 +1,22 @@
+"""Test preparing synced rows for the hub plot."""
+
+import numpy as np
+import pandas as pd
+from bairy.hub.dash_plot import average
+
+
+def test_average():
+  """A week of synced rows of two devices fits within the point budget."""
+  index = pd.date_range('2021-01-01', periods=7 * 1440, freq='min',
+                        name='time')
+  a = pd.DataFrame({'a pm_2.5': np.arange(len(index), dtype=float)},
+                   index=index)
+  b = pd.DataFrame({'b pm_2.5': np.ones(len(index))},
+                   index=index + pd.Timedelta('20s'))
+  df = average(pd.concat([a, b]), 2000)
+  assert len(df) <= 2000
+  assert df['a pm_2.5'].mean() == a['a pm_2.5'].mean()
+  assert (df['b pm_2.5'] == 1).all()
+
+  day = pd.concat([a, b]).iloc[:100]
+  assert average(day, 2000).equals(day.sort_index())
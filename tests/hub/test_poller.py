@@ -0,0 +1,33 @@
+"""Test polling device statuses in the background."""
+
+import asyncio
+from bairy.hub import configs
+from bairy.hub.poller import StatusPoller
+
+
+def test_single_flight(tmp_path, monkeypatch):
+  """Concurrent refreshes share one request to each device."""
+  path = tmp_path / 'ips.txt'
+  path.write_text('self\n10.0.0.2\n')
+  monkeypatch.setattr(configs, 'IP_PATH', str(tmp_path / 'ips.json'))
+  configs.set_ips(str(path))
+  calls = []
+
+  async def fetch(ip_address):
+    calls.append(ip_address)
+    await asyncio.sleep(0.05)
+    if ip_address != 'self':
+      raise OSError('unreachable')
+    return {'device_configs': {'name': 'pi'}}
+
+  async def run():
+    poller = StatusPoller(fetch=fetch)
+    await asyncio.gather(*[poller.refresh() for _ in range(5)])
+    return poller.snapshot()
+
+  snapshot = asyncio.run(run())
+  assert sorted(calls) == ['10.0.0.2', 'self']
+  assert snapshot[0]['device_configs']['name'] == 'pi'
+  assert snapshot[0]['hub']['age'] < 1 and snapshot[0]['hub']['error'] is None
+  assert snapshot[1]['hub']['age'] is None and 'unreachable' in \
+      snapshot[1]['hub']['error']
@@ -0,0 +1,19 @@
+"""Test storing data synced from devices in daily files."""
+
+import pandas as pd
+from bairy.hub.store import DeviceStore, list_stores
+
+
+def test_merge_and_mark(tmp_path):
+  """Overlapping rows replace stored ones and days split into files."""
+  store = DeviceStore(str(tmp_path), 'pi')
+  times = pd.date_range('2021-03-01 23:57', periods=4, freq='1min')
+  store.merge(pd.DataFrame({'time': times, 'a': [1.0, 2.0, 3.0, 4.0]}))
+  store.merge(pd.DataFrame({'time': times[-2:], 'a': [5.0, 6.0]}))
+  store.save_mark(times[-1])
+
+  assert store.days() == ['2021-03-01', '2021-03-02']
+  assert list(store.load()['a']) == [1.0, 2.0, 5.0, 6.0]
+  assert list(store.load(times[1])['a']) == [5.0, 6.0]
+  assert store.load_mark() == times[-1]
+  assert [s.name for s in list_stores(str(tmp_path))] == ['pi']
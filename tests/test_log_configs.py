@@ -0,0 +1,61 @@
+"""Test writing logs through queues and reading them backwards."""
+
+import logging
+import multiprocessing
+from bairy import log_configs
+
+
+def test_read_logs(tmp_path, monkeypatch):
+  """Records are read newest first across blocks, paged and filtered."""
+  monkeypatch.setattr(log_configs, 'BLOCK_SIZE', 16)  # many blocks
+  path = str(tmp_path / 'app.logs')
+  lines = []
+  for i in range(20):
+    level = 'WARNING' if i % 5 == 0 else 'INFO'
+    lines.append(f'2021-01-01 00:00:{i:02} - {level} - message {i}')
+    if i == 10:
+      lines += ['Traceback (most recent call last):', 'ValueError']
+  with open(path, 'w') as f:
+    f.write('\n'.join(lines) + '\n')
+
+  text, cursor = log_configs.read_logs(path)
+  assert cursor is None
+  assert text.splitlines()[0].endswith('message 19')
+  assert text.splitlines()[-1].endswith('message 0')
+  assert 'message 10\nTraceback (most recent call last):\nValueError\n' in text
+
+  pages = []
+  cursor = None
+  while True:  # paging back through the whole file
+    text, cursor = log_configs.read_logs(path, 3, cursor)
+    pages.append(text)
+    if cursor is None:
+      break
+  assert len(pages) == 7
+  assert ''.join(pages) == log_configs.read_logs(path)[0]
+
+  text, _ = log_configs.read_logs(path, level='warning')
+  assert [line.split(' - ')[-1] for line in text.splitlines()] == \
+      ['message 15', 'message 10', 'Traceback (most recent call last):',
+       'ValueError', 'message 5', 'message 0']
+
+
+def test_forked_listener(tmp_path):
+  """A forked process writes its records after its parent stops listening."""
+  path = str(tmp_path / 'app.logs')
+  logger = logging.getLogger('test_forked_listener')
+  logger.propagate = False
+  logger.addHandler(log_configs.queue_handler(path, console=False))
+  listener = log_configs.get_listener(path)
+  try:
+    logger.warning('from parent')
+    listener.stop()
+    context = multiprocessing.get_context('fork')
+    p = context.Process(target=logger.warning, args=('from child',))
+    p.start()
+    p.join()
+    with open(path) as f:
+      assert f.read().splitlines() == ['from parent', 'from child']
+  finally:
+    listener.start()  # stopped again on exit
+    logger.handlers.clear()
@@ -1,8 +1,14 @@
 """Test __main__ functions."""
 
 import os
-from bairy.__main__ import parse_args, parse_device, parse_hub
-from bairy import create_service
+import sys
+import time
+import signal
+import subprocess
+from bairy.__main__ import parse_args, parse_device, parse_device_remove, \
+    parse_hub
+from bairy import create_service, startup_profile
+from bairy.device import configs
 
 
 def test_parser():
@@ -25,6 +31,25 @@ def test_parser():
   args = parse_args(['--remove', 'logs'])
   assert args.remove == ['logs']
 
+  args = parse_args(['--startup-profile'])
+  assert args.startup_profile
+
+
+def test_remove_data(tmp_path, monkeypatch):
+  """Removing data also removes summaries of data and sensors."""
+  monkeypatch.setattr(configs, 'DEVICE_DATA_DIR', str(tmp_path))
+  monkeypatch.setattr(configs, 'SEGMENTS_DIR', str(tmp_path / 'segments'))
+  monkeypatch.setattr(configs, 'PARTITIONS_DIR', str(tmp_path / 'partitions'))
+  monkeypatch.setattr(configs, 'STATE_PATH', str(tmp_path / 'state.json'))
+  monkeypatch.setattr(configs, 'SENSOR_STATS_PATH',
+                      str(tmp_path / 'sensor_stats.json'))
+  names = ['data.csv', 'data.csv.idx', 'state.json', 'sensor_stats.json',
+           'preprocess_state.npz', 'configs.json']
+  for name in names:
+    (tmp_path / name).write_text('')
+  parse_device_remove('data')
+  assert os.listdir(tmp_path) == ['configs.json']
+
 
 def test_service():
   """Test create_service()."""
@@ -53,3 +78,42 @@ def test_main():
     pass
   else:
     raise ValueError
+
+
+def test_startup_time():
+  """Commands other than running bairy avoid importing heavy packages."""
+  records = startup_profile.measure_imports(startup_profile.COMMAND_MODULES)
+  packages = startup_profile.group_by_package(records)
+  for heavy in ['pandas', 'numpy', 'dash', 'plotly', 'fastapi', 'uvicorn',
+                'aiohttp', 'smbus2', 'gpiozero']:
+    assert heavy not in packages
+  assert sum(packages.values()) < 1e6  # microseconds
+
+
+def test_run_device():
+  """Running bairy keeps sampling sensors into data.csv until interrupted."""
+  if not os.path.exists(configs.CONFIGS_PATH):
+    configs.set_random_configs()
+  size = os.path.getsize(configs.DATA_PATH) \
+      if os.path.exists(configs.DATA_PATH) else 0
+  # a session of its own, so the app process is interrupted as well
+  p = subprocess.Popen([sys.executable, '-m', 'bairy'],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                       start_new_session=True)
+  try:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and p.poll() is None:
+      if os.path.exists(configs.DATA_PATH) and \
+              os.path.getsize(configs.DATA_PATH) > size:
+        break
+      time.sleep(0.5)
+    assert p.poll() is None, p.stderr.read().decode()
+    assert os.path.getsize(configs.DATA_PATH) > size
+  finally:
+    if p.poll() is None:
+      os.killpg(p.pid, signal.SIGINT)
+      try:
+        p.wait(15)
+      except subprocess.TimeoutExpired:
+        os.killpg(p.pid, signal.SIGKILL)
+    p.stderr.close()